@@ -22,6 +22,13 @@ contract JournalContract {
         string metadata;
     }
 
+    struct EventRecord {
+        string manuscriptId;
+        string actorId;
+        string eventType;
+        string metadata;
+    }
+
     struct AuthorCorrection {
         string manuscriptId;
         string authorId;
@@ -33,6 +40,7 @@ contract JournalContract {
     ReviewerAssignment[] public reviewerAssignments;
     ReviewSubmission[] public reviewSubmissions;
     AuthorCorrection[] public authorCorrections;
+    mapping(bytes32 => uint256) public anchoredRoots;
 
     event ReviewerAssigned(string manuscriptId, string reviewerId, string metadata);
     event ReviewSubmitted(string manuscriptId, string reviewerId, string metadata);
@@ -43,6 +51,14 @@ contract JournalContract {
         string metadata,
         uint256 timestamp
     );
+    event EventRecorded(
+        string manuscriptId,
+        string actorId,
+        string eventType,
+        string metadata,
+        uint256 batchIndex
+    );
+    event RootAnchored(bytes32 indexed root, uint256 eventCount, uint256 timestamp);
 
     function publishManuscript(string memory manuscriptJson) public {
         manuscripts.push(Manuscript({
@@ -78,6 +94,30 @@ contract JournalContract {
         );
     }
 
+    function recordEvents(EventRecord[] memory records) public {
+        require(records.length > 0, "Batch cannot be empty");
+
+        for (uint256 i = 0; i < records.length; i++) {
+            require(bytes(records[i].manuscriptId).length > 0, "Manuscript ID cannot be empty");
+            emit EventRecorded(
+                records[i].manuscriptId,
+                records[i].actorId,
+                records[i].eventType,
+                records[i].metadata,
+                i
+            );
+        }
+    }
+
+    function anchorRoot(bytes32 root, uint256 eventCount) public {
+        require(root != bytes32(0), "Root cannot be empty");
+
+        if (anchoredRoots[root] == 0) {
+            anchoredRoots[root] = block.timestamp;
+        }
+        emit RootAnchored(root, eventCount, block.timestamp);
+    }
+
     function getManuscriptsCount() public view returns (uint256) {
         return manuscripts.length;
     }
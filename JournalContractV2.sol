@@ -0,0 +1,134 @@
+// SPDX-License-Identifier: MIT
+
+pragma solidity ^0.8.10;
+
+// Version 2 of JournalContract. Takes the same calls, so the application
+// only needs the new ABI file and address, but keeps the records in event
+// logs instead of storage. Manuscripts, reviewers and authors are indexed
+// topics holding keccak256 of their id string, so logs can be filtered by
+// manuscript or actor; the only storage left is a hash per manuscript,
+// the list of those hashes per submitter and the anchored roots.
+contract JournalContractV2 {
+
+    struct Manuscript {
+        bytes32 metadataHash;
+        address submittedBy;
+        uint64 dateSubmitted;
+    }
+
+    struct EventRecord {
+        string manuscriptId;
+        string actorId;
+        string eventType;
+        string metadata;
+    }
+
+    Manuscript[] public manuscripts;
+    mapping(address => bytes32[]) private submissions;
+    mapping(bytes32 => uint256) public anchoredRoots;
+
+    event ManuscriptPublished(
+        address indexed submitter,
+        uint256 indexed index,
+        bytes32 metadataHash,
+        string metadata
+    );
+    event ReviewerAssigned(bytes32 indexed manuscriptKey, bytes32 indexed reviewerKey, string metadata);
+    event ReviewSubmitted(bytes32 indexed manuscriptKey, bytes32 indexed reviewerKey, string metadata);
+    event CorrectionsSubmitted(
+        bytes32 indexed manuscriptKey,
+        bytes32 indexed authorKey,
+        string metadata,
+        uint256 timestamp
+    );
+    event EventRecorded(
+        bytes32 indexed manuscriptKey,
+        bytes32 indexed actorKey,
+        string eventType,
+        string metadata,
+        uint256 batchIndex
+    );
+    event RootAnchored(bytes32 indexed root, uint256 eventCount, uint256 timestamp);
+
+    function publishManuscript(string calldata manuscriptJson) external {
+        bytes32 metadataHash = keccak256(bytes(manuscriptJson));
+        manuscripts.push(Manuscript({
+            metadataHash: metadataHash,
+            submittedBy: msg.sender,
+            dateSubmitted: uint64(block.timestamp)
+        }));
+        submissions[msg.sender].push(metadataHash);
+        emit ManuscriptPublished(msg.sender, manuscripts.length - 1, metadataHash, manuscriptJson);
+    }
+
+    function recordReviewerAssignment(
+        string calldata manuscriptId,
+        string calldata reviewerId,
+        string calldata metadata
+    ) external {
+        emit ReviewerAssigned(keccak256(bytes(manuscriptId)), keccak256(bytes(reviewerId)), metadata);
+    }
+
+    function recordReviewSubmission(
+        string calldata manuscriptId,
+        string calldata reviewerId,
+        string calldata metadata
+    ) external {
+        emit ReviewSubmitted(keccak256(bytes(manuscriptId)), keccak256(bytes(reviewerId)), metadata);
+    }
+
+    function recordCorrections(
+        string calldata manuscriptId,
+        string calldata authorId,
+        string calldata metadata
+    ) external {
+        require(bytes(manuscriptId).length > 0, "Manuscript ID cannot be empty");
+        require(bytes(authorId).length > 0, "Author ID cannot be empty");
+
+        emit CorrectionsSubmitted(
+            keccak256(bytes(manuscriptId)),
+            keccak256(bytes(authorId)),
+            metadata,
+            block.timestamp
+        );
+    }
+
+    function recordEvents(EventRecord[] calldata records) external {
+        require(records.length > 0, "Batch cannot be empty");
+
+        for (uint256 i = 0; i < records.length; i++) {
+            require(bytes(records[i].manuscriptId).length > 0, "Manuscript ID cannot be empty");
+            emit EventRecorded(
+                keccak256(bytes(records[i].manuscriptId)),
+                keccak256(bytes(records[i].actorId)),
+                records[i].eventType,
+                records[i].metadata,
+                i
+            );
+        }
+    }
+
+    function anchorRoot(bytes32 root, uint256 eventCount) external {
+        require(root != bytes32(0), "Root cannot be empty");
+
+        if (anchoredRoots[root] == 0) {
+            anchoredRoots[root] = block.timestamp;
+        }
+        emit RootAnchored(root, eventCount, block.timestamp);
+    }
+
+    function getManuscriptsCount() external view returns (uint256) {
+        return manuscripts.length;
+    }
+
+    function getManuscriptDetails(uint256 index) external view returns (bytes32, address, uint256) {
+        require(index < manuscripts.length, "Index out of bounds");
+        Manuscript storage manuscript = manuscripts[index];
+        return (manuscript.metadataHash, manuscript.submittedBy, manuscript.dateSubmitted);
+    }
+
+    // Metadata hashes of the submitter's manuscripts; the metadata itself is in their ManuscriptPublished logs
+    function getManuscriptsBySubmitter(address submitter) external view returns (bytes32[] memory) {
+        return submissions[submitter];
+    }
+}
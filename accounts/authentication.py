@@ -0,0 +1,210 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+# Loaded up front for a cached user; any other Profile field is fetched on first access
+PRINCIPAL_FIELDS = ('id', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+class TokenCache:
+    """
+    Bounded LRU of token key -> (expiry, token row, user row), safe to share
+    between threads. Entries expire after `ttl` seconds and are evicted
+    early when the token or its user changes (see accounts/signals.py).
+
+    Other processes learn of an eviction through a generation value in the
+    shared `alias` cache, rewritten once the evicting transaction commits.
+    Each process reads it at most every `sync_interval` seconds and empties
+    its LRU when it changed, so a hit costs no query and a deactivated user
+    or deleted token is dropped everywhere within `sync_interval` seconds.
+    """
+    GENERATION_KEY = 'token-cache:generation'
+
+    def __init__(self, maxsize, ttl, alias, sync_interval, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.alias = alias
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._generation = None
+        self._synced = None
+        self.hits = 0
+        self.misses = 0
+
+    def _sync_due(self):
+        return self._synced is None or self.clock() - self._synced >= self.sync_interval
+
+    def _sync(self):
+        """Empty the LRU if another process has evicted an entry since the last check"""
+        self._synced = self.clock()
+        generation = caches[self.alias].get(self.GENERATION_KEY)
+        with self._lock:
+            if generation != self._generation:
+                self._generation = generation
+                self._entries.clear()
+                self._keys_by_user.clear()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < self.clock():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def get(self, key):
+        if self._sync_due():
+            self._sync()
+        return self._lookup(key)
+
+    async def aget(self, key):
+        if self._sync_due():
+            await sync_to_async(self._sync)()
+        return self._lookup(key)
+
+    def set(self, key, token_row, user_row):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (self.clock() + self.ttl, token_row, user_row)
+            self._keys_by_user.setdefault(token_row[1], set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        _, token_row, _ = self._entries.pop(key)
+        user_id = token_row[1]
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def _publish(self):
+        # A fresh value rather than incr(), which DatabaseCache does as a read and a write
+        transaction.on_commit(
+            lambda: caches[self.alias].set(self.GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+        )
+
+    def evict(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+        self._publish()
+
+    def evict_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._drop(key)
+        self._publish()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE_SIZE,
+    settings.TOKEN_AUTH_CACHE_TTL,
+    settings.TOKEN_AUTH_CACHE_ALIAS,
+    settings.TOKEN_AUTH_CACHE_SYNC_INTERVAL,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers each token's user for a short while,
+    so repeat requests skip the Token/Profile join. The user is a Profile
+    with only PRINCIPAL_FIELDS loaded and can be used anywhere a Profile is
+    expected, e.g. as a foreign key value.
+    """
+    cache = token_cache
+
+    @staticmethod
+    def principal_fields():
+        # Model.from_db() expects deferred-model values in field definition order
+        return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname in PRINCIPAL_FIELDS]
+
+    def token_key(self, request):
+        """Key from the Authorization header, or None if the request has no token"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.')
+            )
+
+    def authenticate(self, request):
+        key = self.token_key(request)
+        return None if key is None else self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; only a token missing from the cache costs an ORM call"""
+        key = self.token_key(request)
+        if key is None:
+            return None
+        cached = await self.cache.aget(key)
+        if cached is None:
+            cached = await sync_to_async(self.load)(key)
+        return self.principal(*cached)
+
+    def authenticate_credentials(self, key):
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self.load(key)
+        return self.principal(*cached)
+
+    def load(self, key):
+        """(token row, user row) of a token key, read from the database and cached"""
+        fields = self.principal_fields()
+        try:
+            token = (
+                Token.objects
+                .select_related('user')
+                .only('key', 'created', 'user_id', *(f'user__{field}' for field in fields))
+                .get(key=key)
+            )
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        token_row = (token.key, token.user_id, token.created)
+        user_row = tuple(getattr(token.user, field) for field in fields)
+        self.cache.set(key, token_row, user_row)
+        return token_row, user_row
+
+    def principal(self, token_row, user_row):
+        user = get_user_model().from_db(DEFAULT_DB_ALIAS, self.principal_fields(), user_row)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        token = Token.from_db(DEFAULT_DB_ALIAS, ('key', 'user_id', 'created'), token_row)
+        token.user = user
+        return user, token
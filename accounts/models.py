@@ -37,6 +37,12 @@ class Profile(AbstractUser):
             ('can_change_profile', _('Can change profiles')),
             ('can_delete_profiles', _('Can delete profiles')),
         )
+        indexes = [
+            # Profile listing order and keyset; also serves ?name= prefixes of the last name
+            models.Index(fields=['last_name', 'first_name', 'id']),
+            # ?name= prefixes of the first name, merged with the one above for the OR
+            models.Index(fields=['first_name']),
+        ]
 
     def validate_email(self, email=''):
         member = Profile.objects.get(email=email)
@@ -0,0 +1,55 @@
+from django.db.models import Q
+
+# Columns a profile listing may project with ?fields=, the same ones ProfileSerializer exposes
+PROFILE_LIST_FIELDS = ('id', 'first_name', 'last_name', 'other_name', 'email', 'primary_phone', 'national_id',
+                       'secondary_phone', 'additional_email', 'address', 'additional_address', 'web3_address')
+PICKER_FIELDS = ('id', 'first_name', 'last_name', 'email')
+# Listing order, alphabetical by name; also the keyset the listing pages on
+PROFILE_ORDERING = ('last_name', 'first_name', 'id')
+
+
+def _flag(value, name):
+    if value in ('1', 'true'):
+        return True
+    if value in ('0', 'false'):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def profile_filters(params):
+    """
+    Conditions for the optional ?name=, ?email= and ?has_web3_address=
+    listing filters. Name matches the start of the first or last name, a
+    prefix range on each of the two name indexes; email matches the whole
+    address ignoring case. Raises ValueError on values that cannot be used.
+    """
+    condition = Q()
+
+    name = params.get('name', '').strip()
+    if name:
+        condition &= Q(last_name__istartswith=name) | Q(first_name__istartswith=name)
+
+    email = params.get('email', '').strip()
+    if email:
+        condition &= Q(email__iexact=email)
+
+    if params.get('has_web3_address'):
+        has_address = Q(web3_address__isnull=False) & ~Q(web3_address='')
+        condition &= has_address if _flag(params['has_web3_address'], 'has_web3_address') else ~has_address
+    return condition
+
+
+def profile_fields(params):
+    """Columns requested with ?fields=, all listed columns by default. Raises ValueError on unknown names."""
+    fields = [field for field in params.get('fields', '').split(',') if field]
+    if not fields:
+        return PROFILE_LIST_FIELDS
+    invalid = [field for field in fields if field not in PROFILE_LIST_FIELDS]
+    if invalid:
+        raise ValueError(f"Invalid field: {', '.join(invalid)}")
+    return tuple(dict.fromkeys(fields))
+
+
+def picker_entry(row):
+    """Compact reviewer picker entry for a values() row of PICKER_FIELDS"""
+    return {'id': row['id'], 'name': f"{row['first_name']} {row['last_name']}", 'email': row['email']}
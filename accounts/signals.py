@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 # from django.contrib.auth.models import User
+from accounts.authentication import token_cache
 from accounts.models import Profile
 from rest_framework.authtoken.models import Token
 
@@ -9,3 +10,18 @@ from rest_framework.authtoken.models import Token
 def report_new_profile(sender, instance, created, **kwargs):
     if created:
         Token.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Profile, weak=False)
+@receiver(post_delete, sender=Profile, weak=False)
+def evict_cached_profile(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login alone, which the cached user does not carry
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    token_cache.evict_user(instance.pk)
+
+
+@receiver(post_save, sender=Token, weak=False)
+@receiver(post_delete, sender=Token, weak=False)
+def evict_cached_token(sender, instance, **kwargs):
+    token_cache.evict(instance.key)
@@ -1,3 +1,79 @@
+from asgiref.sync import async_to_sync
 from django.test import TestCase
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
 
-# Create your tests here.
+from accounts.authentication import CachedTokenAuthentication, TokenCache
+from accounts.models import Profile
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        CachedTokenAuthentication.cache.clear()
+        self.addCleanup(CachedTokenAuthentication.cache.clear)
+        self.user = Profile.objects.create_user(
+            email='user@example.org', password='password', first_name='U', last_name='Ser'
+        )
+        self.key = Token.objects.get(user=self.user).key
+        self.authentication = CachedTokenAuthentication()
+
+    def test_cached_lookup(self):
+        user, token = self.authentication.authenticate_credentials(self.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.key))
+        with self.assertNumQueries(0):
+            user, _ = self.authentication.authenticate_credentials(self.key)
+        self.assertEqual(user.email, 'user@example.org')
+
+    def test_entries_expire_and_are_bounded(self):
+        now = [0.0]
+        cache = TokenCache(2, 10, 'tokens', 60, clock=lambda: now[0])
+        for key in ('a', 'b', 'c'):
+            cache.set(key, (key, 1, None), ())
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        now[0] = 11
+        self.assertIsNone(cache.get('b'))
+
+    def test_async_lookup(self):
+        self.authentication.authenticate_credentials(self.key)
+        request = type('Request', (), {'META': {'HTTP_AUTHORIZATION': f'Token {self.key}'}})()
+        user, _ = async_to_sync(self.authentication.aauthenticate)(request)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_unknown_token(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials('0' * 40)
+
+    def test_deactivated_user_is_evicted(self):
+        self.authentication.authenticate_credentials(self.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.key)
+
+    def test_deleted_token_is_evicted(self):
+        self.authentication.authenticate_credentials(self.key)
+        Token.objects.filter(key=self.key).first().delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.key)
+
+    def test_evictions_reach_other_processes(self):
+        # Another process has its own TokenCache, announcing evictions through the shared alias
+        now = [0.0]
+        other = TokenCache(10, 300, 'tokens', 5, clock=lambda: now[0])
+        row = Token.objects.filter(key=self.key).values_list('key', 'user_id', 'created').get()
+        other.get(self.key)
+        other.set(self.key, row, ())
+        self.assertIsNotNone(other.get(self.key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CachedTokenAuthentication.cache.evict_user(self.user.pk)
+        self.assertIsNotNone(other.get(self.key))
+        now[0] = 5
+        self.assertIsNone(other.get(self.key))
+
+    def test_login_keeps_the_entry(self):
+        self.authentication.authenticate_credentials(self.key)
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.authentication.authenticate_credentials(self.key)
@@ -4,29 +4,57 @@ from django.contrib.auth import authenticate
 from django.http import JsonResponse
 from rest_framework import status
 from rest_framework import permissions
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from accounts.authentication import CachedTokenAuthentication
 from accounts.models import Profile
+from accounts.queries import PICKER_FIELDS, PROFILE_ORDERING, picker_entry, profile_fields, profile_filters
 from accounts.serializers import CreateProfileSerializer, LoginSerializer, ProfileSerializer, ProfileDetailsSerializer
+from openPublisher.pagination import KeysetPagination
 
 
 class ListProfiles(APIView):
     """
-    API endpoint for listing profiles.
+    API endpoint for listing profiles, a page at a time in name order.
+
+    Filters: ?name= (first or last name prefix), ?email=, ?has_web3_address=.
+    ?fields= picks the returned columns and ?view=picker returns the compact
+    id/name/email entries used to choose reviewers. Rows are read with
+    values(), so no model instances are built.
+
+    The response is {"next": <url or null>, "results": [...]}, plus "count"
+    with ?count=true; follow "next" for further pages. It used to be a bare
+    list of every profile.
     """
 
     model = Profile
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        profiles = self.model.objects.all()
-        serializer = ProfileSerializer(instance=profiles, many=True)
-
-        return Response(data=serializer.data)
+        picker = request.query_params.get('view') == 'picker'
+        try:
+            condition = profile_filters(request.query_params)
+            fields = PICKER_FIELDS if picker else profile_fields(request.query_params)
+        except ValueError as e:
+            return JsonResponse({"result": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        profiles = self.model.objects.filter(condition)
+        if picker:
+            profiles = profiles.filter(is_active=True)
+
+        # The ordering columns are always read, the cursor is built from them
+        columns = tuple(dict.fromkeys(fields + PROFILE_ORDERING))
+        paginator = KeysetPagination(PROFILE_ORDERING, descending=False)
+        rows = paginator.paginate_queryset(profiles.values(*columns), request)
+
+        if picker:
+            data = [picker_entry(row) for row in rows]
+        else:
+            data = [{field: row[field] for field in fields} for row in rows]
+        return paginator.get_paginated_response(data)
 
 
 class CreateProfile(APIView):
@@ -68,7 +96,7 @@ class UpdateProfile(APIView):
     """ API endpoint for updating a profile."""
     model = Profile
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def put(self, request, pk):
@@ -97,7 +125,7 @@ class UpdateProfile(APIView):
 class CreateAddress(APIView):
     """ API endpoint for creating web3 address."""
     model = Profile
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     web3 = settings.W3
     serializer_class = ProfileDetailsSerializer
@@ -130,7 +158,7 @@ class DeleteProfile(APIView):
 
     model = Profile
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, pk):
@@ -150,7 +178,7 @@ class ProfileDetails(APIView):
 
     model = Profile
     serializer_class = ProfileDetailsSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from journals.models import Journal
+from openPublisher import response_cache
+
+
+@receiver(post_save, sender=Journal, weak=False)
+@receiver(post_delete, sender=Journal, weak=False)
+def invalidate_journal_responses(sender, instance, **kwargs):
+    response_cache.bump(('journal', instance.pk), ('journals', 'all'))
@@ -1,14 +1,17 @@
 from json import JSONDecodeError
 
 from django.http import JsonResponse
+from django.views import View
 from rest_framework import status, permissions
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from accounts.authentication import CachedTokenAuthentication
 from journals.models import Journal
 from journals.serializers import JournalSerializer
+from openPublisher import response_cache
+from openPublisher.async_support import api_response
 
 
 class CreateJournal(APIView):
@@ -16,7 +19,7 @@ class CreateJournal(APIView):
 
     model = Journal
     serializer_class = JournalSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def post(self, request):
@@ -47,7 +50,7 @@ class UpdateJournal(APIView):
     """ API endpoint for updating a journal."""
     model = Journal
     serializer_class = JournalSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def put(self, request, pk):
@@ -81,7 +84,7 @@ class DeleteJournal(APIView):
     """Delete a journal"""
 
     model = Journal
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def delete(self, request, pk):
@@ -105,30 +108,77 @@ class JournalDetails(APIView):
 
     def get(self, request, pk):
         try:
-            journal = self.model.objects.get(pk=pk)
-        except self.model.DoesNotExist:
+            pk = int(pk)
+        except ValueError:
             return Response(
                 {'error': 'Journal does not exist'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        (status_code, data), hit = response_cache.cached(
+            'journals.details', [('journal', pk)], lambda: self.build(pk)
+        )
+        if status_code != status.HTTP_200_OK:
+            response = Response(data, status=status_code)
+        else:
+            response = JsonResponse(data=data, status=status_code)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    def build(self, pk):
+        try:
+            journal = self.model.objects.get(pk=pk)
+        except self.model.DoesNotExist:
+            return status.HTTP_404_NOT_FOUND, {'error': 'Journal does not exist'}
+
+        serializer = self.serializer_class(instance=journal)
+        return status.HTTP_200_OK, dict(serializer.data)
+
+
+class AsyncJournalDetails(View):
+    """JournalDetails for the ASGI application, cached under the same entries as the sync view"""
+
+    model = Journal
+    serializer_class = JournalSerializer
+
+    async def get(self, request, pk):
+        (status_code, data), hit = await response_cache.acached(
+            'journals.details', [('journal', pk)], lambda: self.build(pk)
+        )
+        if status_code != status.HTTP_200_OK:
+            response = api_response(data, status=status_code)
+        else:
+            response = JsonResponse(data=data, status=status_code)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    async def build(self, pk):
+        journal = await self.model.objects.filter(pk=pk).afirst()
+        if journal is None:
+            return status.HTTP_404_NOT_FOUND, {'error': 'Journal does not exist'}
+
         serializer = self.serializer_class(instance=journal)
+        return status.HTTP_200_OK, dict(serializer.data)
 
-        return JsonResponse(data=serializer.data, status=status.HTTP_200_OK)
 
 class ListJournals(APIView):
     """
     API endpoint for listing all journals.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = []
     model = Journal
     serializer_class = JournalSerializer
 
     def get(self, request):
+        data, hit = response_cache.cached('journals.list', [('journals', 'all')], self.build)
+        response = Response(data=data, status=status.HTTP_200_OK)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    def build(self):
         journals = self.model.objects.all()
         serializer = self.serializer_class(instance=journals, many=True)
-
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return list(serializer.data)
 
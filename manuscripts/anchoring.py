@@ -0,0 +1,344 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from manuscripts import merkle
+from manuscripts.models import AnchorBatch, AnchorJob, ManuscriptDocument, ManuscriptEvent
+from manuscripts.sepolia import Sepolia
+
+
+def enqueue(event, fn_name, args):
+    """
+    Queue a contract call for an event. Must be called inside the transaction
+    that created the event so the two are committed together.
+    """
+    job = AnchorJob.objects.create(event=event, fn_name=fn_name, args=args)
+    # Shares the rebuild create_event() queued for the event
+    ManuscriptDocument.refresh_on_commit([event.manuscript_id])
+    return job
+
+
+def enqueue_many(calls):
+    """
+    Queue several (event, fn_name, args) contract calls with one insert. The
+    jobs sit next to each other in the queue, so a batching worker sends them
+    in as few transactions as the batch size allows.
+    """
+    jobs = AnchorJob.objects.bulk_create([
+        AnchorJob(event=event, fn_name=fn_name, args=args) for event, fn_name, args in calls
+    ])
+    ManuscriptDocument.refresh_on_commit({event.manuscript_id for event, _, _ in calls})
+    return jobs
+
+
+def anchor_manuscript(event, manuscript):
+    return enqueue(event, 'publishManuscript', Sepolia.manuscript_args(manuscript))
+
+
+def anchor_reviewer_assignment(event, manuscript_id, reviewer_id, metadata):
+    return enqueue(event, 'recordReviewerAssignment', Sepolia.event_args(manuscript_id, reviewer_id, metadata))
+
+
+def anchor_reviewer_assignments(assignments):
+    """Queue the assignment calls for [(event, manuscript_id, reviewer_id, metadata)] together"""
+    return enqueue_many([
+        (event, 'recordReviewerAssignment', Sepolia.event_args(manuscript_id, reviewer_id, metadata))
+        for event, manuscript_id, reviewer_id, metadata in assignments
+    ])
+
+
+def anchor_review(event, manuscript_id, reviewer_id, metadata):
+    return enqueue(event, 'recordReviewSubmission', Sepolia.event_args(manuscript_id, reviewer_id, metadata))
+
+
+def anchor_corrections(event, manuscript_id, author_id, metadata):
+    return enqueue(event, 'recordCorrections', Sepolia.event_args(manuscript_id, author_id, metadata))
+
+
+def _backoff(attempts):
+    """Delay before the next attempt after `attempts` failed ones"""
+    return timedelta(seconds=min(
+        settings.ANCHOR_RETRY_BACKOFF * 2 ** max(attempts - 1, 0),
+        settings.ANCHOR_RETRY_MAX_BACKOFF
+    ))
+
+
+def _record_failures(jobs, error):
+    """Put jobs back in the queue after a failed send, with a growing delay, or fail them for good"""
+    failed = []
+    now = timezone.now()
+    for job in jobs:
+        job.last_error = str(error)
+        job.updated = now
+        job.next_attempt_at = now + _backoff(job.attempts)
+        if job.attempts >= settings.ANCHOR_MAX_ATTEMPTS:
+            job.status = AnchorJob.Status.FAILED
+            failed.append(job.event_id)
+    AnchorJob.objects.bulk_update(jobs, ['attempts', 'last_error', 'status', 'next_attempt_at', 'updated'])
+    if failed:
+        _refresh_documents(failed)
+
+
+def _refresh_documents(event_ids):
+    """Rebuild the read models of the manuscripts whose events changed anchoring state"""
+    ManuscriptDocument.refresh(ManuscriptEvent.objects.filter(pk__in=event_ids).values_list('manuscript_id', flat=True))
+
+
+def _claim(size, window=None):
+    """
+    Take up to `size` due pending jobs for this worker. They are hidden from
+    other workers for ANCHOR_CLAIM_TIMEOUT seconds, so the chain calls can run
+    after the row locks are released; if the worker dies meanwhile they become
+    due again. With `window`, a partial batch whose oldest job is younger than
+    `window` seconds is left alone.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            AnchorJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=AnchorJob.Status.PENDING, next_attempt_at__lte=now)
+            .select_related('event')
+            .order_by('id')[:size]
+        )
+        if not jobs:
+            return []
+        if window is not None and len(jobs) < size and jobs[0].created > now - timedelta(seconds=window):
+            return []
+
+        for job in jobs:
+            job.attempts += 1
+            job.next_attempt_at = now + timedelta(seconds=settings.ANCHOR_CLAIM_TIMEOUT)
+            job.updated = now
+        AnchorJob.objects.bulk_update(jobs, ['attempts', 'next_attempt_at', 'updated'])
+    return jobs
+
+
+def broadcast_pending(sepolia, limit=50):
+    """
+    Sign and send up to `limit` due pending jobs, one transaction each. Jobs
+    are claimed with skip-locked row locks so several workers can run side by
+    side; a job whose send fails waits out its backoff before it is tried again.
+    Returns the number of jobs that were broadcast.
+    """
+    sent = 0
+    for job in _claim(limit):
+        try:
+            txn_hash, nonce = sepolia.send(job.fn_name, job.args)
+        except Exception as e:
+            _record_failures([job], e)
+            continue
+
+        with transaction.atomic():
+            job.status = AnchorJob.Status.BROADCAST
+            job.txn_hash = txn_hash
+            job.nonce = nonce
+            job.last_error = ''
+            job.broadcast_at = timezone.now()
+            job.save(update_fields=['status', 'txn_hash', 'nonce', 'last_error', 'broadcast_at', 'updated'])
+            ManuscriptEvent.objects.filter(pk=job.event_id).update(txn_hash=txn_hash)
+            _refresh_documents([job.event_id])
+        sent += 1
+    return sent
+
+
+def broadcast_batch(sepolia, size=None, window=None, use_merkle=False):
+    """
+    Send pending jobs in batches of up to `size` per recordEvents transaction,
+    until the queue is drained. A partial batch is held back until its oldest
+    job has waited `window` seconds. With use_merkle only the Merkle root of
+    each batch is sent, through anchorRoot, and each job keeps its leaf hash
+    and inclusion proof.
+    Returns the number of jobs that were broadcast.
+    """
+    size = size or settings.ANCHOR_BATCH_SIZE
+    window = settings.ANCHOR_BATCH_WINDOW if window is None else window
+
+    sent = 0
+    while True:
+        batch_size = _broadcast_one_batch(sepolia, size, window, use_merkle)
+        sent += batch_size
+        if batch_size < size:
+            return sent
+
+
+def _broadcast_one_batch(sepolia, size, window, use_merkle):
+    jobs = _claim(size, window)
+    if not jobs:
+        return 0
+
+    records = [job.batch_record() for job in jobs]
+    if use_merkle:
+        levels = merkle.build_levels([merkle.leaf_hash(record) for record in records])
+        root = levels[-1][0]
+        fn_name, args = 'anchorRoot', [root, len(jobs)]
+    else:
+        fn_name, args = 'recordEvents', [records]
+
+    try:
+        txn_hash, nonce = sepolia.send(fn_name, args)
+    except Exception as e:
+        _record_failures(jobs, e)
+        return 0
+
+    with transaction.atomic():
+        batch = AnchorBatch.objects.create(
+            txn_hash=txn_hash,
+            size=len(jobs),
+            merkle_root='0x' + root.hex() if use_merkle else ''
+        )
+        broadcast_at = timezone.now()
+        events = []
+        for index, job in enumerate(jobs):
+            if use_merkle:
+                job.leaf_hash = '0x' + levels[0][index].hex()
+                job.merkle_proof = merkle.merkle_proof(levels, index)
+            job.batch = batch
+            job.batch_index = index
+            job.status = AnchorJob.Status.BROADCAST
+            job.txn_hash = txn_hash
+            job.nonce = nonce
+            job.last_error = ''
+            job.broadcast_at = broadcast_at
+            # bulk_update() skips auto_now, streams find changed jobs by this column
+            job.updated = broadcast_at
+            job.event.txn_hash = txn_hash
+            job.event.txn_index = index
+            events.append(job.event)
+        AnchorJob.objects.bulk_update(
+            jobs,
+            ['batch', 'batch_index', 'leaf_hash', 'merkle_proof', 'status', 'txn_hash', 'nonce', 'last_error',
+             'broadcast_at', 'updated']
+        )
+        ManuscriptEvent.objects.bulk_update(events, ['txn_hash', 'txn_index'])
+        ManuscriptDocument.refresh([event.manuscript_id for event in events])
+    return len(jobs)
+
+
+def _requeue_dropped(jobs):
+    """
+    Send again the jobs of transactions that never made it into a block. A
+    batch is taken apart, its jobs are batched afresh with new proofs.
+    """
+    now = timezone.now()
+    events = []
+    for job in jobs:
+        job.last_error = f"Transaction {job.txn_hash} not mined after {settings.ANCHOR_BROADCAST_TIMEOUT} seconds"
+        if job.attempts >= settings.ANCHOR_MAX_ATTEMPTS:
+            job.status = AnchorJob.Status.FAILED
+            continue
+        job.status = AnchorJob.Status.PENDING
+        job.txn_hash = ''
+        job.nonce = None
+        job.batch = None
+        job.batch_index = None
+        job.leaf_hash = ''
+        job.merkle_proof = []
+        job.broadcast_at = None
+        job.next_attempt_at = now
+        job.updated = now
+        job.event.txn_hash = ''
+        job.event.txn_index = None
+        events.append(job.event)
+
+    with transaction.atomic():
+        AnchorJob.objects.bulk_update(
+            jobs,
+            ['status', 'txn_hash', 'nonce', 'batch', 'batch_index', 'leaf_hash', 'merkle_proof', 'broadcast_at',
+             'last_error', 'next_attempt_at', 'updated']
+        )
+        ManuscriptEvent.objects.bulk_update(events, ['txn_hash', 'txn_index'])
+        _refresh_documents([job.event_id for job in jobs])
+
+
+def confirm_broadcast(sepolia):
+    """
+    Check receipts for broadcast jobs and mark them confirmed once they are
+    ANCHOR_CONFIRMATIONS blocks deep, or failed if the call reverted. Jobs
+    whose transaction has no receipt ANCHOR_BROADCAST_TIMEOUT seconds after
+    it was sent are taken as dropped and queued to be sent again, and the
+    nonce counter is reconciled with the chain so the gap they left is filled.
+    Returns the number of jobs that reached a final state.
+    """
+    settled = []
+    dropped = []
+    jobs = AnchorJob.objects.filter(status=AnchorJob.Status.BROADCAST).select_related('event').order_by('id')
+    if not jobs.exists():
+        return 0
+
+    head = sepolia.block_number()
+    timeout = timezone.now() - timedelta(seconds=settings.ANCHOR_BROADCAST_TIMEOUT)
+    receipts = {}
+    for job in jobs:
+        # Jobs in the same batch share a transaction, so fetch each receipt once
+        if job.txn_hash not in receipts:
+            receipts[job.txn_hash] = sepolia.get_receipt(job.txn_hash)
+        receipt = receipts[job.txn_hash]
+        if receipt is None:
+            if job.broadcast_at is not None and job.broadcast_at < timeout:
+                dropped.append(job)
+            continue
+
+        if receipt.status != 1:
+            job.status = AnchorJob.Status.FAILED
+            job.last_error = 'Transaction reverted'
+        elif head - receipt.blockNumber + 1 >= settings.ANCHOR_CONFIRMATIONS:
+            job.status = AnchorJob.Status.CONFIRMED
+            job.confirmed_at = timezone.now()
+        else:
+            continue
+
+        job.block_number = receipt.blockNumber
+        job.save(update_fields=['status', 'last_error', 'block_number', 'confirmed_at', 'updated'])
+        settled.append(job.event_id)
+
+    if dropped:
+        nonces = {job.nonce for job in dropped if job.nonce is not None}
+        _requeue_dropped(dropped)
+        # The dropped nonces leave a gap that holds back every later transaction
+        sepolia.nonces.reconcile(dropped=nonces)
+    if settled:
+        _refresh_documents(settled)
+    return len(settled)
+
+
+def requeue_failed(include_reverted=False):
+    """
+    Give failed jobs a fresh set of attempts. Reverted transactions would
+    revert again unless the contract changed, so they are left out unless
+    `include_reverted`. Returns the number of jobs queued again.
+    """
+    jobs = AnchorJob.objects.filter(status=AnchorJob.Status.FAILED)
+    if not include_reverted:
+        jobs = jobs.exclude(last_error='Transaction reverted')
+    with transaction.atomic():
+        event_ids = list(jobs.values_list('event_id', flat=True))
+        requeued = AnchorJob.objects.filter(event_id__in=event_ids).update(
+            status=AnchorJob.Status.PENDING,
+            attempts=0,
+            txn_hash='',
+            batch=None,
+            batch_index=None,
+            leaf_hash='',
+            merkle_proof=[],
+            broadcast_at=None,
+            next_attempt_at=timezone.now(),
+            updated=timezone.now()
+        )
+        _refresh_documents(event_ids)
+    return requeued
+
+
+def verify_inclusion(job):
+    """
+    Recompute the leaf of an anchored job from its stored record and check it
+    against the batch Merkle root. Needs no network access.
+    """
+    if job.batch is None or not job.batch.merkle_root:
+        return False
+    leaf = merkle.leaf_hash(job.batch_record())
+    if job.leaf_hash != '0x' + leaf.hex():
+        return False
+    return merkle.verify_proof(leaf, job.merkle_proof, bytes.fromhex(job.batch.merkle_root.removeprefix('0x')))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ManuscriptsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'manuscripts'
+
+    def ready(self):
+        import manuscripts.signals
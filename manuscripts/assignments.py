@@ -0,0 +1,164 @@
+"""
+Assigning many reviewers at once.
+
+A bulk request is validated as a whole with one query per kind of check
+(manuscripts, reviewers, existing assignments) rather than per item, then
+written with bulk inserts: the assignments, their REVIEWER_ASSIGNED events,
+appended to the manuscripts' logs together, and the anchor jobs for those
+events, queued together so the anchor worker can send them in batches.
+Nothing is written unless every item is valid.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from manuscripts import eventstore, reviewers
+from manuscripts.anchoring import anchor_reviewer_assignments
+from manuscripts.models import Manuscript, ManuscriptEvent, ReviewerAssignment, ReviewerWorkload
+from manuscripts.queries import parse_bound
+
+ASSIGNABLE_STATUSES = (Manuscript.Status.ACCEPTED, Manuscript.Status.REVIEW)
+
+
+class AssignmentError(Exception):
+    """Rejected bulk assignment; `errors` lists {'index', 'message'} for each invalid item"""
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+def _parse_items(items):
+    """[(index, manuscript_id, reviewer_id, due_date)] from the request items, and the errors found"""
+    parsed, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'message': "Each assignment must be an object"})
+            continue
+        try:
+            manuscript_id = int(item.get('manuscript_id'))
+            reviewer_id = uuid.UUID(str(item.get('reviewer_id')))
+            due_date = parse_bound(item['due_date'], end_of_day=True) if item.get('due_date') else None
+        except (TypeError, ValueError) as e:
+            errors.append({'index': index, 'message': f"Invalid assignment: {e}"})
+            continue
+        parsed.append((index, manuscript_id, reviewer_id, due_date))
+    return parsed, errors
+
+
+def validate(journal, items):
+    """
+    Check a bulk request against the database in three queries. Returns the
+    manuscripts and reviewers by id with the parsed items, or raises
+    AssignmentError listing every invalid item.
+    """
+    if not isinstance(items, list) or not items:
+        raise AssignmentError("No assignments given")
+    if len(items) > settings.BULK_ASSIGNMENT_MAX_ITEMS:
+        raise AssignmentError(f"At most {settings.BULK_ASSIGNMENT_MAX_ITEMS} assignments per request")
+
+    parsed, errors = _parse_items(items)
+    manuscript_ids = {manuscript_id for _, manuscript_id, _, _ in parsed}
+    reviewer_ids = {reviewer_id for _, _, reviewer_id, _ in parsed}
+
+    manuscripts = (
+        Manuscript.objects
+        .filter(journal_id=journal, pk__in=manuscript_ids)
+        .only('id', 'title', 'status', 'journal_id', 'submitted_by_id')
+        .in_bulk()
+    )
+    profiles = (
+        get_user_model().objects
+        .filter(pk__in=reviewer_ids, is_active=True)
+        .only('id', 'first_name', 'last_name', 'email', 'web3_address')
+        .in_bulk()
+    )
+    existing = set(
+        ReviewerAssignment.objects
+        .filter(manuscript_id__in=manuscript_ids, reviewer_id__in=reviewer_ids)
+        .values_list('manuscript_id', 'reviewer_id')
+    )
+
+    seen = set()
+    valid = []
+    for index, manuscript_id, reviewer_id, due_date in parsed:
+        manuscript = manuscripts.get(manuscript_id)
+        if manuscript is None:
+            message = f"Manuscript {manuscript_id} not found in this journal"
+        elif manuscript.status not in ASSIGNABLE_STATUSES:
+            message = f"Manuscript {manuscript_id} is not in a state where reviewers can be assigned"
+        elif reviewer_id not in profiles:
+            message = f"Reviewer {reviewer_id} not found"
+        elif reviewer_id == manuscript.submitted_by_id:
+            message = "A submitter cannot review their own manuscript"
+        elif (manuscript_id, reviewer_id) in existing:
+            message = f"Reviewer {reviewer_id} is already assigned to manuscript {manuscript_id}"
+        elif (manuscript_id, reviewer_id) in seen:
+            message = f"Reviewer {reviewer_id} is listed twice for manuscript {manuscript_id}"
+        else:
+            seen.add((manuscript_id, reviewer_id))
+            valid.append((manuscript_id, reviewer_id, due_date))
+            continue
+        errors.append({'index': index, 'message': message})
+
+    if errors:
+        raise AssignmentError("Invalid assignments", sorted(errors, key=lambda error: error['index']))
+    return manuscripts, profiles, valid
+
+
+def assign_reviewers(journal, items, actor):
+    """
+    Validate and create the assignments in `items`, each a dict with
+    manuscript_id, reviewer_id and an optional due_date. Returns
+    [(assignment, event, anchor_job)] in request order.
+    """
+    manuscripts, profiles, valid = validate(journal, items)
+
+    with transaction.atomic():
+        assignments = ReviewerAssignment.objects.bulk_create([
+            ReviewerAssignment(
+                manuscript_id=manuscript_id,
+                reviewer_id=reviewer_id,
+                status=ReviewerAssignment.Status.PENDING,
+                due_date=due_date
+            )
+            for manuscript_id, reviewer_id, due_date in valid
+        ])
+
+        metadata = []
+        for assignment in assignments:
+            reviewer = profiles[assignment.reviewer_id]
+            metadata.append({
+                'reviewer_id': str(reviewer.id),
+                'reviewer_name': f"{reviewer.first_name} {reviewer.last_name}",
+                'reviewer_email': reviewer.email
+            })
+        events = eventstore.append_many([
+            ManuscriptEvent(
+                manuscript_id=assignment.manuscript_id,
+                event_type=ManuscriptEvent.EventType.REVIEWER_ASSIGNED,
+                actor=actor,
+                txn_hash='',
+                metadata=data
+            )
+            for assignment, data in zip(assignments, metadata)
+        ])
+        jobs = anchor_reviewer_assignments([
+            (event, assignment.manuscript_id, assignment.reviewer_id, data)
+            for event, assignment, data in zip(events, assignments, metadata)
+        ])
+
+        # bulk_create skips the signals that keep these up to date for single assignments
+        deltas = {}
+        for assignment in assignments:
+            deltas[assignment.reviewer_id] = deltas.get(assignment.reviewer_id, 0) + 1
+        ReviewerWorkload.adjust(deltas)
+
+        transaction.on_commit(lambda: reviewers.refresh_reviewers(list(deltas)))
+
+    for assignment in assignments:
+        assignment.manuscript = manuscripts[assignment.manuscript_id]
+        assignment.reviewer = profiles[assignment.reviewer_id]
+    return list(zip(assignments, events, jobs))
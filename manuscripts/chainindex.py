@@ -0,0 +1,194 @@
+"""
+Contract events read back from the chain into local tables.
+
+index_logs() pulls the contract's logs in ranges of INDEXER_BATCH_BLOCKS
+blocks from a per-contract ChainCursor onwards and stores them as ChainLog
+rows, with the manuscript, actor, event type and Merkle root copied into
+indexed columns. Lookups and verifications then read those rows instead of
+calling the node.
+
+Blocks near the head can still be replaced. The hash of the last block of
+each range is kept as a ChainBlock for INDEXER_REORG_DEPTH blocks, and
+every pass first checks the newest one against the chain. If it was
+replaced, the indexer walks back to the newest stored block that is still
+on the chain, deletes everything indexed after it and reads those blocks
+again. A reorg deeper than every stored block raises ReorgTooDeep.
+
+JournalContractV2 emits keccak256 keys of the manuscript and actor ids
+rather than the ids, so lookups by id match either form, and it logs each
+published manuscript with its submitter, which makes submitter lookups a
+local query as well.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from manuscripts.contracts import id_key
+from manuscripts.models import ChainBlock, ChainCursor, ChainLog
+
+# Event arguments naming the actor, as the v1 and v2 contracts call them
+ACTOR_ARGS = ('reviewerId', 'authorId', 'actorId', 'reviewerKey', 'authorKey', 'actorKey', 'submitter')
+
+
+class ReorgTooDeep(Exception):
+    pass
+
+
+def log_row(contract, log):
+    """ChainLog for a plain_log() dict"""
+    args = log['args']
+    actor = next((args[name] for name in ACTOR_ARGS if name in args), '')
+    return ChainLog(
+        contract=contract,
+        block_number=log['blockNumber'],
+        block_hash=log['blockHash'],
+        transaction_hash=log['transactionHash'],
+        log_index=log['logIndex'],
+        event=log['event'],
+        manuscript_key=str(args.get('manuscriptId', args.get('manuscriptKey', '')))[:100],
+        actor_key=str(actor).lower()[:100],
+        event_type=str(args.get('eventType', ''))[:50],
+        root=str(args.get('root', '')).lower(),
+        args=args,
+    )
+
+
+def rewind(backend, cursor):
+    """
+    Undo what was indexed from blocks the chain has since replaced.
+    Returns the number of blocks that will be read again.
+    """
+    blocks = ChainBlock.objects.filter(contract=cursor.contract).order_by('-number')
+    newest = blocks.first()
+    if newest is None or backend.block_hash(newest.number) == newest.hash:
+        return 0
+
+    fork = None
+    for number, block_hash in blocks.values_list('number', 'hash')[1:]:
+        if backend.block_hash(number) == block_hash:
+            fork = number
+            break
+    if fork is None:
+        raise ReorgTooDeep(
+            f"None of the indexed blocks of {cursor.contract} is still on the chain, "
+            f"the reorg is deeper than the blocks kept"
+        )
+
+    with transaction.atomic():
+        ChainLog.objects.filter(contract=cursor.contract, block_number__gt=fork).delete()
+        blocks.filter(number__gt=fork).delete()
+        rewound = cursor.next_block - fork - 1
+        cursor.next_block = fork + 1
+        cursor.block_hash = backend.block_hash(fork) or ''
+        cursor.save(update_fields=['next_block', 'block_hash', 'updated'])
+    return rewound
+
+
+def _store(cursor, logs, to_block, to_hash, reorg_depth):
+    with transaction.atomic():
+        ChainLog.objects.bulk_create([log_row(cursor.contract, log) for log in logs], ignore_conflicts=True)
+        ChainBlock.objects.update_or_create(contract=cursor.contract, number=to_block, defaults={'hash': to_hash})
+
+        # Keep the blocks within the reorg depth and the newest one below it
+        blocks = ChainBlock.objects.filter(contract=cursor.contract)
+        floor = (
+            blocks.filter(number__lt=to_block - reorg_depth)
+            .order_by('-number')
+            .values_list('number', flat=True)
+            .first()
+        )
+        if floor is not None:
+            blocks.filter(number__lt=floor).delete()
+
+        cursor.next_block = to_block + 1
+        cursor.block_hash = to_hash
+        cursor.save(update_fields=['next_block', 'block_hash', 'updated'])
+
+
+def index_logs(backend, contract=None, batch_blocks=None, reorg_depth=None, max_blocks=None):
+    """
+    One indexing pass up to the current head, or `max_blocks` blocks past
+    the cursor. Returns a dict with the head, the next block to read, the
+    number of logs stored and of blocks rewound after a reorg.
+    """
+    contract = contract or settings.W3_CONTRACT_ADDRESS
+    batch_blocks = batch_blocks or settings.INDEXER_BATCH_BLOCKS
+    reorg_depth = settings.INDEXER_REORG_DEPTH if reorg_depth is None else reorg_depth
+
+    cursor, _ = ChainCursor.objects.get_or_create(
+        contract=contract,
+        defaults={'next_block': settings.INDEXER_START_BLOCK}
+    )
+    rewound = rewind(backend, cursor)
+
+    head = backend.block_number()
+    if max_blocks is not None:
+        head = min(head, cursor.next_block + max_blocks - 1)
+
+    stored = 0
+    span = batch_blocks
+    while cursor.next_block <= head:
+        from_block = cursor.next_block
+        to_block = min(from_block + span - 1, head)
+        to_hash = backend.block_hash(to_block)
+        if to_hash is None:
+            # The node has not caught up with the head it reported
+            break
+        try:
+            logs = backend.get_logs(contract, from_block, to_block)
+        except Exception:
+            # Nodes cap the size of a getLogs answer, retry with a smaller range
+            if to_block == from_block:
+                raise
+            span = max(1, (to_block - from_block + 1) // 2)
+            continue
+        if backend.block_hash(to_block) != to_hash:
+            # The range changed while it was read
+            continue
+
+        _store(cursor, logs, to_block, to_hash, reorg_depth)
+        stored += len(logs)
+        span = batch_blocks
+
+    return {'head': head, 'next_block': cursor.next_block, 'logs': stored, 'rewound': rewound}
+
+
+def reset(contract, from_block):
+    """Forget everything indexed from `from_block` on, so it is read again"""
+    with transaction.atomic():
+        ChainLog.objects.filter(contract=contract, block_number__gte=from_block).delete()
+        ChainBlock.objects.filter(contract=contract, number__gte=from_block).delete()
+        ChainCursor.objects.update_or_create(contract=contract, defaults={'next_block': from_block, 'block_hash': ''})
+
+
+def id_keys(value):
+    """The id as v1 contracts log it, and the key v2 logs for it"""
+    return [str(value), '0x' + id_key(value).hex()]
+
+
+def manuscript_logs(manuscript_id):
+    """Indexed contract events of a manuscript, newest first"""
+    return ChainLog.objects.filter(manuscript_key__in=id_keys(manuscript_id)).order_by('-block_number', '-log_index')
+
+
+def job_logs(job):
+    """Indexed events written by an anchor job's transaction for its manuscript"""
+    if not job.txn_hash:
+        return ChainLog.objects.none()
+    return ChainLog.objects.filter(
+        transaction_hash=job.txn_hash.lower(),
+        manuscript_key__in=id_keys(job.event.manuscript_id)
+    ).order_by('log_index')
+
+
+def root_anchored(root):
+    """True if a RootAnchored event for `root` has been indexed"""
+    return bool(root) and ChainLog.objects.filter(event='RootAnchored', root=root.lower()).exists()
+
+
+def submitted_manuscripts(address):
+    """ManuscriptPublished events of a submitter's address, oldest first; only JournalContractV2 emits them"""
+    return (
+        ChainLog.objects
+        .filter(event='ManuscriptPublished', actor_key=address.lower())
+        .order_by('block_number', 'log_index')
+    )
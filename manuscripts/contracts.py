@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+
+from django.conf import settings
+from eth_abi import decode, encode
+from eth_utils import collapse_if_tuple, event_abi_to_log_topic, function_abi_to_4byte_selector, keccak
+
+
+class FunctionEncoder:
+    """Encodes calldata for one contract function with its selector and argument types resolved up front"""
+
+    def __init__(self, fn_abi):
+        self.name = fn_abi['name']
+        self.types = [collapse_if_tuple(arg) for arg in fn_abi['inputs']]
+        self.selector = function_abi_to_4byte_selector(fn_abi)
+
+    def __call__(self, *args):
+        return '0x' + (self.selector + encode(self.types, args)).hex()
+
+    def decode(self, data):
+        """Arguments from calldata produced by this encoder"""
+        return decode(self.types, data[4:])
+
+
+class LoadedAbi:
+    def __init__(self, path, mtime, abi):
+        self.path = path
+        self.mtime = mtime
+        self.abi = abi
+        self.hash = hashlib.sha256(json.dumps(abi, sort_keys=True).encode()).hexdigest()
+        self.encoders = {
+            item['name']: FunctionEncoder(item)
+            for item in abi
+            if item.get('type') == 'function'
+        }
+        self.selectors = {encoder.selector: encoder for encoder in self.encoders.values()}
+        # Event name by topic 0, to tell which event a raw log is
+        self.events = {
+            event_abi_to_log_topic(item): item['name']
+            for item in abi
+            if item.get('type') == 'event' and not item.get('anonymous')
+        }
+        # JournalContractV2 emits keccak256 keys of manuscript and actor ids instead of the id strings
+        self.hashed_ids = 'ManuscriptPublished' in self.events.values()
+
+
+def abi_path(address):
+    """
+    ABI file of the contract at `address`: W3_CONTRACT_ABI for W3_CONTRACT_ADDRESS,
+    else its INDEXER_CONTRACT_ABIS entry. Raises ValueError for any other address.
+    """
+    if address.lower() == settings.W3_CONTRACT_ADDRESS.lower():
+        return settings.W3_CONTRACT_ABI
+    for configured, path in settings.INDEXER_CONTRACT_ABIS.items():
+        if configured.lower() == address.lower():
+            return path
+    raise ValueError(f"No ABI for contract {address}, add its ABI file to INDEXER_CONTRACT_ABIS")
+
+
+def id_key(value):
+    """keccak256 of an id string, as JournalContractV2 computes the indexed manuscript and actor topics"""
+    return keccak(text=str(value))
+
+
+class ContractRegistry:
+    """
+    Process-wide cache of contract ABIs and web3 contract objects.
+    ABI files are parsed once and only re-read when their mtime changes.
+    Contract objects are keyed by address and ABI hash.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._abis = {}
+        self._contracts = {}
+
+    def abi(self, path=None):
+        path = path or settings.W3_CONTRACT_ABI
+        mtime = os.stat(path).st_mtime_ns
+        loaded = self._abis.get(path)
+        if loaded is not None and loaded.mtime == mtime:
+            return loaded
+
+        with self._lock:
+            loaded = self._abis.get(path)
+            if loaded is None or loaded.mtime != mtime:
+                with open(path, 'r') as f:
+                    compiled_contract = json.load(f)
+                loaded = LoadedAbi(path, mtime, compiled_contract['abi'])
+                self._abis[path] = loaded
+        return loaded
+
+    def contract(self, web3, address=None, path=None):
+        address = address or settings.W3_CONTRACT_ADDRESS
+        loaded = self.abi(path)
+        key = (id(web3), address, loaded.hash)
+        contract = self._contracts.get(key)
+        if contract is None:
+            with self._lock:
+                contract = self._contracts.setdefault(key, web3.eth.contract(address=address, abi=loaded.abi))
+        return contract
+
+    def encoder(self, fn_name, path=None):
+        try:
+            return self.abi(path).encoders[fn_name]
+        except KeyError:
+            raise ValueError(f"Function {fn_name} not found in contract ABI")
+
+    def clear(self):
+        with self._lock:
+            self._abis.clear()
+            self._contracts.clear()
+
+
+registry = ContractRegistry()
@@ -0,0 +1,106 @@
+"""
+Responses for downloading stored manuscript files.
+
+Files are never read into memory: full downloads stream from disk, range
+requests stream only the requested slice, and with FILE_DOWNLOAD_OFFLOAD
+set the web server sends the bytes itself. The content hash is the ETag,
+so If-None-Match and If-Range are answered without touching the file.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags
+
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single byte range, None to send the whole
+    file, or ValueError if the range cannot be satisfied. Multi-range
+    requests are answered with the whole file.
+    """
+    match = RANGE_RE.match((header or '').replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def _read_slice(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining:
+            block = f.read(min(settings.CHUNKED_UPLOAD_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _offloaded(manuscript_file):
+    response = HttpResponse(content_type=DOCX_CONTENT_TYPE)
+    if settings.FILE_DOWNLOAD_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_ACCEL_PREFIX + manuscript_file.path
+    else:
+        response['X-Sendfile'] = default_storage.path(manuscript_file.path)
+    return response
+
+
+def file_response(request, manuscript_file, immutable=False):
+    """Download response for a ManuscriptFile, honouring conditional and range headers"""
+    etag = manuscript_file.etag
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    elif settings.FILE_DOWNLOAD_OFFLOAD:
+        # The web server handles Range itself
+        response = _offloaded(manuscript_file)
+    else:
+        path = default_storage.path(manuscript_file.path)
+        size = os.path.getsize(path)
+
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if 'Range' in request.headers and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_range(request.headers['Range'], size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=DOCX_CONTENT_TYPE)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_slice(path, start, end - start + 1),
+                status=206,
+                content_type=DOCX_CONTENT_TYPE
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(True, manuscript_file.filename)
+    # A numbered version never changes; "latest" has to be revalidated
+    response['Cache-Control'] = 'private, max-age=31536000, immutable' if immutable else 'private, no-cache'
+    return response
@@ -0,0 +1,175 @@
+"""
+The manuscript event log: replay, snapshots and audits.
+
+Every ManuscriptEvent has a per-manuscript sequence number and
+Manuscript.event_sequence points at the newest one. Manuscript.create_event()
+appends with an optimistic check on that pointer and applies the event's
+status change in the same statement, so the status column is always the
+fold of the log; Manuscript.save() raises EventSourcedFieldError rather
+than write either column. Bulk writers append through append_many().
+
+Every EVENT_SNAPSHOT_INTERVAL events the folded state is stored as a
+ManuscriptSnapshot. Replaying a manuscript starts from the newest snapshot
+and applies only the events after it, so rebuilding or auditing state costs
+the length of the tail rather than of the whole history.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from manuscripts import streams
+from manuscripts.models import EventSequenceConflict, Manuscript, ManuscriptEvent, ManuscriptSnapshot
+from openPublisher import response_cache
+
+
+def initial_state():
+    return {
+        'sequence': 0,
+        'status': Manuscript.Status.SUBMISSION,
+        'reviewers': [],
+        'reviews': 0,
+        'corrections': 0,
+        'last_event_at': None,
+    }
+
+
+def apply(state, event):
+    """State after `event`, which must be the next event in the log"""
+    if event.sequence != state['sequence'] + 1:
+        raise EventSequenceConflict(
+            f"Event {event.pk} has sequence {event.sequence}, expected {state['sequence'] + 1}"
+        )
+    state = dict(state, sequence=event.sequence, last_event_at=event.timestamp.isoformat())
+    state['status'] = ManuscriptEvent.STATUS_TRANSITIONS.get(event.event_type, state['status'])
+
+    if event.event_type == ManuscriptEvent.EventType.REVIEWER_ASSIGNED:
+        reviewer_id = str((event.metadata or {}).get('reviewer_id', ''))
+        if reviewer_id and reviewer_id not in state['reviewers']:
+            state['reviewers'] = state['reviewers'] + [reviewer_id]
+    elif event.event_type == ManuscriptEvent.EventType.REVIEW_SUBMITTED:
+        state['reviews'] += 1
+    elif event.event_type == ManuscriptEvent.EventType.CORRECTIONS_SUBMITTED:
+        state['corrections'] += 1
+    return state
+
+
+def replay(manuscript_id, upto=None):
+    """
+    Fold the log of a manuscript up to sequence `upto` (default: the end),
+    starting from the newest snapshot at or before it
+    """
+    snapshots = ManuscriptSnapshot.objects.filter(manuscript_id=manuscript_id)
+    events = ManuscriptEvent.objects.filter(manuscript_id=manuscript_id, sequence__isnull=False)
+    if upto is not None:
+        snapshots = snapshots.filter(sequence__lte=upto)
+        events = events.filter(sequence__lte=upto)
+
+    snapshot = snapshots.only('sequence', 'state').first()
+    state = snapshot.state if snapshot is not None else initial_state()
+    for event in (
+        events
+        .filter(sequence__gt=state['sequence'])
+        .only('id', 'sequence', 'event_type', 'timestamp', 'metadata')
+        .order_by('sequence')
+    ):
+        state = apply(state, event)
+    return state
+
+
+def take_snapshot(manuscript_id, sequence=None):
+    """Store the state at `sequence` (default: the end of the log) and return it"""
+    state = replay(manuscript_id, upto=sequence)
+    if state['sequence']:
+        ManuscriptSnapshot.objects.get_or_create(
+            manuscript_id=manuscript_id,
+            sequence=state['sequence'],
+            defaults={'state': state}
+        )
+    return state
+
+
+def snapshot_due(sequence):
+    return sequence % settings.EVENT_SNAPSHOT_INTERVAL == 0
+
+
+def append_many(events):
+    """
+    Append unsaved ManuscriptEvents to the logs of their manuscripts with one
+    insert. The manuscripts are locked for the duration, so the sequence
+    numbers are taken under the lock rather than checked optimistically.
+    Returns the saved events in the given order.
+    """
+    with transaction.atomic():
+        manuscripts = (
+            Manuscript.objects
+            .select_for_update()
+            .filter(pk__in={event.manuscript_id for event in events})
+            .only('id', 'status', 'event_sequence', 'journal_id')
+            .order_by('pk')
+            .in_bulk()
+        )
+        for event in events:
+            manuscript = manuscripts[event.manuscript_id]
+            manuscript.event_sequence += 1
+            manuscript.status = ManuscriptEvent.STATUS_TRANSITIONS.get(event.event_type, manuscript.status)
+            manuscript.updated = timezone.now()
+            event.sequence = manuscript.event_sequence
+
+        events = ManuscriptEvent.objects.bulk_create(events)
+        Manuscript.objects.bulk_update(manuscripts.values(), ['status', 'event_sequence', 'updated'])
+        response_cache.bump(*{('journal', manuscript.journal_id_id) for manuscript in manuscripts.values()})
+
+        due = [(event.manuscript_id, event.sequence) for event in events if snapshot_due(event.sequence)]
+
+        def take_due_snapshots():
+            for manuscript_id, sequence in due:
+                take_snapshot(manuscript_id, sequence)
+        transaction.on_commit(take_due_snapshots)
+        # bulk_create() sends no post_save, wake the streams here instead
+        transaction.on_commit(streams.broker.notify)
+    return events
+
+
+def audit(manuscript):
+    """Replay a manuscript's log and compare the result with its stored status and sequence"""
+    state = replay(manuscript.pk)
+    return {
+        'manuscript_id': manuscript.pk,
+        'state': state,
+        'stored_status': manuscript.status,
+        'stored_sequence': manuscript.event_sequence,
+        'consistent': state['status'] == manuscript.status and state['sequence'] == manuscript.event_sequence,
+    }
+
+
+@transaction.atomic
+def backfill(manuscript_id):
+    """
+    Number the events of a manuscript that predate sequence numbers, in
+    (timestamp, id) order, and rebuild its snapshots. Returns the audit of
+    the result; the stored status is only changed by repair().
+    """
+    manuscript = Manuscript.objects.select_for_update().get(pk=manuscript_id)
+    events = list(manuscript.events.order_by('timestamp', 'id').only('id', 'sequence'))
+    if any(event.sequence is None for event in events):
+        # Clear first so renumbering cannot collide with the unique constraint
+        manuscript.events.update(sequence=None)
+        for number, event in enumerate(events, start=1):
+            event.sequence = number
+        ManuscriptEvent.objects.bulk_update(events, ['sequence'], batch_size=500)
+        manuscript.snapshots.all().delete()
+
+    Manuscript.objects.filter(pk=manuscript_id).update(event_sequence=len(events))
+    manuscript.set_event_sourced(event_sequence=len(events))
+    for sequence in range(settings.EVENT_SNAPSHOT_INTERVAL, len(events) + 1, settings.EVENT_SNAPSHOT_INTERVAL):
+        take_snapshot(manuscript_id, sequence)
+    return audit(manuscript)
+
+
+def repair(manuscript):
+    """Set the stored status from the replayed log"""
+    state = replay(manuscript.pk)
+    Manuscript.objects.filter(pk=manuscript.pk).update(status=state['status'], event_sequence=state['sequence'])
+    manuscript.set_event_sourced(status=state['status'], event_sequence=state['sequence'])
+    return state
+
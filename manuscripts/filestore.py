@@ -0,0 +1,92 @@
+"""
+Content-addressed store for manuscript files.
+
+Files are hashed while they are streamed to a temporary file and then moved
+to a path derived from their SHA-256, so identical uploads are kept once
+however many times they are submitted. The digest doubles as the file's
+identity in on-chain metadata and can be checked against the stored bytes
+at any time.
+
+Like chunked uploads this relies on local paths (FileSystemStorage).
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+BLOB_ROOT = 'blobs'
+
+
+def blob_path(digest):
+    """Storage path of the file with SHA-256 `digest`"""
+    return f'{BLOB_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def _commit(local_path, digest):
+    """Move a fully written file into place under its digest, dropping it if that content is already stored"""
+    final_path = default_storage.path(blob_path(digest))
+    if os.path.exists(final_path):
+        os.remove(local_path)
+        # A fresh mtime tells remove_unreferenced() the content is about to be referenced again
+        os.utime(final_path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(local_path, final_path)
+        if settings.FILE_UPLOAD_PERMISSIONS is not None:
+            os.chmod(final_path, settings.FILE_UPLOAD_PERMISSIONS)
+    return blob_path(digest)
+
+
+def store(chunks):
+    """
+    Store the bytes yielded by `chunks` (e.g. UploadedFile.chunks()).
+    Returns (sha256, size, path).
+    """
+    tmp_dir = default_storage.path(f'{BLOB_ROOT}/tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as f:
+        try:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    sha256 = digest.hexdigest()
+    return sha256, size, _commit(f.name, sha256)
+
+
+def adopt(path, sha256):
+    """Move an already hashed file at storage `path` into the store, returns its new path"""
+    return _commit(default_storage.path(path), sha256)
+
+
+def remove_unreferenced(digest, referenced, older_than):
+    """
+    Delete the file of `digest` if `referenced()` is false and it was last
+    stored before the POSIX time `older_than`. Returns True if it was deleted.
+    """
+    path = default_storage.path(blob_path(digest))
+    try:
+        if os.path.getmtime(path) >= older_than or referenced():
+            return False
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def digest_of(path):
+    """SHA-256 of a stored file, read in fixed size blocks"""
+    digest = hashlib.sha256()
+    with default_storage.open(path, 'rb') as f:
+        for block in iter(lambda: f.read(settings.CHUNKED_UPLOAD_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
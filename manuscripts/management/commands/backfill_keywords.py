@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from manuscripts.models import Manuscript
+
+
+class Command(BaseCommand):
+    help = "Fill the normalized keyword tables from the keywords JSON of existing manuscripts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Manuscripts synced per transaction")
+
+    def handle(self, *args, **options):
+        manuscripts = Manuscript.objects.only('id', 'keywords', 'journal_id').order_by('pk')
+        size = options['batch_size']
+        synced = 0
+        last_pk = 0
+        while True:
+            batch = list(manuscripts.filter(pk__gt=last_pk)[:size])
+            if not batch:
+                break
+            with transaction.atomic():
+                for manuscript in batch:
+                    manuscript.sync_keywords()
+            synced += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(f"Synced keywords of {synced} manuscripts")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from manuscripts.uploads import clean_abandoned
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads abandoned for CHUNKED_UPLOAD_EXPIRY seconds, with their files"
+
+    def handle(self, *args, **options):
+        deleted = clean_abandoned()
+        self.stdout.write(f"Deleted {deleted} abandoned uploads")
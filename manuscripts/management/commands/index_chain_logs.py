@@ -0,0 +1,67 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from manuscripts import chainindex
+from manuscripts.backends import LogRecorder, RecordedLogs, get_backend
+from manuscripts.contracts import abi_path
+
+
+class Command(BaseCommand):
+    help = "Copy the journal contract's events into the local log index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Index up to the current head once and exit")
+        parser.add_argument('--interval', type=float, default=settings.INDEXER_POLL_INTERVAL,
+                            help="Seconds to sleep between passes")
+        parser.add_argument('--batch-blocks', type=int, default=settings.INDEXER_BATCH_BLOCKS,
+                            help="Blocks per eth_getLogs call")
+        parser.add_argument('--reorg-depth', type=int, default=settings.INDEXER_REORG_DEPTH,
+                            help="Blocks behind the head that may still be replaced")
+        parser.add_argument('--contract', default=settings.W3_CONTRACT_ADDRESS)
+        parser.add_argument('--from-block', type=int,
+                            help="Drop what was indexed from this block on and read it again")
+        parser.add_argument('--record', metavar='PATH', help="Also save the logs read to a file for --replay")
+        parser.add_argument('--replay', metavar='PATH', help="Read logs from a --record file instead of the node")
+
+    def handle(self, *args, **options):
+        if options['record'] and options['replay']:
+            raise CommandError("--record and --replay cannot be combined")
+
+        if options['replay']:
+            backend = RecordedLogs(options['replay'])
+        else:
+            try:
+                abi_path(options['contract'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            backend = get_backend()
+        if options['record']:
+            backend = LogRecorder(backend)
+
+        if options['from_block'] is not None:
+            chainindex.reset(options['contract'], options['from_block'])
+            self.stdout.write(f"Indexing {options['contract']} again from block {options['from_block']}")
+
+        while True:
+            try:
+                stats = chainindex.index_logs(
+                    backend,
+                    contract=options['contract'],
+                    batch_blocks=options['batch_blocks'],
+                    reorg_depth=options['reorg_depth']
+                )
+            except chainindex.ReorgTooDeep as e:
+                raise CommandError(f"{e}; run again with --from-block to rebuild the index")
+            if options['record']:
+                backend.save(options['record'])
+            if stats['logs'] or stats['rewound']:
+                self.stdout.write(
+                    f"Indexed {stats['logs']} log(s) up to block {stats['next_block'] - 1}, "
+                    f"rewound {stats['rewound']} block(s)"
+                )
+
+            if options['once'] or options['replay']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from manuscripts import eventstore
+from manuscripts.models import Manuscript
+
+
+class Command(BaseCommand):
+    help = "Number unsequenced manuscript events, rebuild snapshots and report status drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help="Set drifted manuscript statuses from their replayed logs")
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        for manuscript_id in Manuscript.objects.order_by('pk').values_list('pk', flat=True).iterator():
+            report = eventstore.backfill(manuscript_id)
+            checked += 1
+            if report['consistent']:
+                continue
+            drifted += 1
+            self.stdout.write(
+                f"Manuscript {manuscript_id}: stored {report['stored_status']}, "
+                f"log replays to {report['state']['status']} at sequence {report['state']['sequence']}"
+            )
+            if options['repair']:
+                eventstore.repair(Manuscript.objects.get(pk=manuscript_id))
+
+        summary = f"Checked {checked} manuscripts, {drifted} drifted"
+        if options['repair'] and drifted:
+            summary += ", repaired"
+        self.stdout.write(summary)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from manuscripts.models import Manuscript, ManuscriptDocument
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed detail documents of all manuscripts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Manuscripts rebuilt per transaction")
+        parser.add_argument('--missing', action='store_true', help="Only build documents that do not exist yet")
+
+    def handle(self, *args, **options):
+        manuscripts = Manuscript.objects.order_by('pk')
+        if options['missing']:
+            manuscripts = manuscripts.filter(document__isnull=True)
+        manuscript_ids = list(manuscripts.values_list('pk', flat=True))
+
+        size = options['batch_size']
+        for start in range(0, len(manuscript_ids), size):
+            with transaction.atomic():
+                ManuscriptDocument.refresh(manuscript_ids[start:start + size])
+        self.stdout.write(f"Rebuilt {len(manuscript_ids)} manuscript documents")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from manuscripts import reviewers
+
+
+class Command(BaseCommand):
+    help = "Rebuild the reviewer keyword vectors used for reviewer recommendations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Reviewers rebuilt per batch")
+
+    def handle(self, *args, **options):
+        count = reviewers.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f"Built keyword vectors for {count} reviewers")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from manuscripts import search
+
+
+class Command(BaseCommand):
+    help = "Index every manuscript for full-text search, skipping those already up to date"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Manuscripts loaded per query")
+        parser.add_argument(
+            '--doc-freqs', action='store_true',
+            help="Only recount term document frequencies; run this periodically, e.g. from cron"
+        )
+
+    def handle(self, *args, **options):
+        if options['doc_freqs']:
+            changed = search.refresh_doc_freqs()
+            self.stdout.write(f"Recounted document frequencies, {changed} terms changed")
+            return
+        indexed = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f"Indexed {indexed} manuscripts")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from manuscripts.models import ReviewerWorkload
+
+
+class Command(BaseCommand):
+    help = "Reset the per-reviewer open assignment counters from the assignments themselves"
+
+    def handle(self, *args, **options):
+        count = ReviewerWorkload.recount()
+        self.stdout.write(f"{count} reviewers have open assignments")
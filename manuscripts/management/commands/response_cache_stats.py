@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from openPublisher import response_cache
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters of the versioned response cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Clear the counters after printing them")
+
+    def handle(self, *args, **options):
+        for name, counts in response_cache.stats().items():
+            total = counts['hits'] + counts['misses']
+            ratio = counts['hits'] / total if total else 0
+            self.stdout.write(f"{name:<22} hits {counts['hits']:>8}  misses {counts['misses']:>8}  hit ratio {ratio:.1%}")
+        if options['reset']:
+            response_cache.reset_stats()
@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from manuscripts.anchoring import broadcast_batch, broadcast_pending, confirm_broadcast, requeue_failed
+from manuscripts.sepolia import Sepolia
+
+# Contract functions an anchoring mode calls, missing from the JournalContract deployed before batching
+MODE_FUNCTIONS = {
+    'batch': ['recordEvents'],
+    'merkle': ['anchorRoot'],
+}
+
+
+class Command(BaseCommand):
+    help = "Sign, broadcast and confirm queued on-chain anchor jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process the queue once and exit")
+        parser.add_argument('--interval', type=float, default=settings.ANCHOR_POLL_INTERVAL,
+                            help="Seconds to sleep between polls")
+        parser.add_argument('--limit', type=int, default=50, help="Maximum jobs to broadcast per poll")
+        parser.add_argument('--mode', choices=['single', 'batch', 'merkle'], default=settings.ANCHOR_MODE,
+                            help="Send one transaction per event, batch them, or anchor a Merkle root per batch")
+        parser.add_argument('--batch-size', type=int, default=settings.ANCHOR_BATCH_SIZE)
+        parser.add_argument('--batch-window', type=float, default=settings.ANCHOR_BATCH_WINDOW,
+                            help="Seconds a partial batch waits for more events")
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Queue failed jobs again, except reverted ones, before starting")
+
+    def handle(self, *args, **options):
+        sepolia = Sepolia()
+        required = MODE_FUNCTIONS.get(options['mode'], [])
+        missing = [fn_name for fn_name, found in sepolia.deployed_functions(required).items() if not found]
+        if missing:
+            raise CommandError(
+                f"The contract at {settings.W3_CONTRACT_ADDRESS} has no {', '.join(missing)}, which "
+                f"--mode {options['mode']} needs. Deploy the current JournalContract.sol with "
+                f"`runscript web3_compile_contract` and point W3_CONTRACT_ADDRESS at it, or use --mode single."
+            )
+
+        nonce = sepolia.nonces.sync()
+        self.stdout.write(f"Nonce counter synced with chain at {nonce}")
+        if options['retry_failed']:
+            self.stdout.write(f"Queued {requeue_failed()} failed job(s) again")
+
+        while True:
+            if options['mode'] in ('batch', 'merkle'):
+                sent = broadcast_batch(
+                    sepolia,
+                    size=options['batch_size'],
+                    window=options['batch_window'],
+                    use_merkle=options['mode'] == 'merkle'
+                )
+            else:
+                sent = broadcast_pending(sepolia, limit=options['limit'])
+            settled = confirm_broadcast(sepolia)
+            if sent or settled:
+                self.stdout.write(f"Broadcast {sent} job(s), settled {settled} job(s)")
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
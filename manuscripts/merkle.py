@@ -0,0 +1,75 @@
+"""
+Merkle trees over anchored manuscript events.
+
+Only the root of each batch is written on chain. Each event keeps the sibling
+hashes needed to rebuild that root, so its inclusion can be checked offline.
+Leaves and inner nodes are hashed with different prefixes so an inner node can
+never be passed off as a leaf.
+"""
+import hashlib
+import json
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def _sha256(data):
+    return hashlib.sha256(data).digest()
+
+
+def leaf_hash(record):
+    """Hash of an event record, serialized as compact JSON so it is reproducible"""
+    payload = json.dumps(list(record), separators=(',', ':'), sort_keys=True).encode()
+    return _sha256(LEAF_PREFIX + payload)
+
+
+def node_hash(left, right):
+    return _sha256(NODE_PREFIX + left + right)
+
+
+def build_levels(leaves):
+    """
+    Returns every level of the tree, leaves first and root last.
+    An unpaired node at the end of a level is carried up unchanged.
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(leaves):
+    return build_levels(leaves)[-1][0]
+
+
+def merkle_proof(levels, index):
+    """Sibling hashes from leaf `index` up to the root, as [{'hash': '0x...', 'position': 'left'|'right'}]"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({
+                'hash': '0x' + level[sibling].hex(),
+                'position': 'left' if sibling < index else 'right',
+            })
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    """True if `leaf` and the sibling hashes in `proof` rebuild `root`"""
+    current = leaf
+    for step in proof:
+        sibling = bytes.fromhex(step['hash'].removeprefix('0x'))
+        if step['position'] == 'left':
+            current = node_hash(sibling, current)
+        else:
+            current = node_hash(current, sibling)
+    return current == root
@@ -1,12 +1,19 @@
+import hashlib
 import json
+import math
+import uuid
 
 from django.core import serializers
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
 from accounts.models import Profile
-from django.db import models
 from django.contrib.auth import get_user_model
 
 from journals.models import Journal
+from manuscripts.filestore import blob_path, digest_of
+from openPublisher import response_cache
+from openPublisher.bulk import upsert
 
 User = get_user_model()
 
@@ -17,10 +24,39 @@ class Author(models.Model):
     affiliation = models.CharField(max_length=50)
     is_primary = models.BooleanField(default=False)
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'email': self.email,
+            'affiliation': self.affiliation
+        }
+
     def __str__(self):
         return self.last_name
 
 
+class Keyword(models.Model):
+    """A manuscript keyword, normalized to lower case with single spaces"""
+    name = models.CharField(max_length=100, unique=True)
+
+    @staticmethod
+    def normalize(value):
+        return ' '.join(str(value).split()).lower()[:100]
+
+    def __str__(self):
+        return self.name
+
+
+class EventSequenceConflict(Exception):
+    """Another event was appended to the manuscript since the expected sequence number"""
+
+
+class EventSourcedFieldError(Exception):
+    """A manuscript's status or event sequence was changed other than by appending an event"""
+
+
 class Manuscript(models.Model):
     class Status(models.TextChoices):
         SUBMISSION = 'SUBMISSION', 'Submission'
@@ -52,23 +88,100 @@ class Manuscript(models.Model):
         through='manuscripts.ReviewerAssignment'
     )
 
-    def create_event(self, event_type, actor, txn_hash, description='', metadata=None,):
+    # Sequence number of the last event in the manuscript's log
+    event_sequence = models.PositiveIntegerField(default=0)
+
+    # Normalized copy of `keywords`, kept in sync on save so manuscripts can be looked up by keyword
+    keyword_tags = models.ManyToManyField(
+        'Keyword',
+        related_name='manuscripts',
+        blank=True,
+        through='manuscripts.ManuscriptKeyword'
+    )
+
+    class Meta:
+        indexes = [
+            # Journal manuscript list, newest first, optionally narrowed to one status
+            models.Index(fields=['journal_id', '-submitted', '-id']),
+            models.Index(fields=['journal_id', 'status', '-submitted', '-id']),
+        ]
+
+    # Projections of the event log, written only by create_event()
+    EVENT_SOURCED_FIELDS = ('status', 'event_sequence')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.set_event_sourced()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.set_event_sourced()
+
+    def set_event_sourced(self, **values):
         """
-        Create a new event for this manuscript
+        Set status and event_sequence to values already written by the event
+        log (or remember the loaded ones), so save() knows they are not edits
         """
-        return ManuscriptEvent.objects.create(
-            manuscript=self,
-            event_type=event_type,
-            actor=actor,
-            txn_hash=txn_hash,
-            description=description,
-            metadata=metadata or {}
-        )
+        for name, value in values.items():
+            setattr(self, name, value)
+        self._event_sourced = {
+            name: self.__dict__[name] for name in self.EVENT_SOURCED_FIELDS if name in self.__dict__
+        }
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            loaded = getattr(self, '_event_sourced', {})
+            changed = [name for name, value in loaded.items() if getattr(self, name) != value]
+            if changed:
+                raise EventSourcedFieldError(
+                    f"{', '.join(changed)} of manuscript {self.pk} can only change by appending an event"
+                )
+            if kwargs.get('update_fields') is None:
+                # Left out even when unchanged, so a stale instance cannot roll back events appended since
+                skipped = set(self.EVENT_SOURCED_FIELDS) | self.get_deferred_fields()
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in skipped and field.attname not in skipped
+                ]
+        super().save(*args, **kwargs)
+        self.set_event_sourced()
+
+    def create_event(self, event_type, actor, txn_hash, description='', metadata=None, expected_sequence=None):
+        """
+        Append an event to this manuscript's log and apply its status change in
+        one transaction; the read model is rebuilt when it commits. The append only
+        succeeds while the log is still at `expected_sequence`, by default the
+        sequence this instance was loaded with; otherwise EventSequenceConflict
+        is raised and nothing is written.
+        """
+        expected = self.event_sequence if expected_sequence is None else expected_sequence
+        changes = {'event_sequence': expected + 1, 'updated': timezone.now()}
+        if event_type in ManuscriptEvent.STATUS_TRANSITIONS:
+            changes['status'] = ManuscriptEvent.STATUS_TRANSITIONS[event_type]
+
+        with transaction.atomic():
+            if not Manuscript.objects.filter(pk=self.pk, event_sequence=expected).update(**changes):
+                raise EventSequenceConflict(f"Manuscript {self.pk} has events after sequence {expected}")
+            event = ManuscriptEvent.objects.create(
+                manuscript=self,
+                sequence=expected + 1,
+                event_type=event_type,
+                actor=actor,
+                txn_hash=txn_hash,
+                description=description,
+                metadata=metadata or {}
+            )
+            self.updated = changes.pop('updated')
+            self.set_event_sourced(**changes)
+            ManuscriptDocument.refresh_on_commit([self.pk])
+            # The journal's manuscript list shows status, the manuscript's own version is bumped by refresh()
+            response_cache.bump(('journal', self.journal_id_id))
+        return event
 
     def record_submission(self, actor, txn_hash):
         """Record initial submission"""
-        self.status = self.Status.SUBMISSION
-        self.save()
         return self.create_event(
             ManuscriptEvent.EventType.SUBMISSION,
             actor=actor,
@@ -77,8 +190,6 @@ class Manuscript(models.Model):
 
     def record_acceptance(self, actor, txn_hash, comment=''):
         """Record manuscript acceptance"""
-        self.status = self.Status.ACCEPTED
-        self.save()
         return self.create_event(
             ManuscriptEvent.EventType.ACCEPTANCE,
             actor=actor,
@@ -88,8 +199,6 @@ class Manuscript(models.Model):
 
     def record_rejection(self, actor, txn_hash, reason=''):
         """Record manuscript rejection"""
-        self.status = self.Status.REJECTED
-        self.save()
         return self.create_event(
             ManuscriptEvent.EventType.REJECTION,
             actor=actor,
@@ -99,9 +208,7 @@ class Manuscript(models.Model):
 
     def assign_reviewer(self, reviewer, txn_hash, actor):
         """Record reviewer assignment"""
-        metadata = {'reviewer_id': reviewer.id}
-        self.status = self.Status.REVIEW
-        self.save()
+        metadata = {'reviewer_id': str(reviewer.id)}
         return self.create_event(
             ManuscriptEvent.EventType.REVIEWER_ASSIGNED,
             actor=actor,
@@ -134,18 +241,99 @@ class Manuscript(models.Model):
 
     def publish(self, actor, txn_hash):
         """Record manuscript publication"""
-        self.status = self.Status.PUBLISHED
-        self.save()
         return self.create_event(
             ManuscriptEvent.EventType.PUBLISHED,
             actor=actor,
             txn_hash=txn_hash,
         )
 
+    def keyword_names(self):
+        """Normalized keywords from the JSON field, which holds {'keyword': ...} dicts or plain strings"""
+        names = []
+        for keyword in self.keywords or []:
+            value = keyword.get('keyword') if isinstance(keyword, dict) else keyword
+            name = Keyword.normalize(value or '')
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def sync_keywords(self):
+        """Bring the keyword_tags rows in line with the JSON keywords, returns True if the set changed"""
+        wanted = self.keyword_names()
+        links = {
+            link.keyword.name: link
+            for link in self.keyword_links.select_related('keyword').only('id', 'journal_id', 'keyword__name')
+        }
+
+        stale = [link.pk for name, link in links.items() if name not in wanted]
+        if stale:
+            ManuscriptKeyword.objects.filter(pk__in=stale).delete()
+        if any(link.journal_id != self.journal_id_id for link in links.values()):
+            self.keyword_links.update(journal_id=self.journal_id_id)
+
+        missing = [name for name in wanted if name not in links]
+        if missing:
+            Keyword.objects.bulk_create([Keyword(name=name) for name in missing], ignore_conflicts=True)
+            ManuscriptKeyword.objects.bulk_create([
+                ManuscriptKeyword(manuscript=self, keyword=keyword, journal_id=self.journal_id_id)
+                for keyword in Keyword.objects.filter(name__in=missing)
+            ])
+        return bool(stale or missing)
+
+    def add_file(self, filename, sha256, size, uploaded_by, event=None, kind=None):
+        """Record a stored file as the next version of its kind for this manuscript"""
+        kind = kind or ManuscriptFile.Kind.CORRECTIONS
+        with transaction.atomic():
+            # Lock the manuscript so concurrent uploads cannot take the same version number
+            Manuscript.objects.select_for_update().only('pk').get(pk=self.pk)
+            latest = self.files.filter(kind=kind).aggregate(latest=models.Max('version'))['latest'] or 0
+            return ManuscriptFile.objects.create(
+                manuscript=self,
+                kind=kind,
+                version=latest + 1,
+                filename=filename,
+                sha256=sha256,
+                size=size,
+                uploaded_by=uploaded_by,
+                event=event
+            )
+
+    def can_read_files(self, user):
+        """Editors, the submitter, listed authors and reviewers with a live assignment may read its files"""
+        if user.is_staff or self.submitted_by_id == user.pk:
+            return True
+        if user.email and self.authors.filter(email__iexact=user.email).exists():
+            return True
+        return self.reviewer_assignments.filter(reviewer=user).exclude(
+            status__in=[ReviewerAssignment.Status.DECLINED, ReviewerAssignment.Status.WITHDRAWN]
+        ).exists()
+
+    def file_versions(self, kind=None):
+        """Stored files of one kind, newest version first"""
+        return self.files.filter(kind=kind or ManuscriptFile.Kind.CORRECTIONS)
+
     def get_provenance(self):
         """Get all events for this manuscript in chronological order"""
         return self.events.all()
 
+    def to_document(self):
+        """Body of the manuscript detail endpoint"""
+        return {
+            'id': self.pk,
+            'title': self.title,
+            'abstract': self.abstract,
+            'keywords': [
+                keyword.get('keyword') if isinstance(keyword, dict) else keyword for keyword in self.keywords or []
+            ],
+            'journal_id': self.journal_id_id,
+            'submitted_by': self.submitted_by.email if self.submitted_by else None,
+            'authors': [author.to_dict() for author in self.authors.all()],
+            'submitted': self.submitted,
+            'status': self.status,
+            'sequence': self.event_sequence,
+            'provenance': [event.to_dict() for event in self.get_provenance()]
+        }
+
     def to_json(self):
         return serializers.serialize('json', [self])
 
@@ -196,11 +384,262 @@ class ReviewerAssignment(models.Model):
     class Meta:
         unique_together = ['manuscript', 'reviewer']
         ordering = ['-assigned_date']
+        indexes = [
+            # Keyset pagination of a reviewer's assignments
+            models.Index(fields=['reviewer', 'status', '-assigned_date', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.reviewer} - {self.manuscript} ({self.status})"
 
 
+class ManuscriptKeyword(models.Model):
+    manuscript = models.ForeignKey(
+        'manuscripts.Manuscript',
+        on_delete=models.CASCADE,
+        related_name='keyword_links'
+    )
+    keyword = models.ForeignKey(
+        'manuscripts.Keyword',
+        on_delete=models.CASCADE,
+        related_name='manuscript_links'
+    )
+    # Copied from the manuscript so per-journal keyword counts need no join
+    journal = models.ForeignKey(Journal, on_delete=models.DO_NOTHING, db_constraint=False)
+
+    class Meta:
+        unique_together = ['manuscript', 'keyword']
+        indexes = [
+            models.Index(fields=['journal', 'keyword']),
+            models.Index(fields=['keyword', 'manuscript']),
+        ]
+
+
+class ReviewerKeyword(models.Model):
+    """
+    One non-zero entry of a reviewer's keyword vector: how much of the
+    reviewer's past reviewing was on manuscripts tagged with the keyword.
+    """
+    reviewer = models.ForeignKey(
+        'accounts.Profile',
+        on_delete=models.CASCADE,
+        related_name='reviewer_keywords'
+    )
+    keyword = models.ForeignKey(
+        'manuscripts.Keyword',
+        on_delete=models.CASCADE,
+        related_name='reviewer_links'
+    )
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = ['reviewer', 'keyword']
+        indexes = [
+            # Candidate lookup by the keywords of a manuscript
+            models.Index(fields=['keyword', 'reviewer']),
+        ]
+
+
+class ReviewerVector(models.Model):
+    """Summary of a reviewer's keyword vector, the norm is used to rank by cosine similarity"""
+    reviewer = models.OneToOneField(
+        'accounts.Profile',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reviewer_vector'
+    )
+    norm = models.FloatField(default=0)
+    manuscripts = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class ReviewerWorkload(models.Model):
+    """
+    Running count of a reviewer's pending and accepted assignments, kept up to
+    date on every assignment write so load balancing reads it instead of counting.
+    """
+    OPEN_STATUSES = (ReviewerAssignment.Status.PENDING, ReviewerAssignment.Status.ACCEPTED)
+
+    reviewer = models.OneToOneField(
+        'accounts.Profile',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reviewer_workload'
+    )
+    open_assignments = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def adjust(cls, deltas):
+        """Apply {reviewer_id: change} to the counters, with one UPDATE per distinct change"""
+        deltas = {reviewer_id: delta for reviewer_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        # Only a new assignment can start a counter; a decrement never recreates one for a reviewer being deleted
+        cls.objects.bulk_create(
+            [cls(reviewer_id=reviewer_id) for reviewer_id, delta in deltas.items() if delta > 0],
+            ignore_conflicts=True
+        )
+        by_delta = {}
+        for reviewer_id, delta in deltas.items():
+            by_delta.setdefault(delta, []).append(reviewer_id)
+        for delta, reviewer_ids in by_delta.items():
+            cls.objects.filter(reviewer_id__in=reviewer_ids).update(
+                open_assignments=models.F('open_assignments') + delta
+            )
+
+    @classmethod
+    def recount(cls):
+        """Reset every counter from the assignments themselves, returns the number of reviewers with open work"""
+        counts = dict(
+            ReviewerAssignment.objects
+            .filter(status__in=cls.OPEN_STATUSES)
+            .values('reviewer_id')
+            .annotate(count=models.Count('id'))
+            .values_list('reviewer_id', 'count')
+        )
+        with transaction.atomic():
+            cls.objects.exclude(reviewer_id__in=list(counts)).update(open_assignments=0)
+            upsert(
+                cls,
+                [cls(reviewer_id=reviewer_id, open_assignments=count) for reviewer_id, count in counts.items()],
+                unique_fields=['reviewer'],
+                update_fields=['open_assignments']
+            )
+        return len(counts)
+
+    def __str__(self):
+        return f"{self.reviewer_id} ({self.open_assignments} open)"
+
+
+class CorrectionUpload(models.Model):
+    """
+    A resumable upload of a corrections file. Chunks are written in place
+    into the file at `path`; once all of them are in, the file is verified
+    and can be referenced from one corrections event.
+    """
+    class Status(models.TextChoices):
+        OPEN = 'OPEN', 'Open'
+        COMPLETE = 'COMPLETE', 'Complete'
+        ATTACHED = 'ATTACHED', 'Attached to corrections'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    manuscript = models.ForeignKey(
+        'Manuscript',
+        on_delete=models.CASCADE,
+        related_name='correction_uploads'
+    )
+    uploaded_by = models.ForeignKey(Profile, on_delete=models.DO_NOTHING)
+    filename = models.CharField(max_length=255)
+    path = models.CharField(max_length=255, help_text="Storage path the chunks are written to")
+    size = models.BigIntegerField(help_text="Total size of the file in bytes")
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 of the whole file, declared by the client or computed on completion"
+    )
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+    created = models.DateTimeField(auto_now_add=True)
+    completed = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def chunk_count(self):
+        return max(math.ceil(self.size / self.chunk_size), 1)
+
+    def chunk_length(self, index):
+        """Expected size of chunk `index`; only the last one may be short"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def to_dict(self):
+        return {
+            'upload_id': str(self.id),
+            'manuscript_id': self.manuscript_id,
+            'filename': self.filename,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunk_count': self.chunk_count,
+            'received': sorted(self.chunks.values_list('index', flat=True)),
+            'sha256': self.sha256,
+            'status': self.status,
+        }
+
+
+class ManuscriptFile(models.Model):
+    """
+    A file submitted for a manuscript. The bytes live once in the
+    content-addressed store under `sha256`, however many records point at them.
+    """
+    class Kind(models.TextChoices):
+        CORRECTIONS = 'CORRECTIONS', 'Corrections'
+
+    manuscript = models.ForeignKey(
+        'Manuscript',
+        on_delete=models.CASCADE,
+        related_name='files'
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.CORRECTIONS)
+    version = models.PositiveIntegerField(default=1, help_text="1 for the first file of its kind, counting up")
+    filename = models.CharField(max_length=255)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    uploaded_by = models.ForeignKey(Profile, on_delete=models.DO_NOTHING)
+    event = models.ForeignKey(
+        'ManuscriptEvent',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='files'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['manuscript', 'kind', 'version']
+        ordering = ['-version']
+
+    @property
+    def path(self):
+        return blob_path(self.sha256)
+
+    @property
+    def etag(self):
+        # The content hash identifies the bytes exactly, so it makes a strong validator
+        return f'"{self.sha256}"'
+
+    def verify(self):
+        """True if the stored bytes still hash to the recorded digest"""
+        return digest_of(self.path) == self.sha256
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'manuscript_id': self.manuscript_id,
+            'kind': self.kind,
+            'version': self.version,
+            'filename': self.filename,
+            'sha256': self.sha256,
+            'size': self.size,
+            'uploaded_by': self.uploaded_by_id,
+            'event_id': self.event_id,
+            'created': self.created,
+        }
+
+
+class UploadChunk(models.Model):
+    upload = models.ForeignKey(
+        'CorrectionUpload',
+        on_delete=models.CASCADE,
+        related_name='chunks'
+    )
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['upload', 'index']
+
+
 class ManuscriptEvent(models.Model):
     class EventType(models.TextChoices):
         SUBMISSION = 'SUBMISSION', 'Manuscript Submitted'
@@ -211,11 +650,21 @@ class ManuscriptEvent(models.Model):
         CORRECTIONS_SUBMITTED = 'CORRECTIONS_SUBMITTED', 'Corrections Submitted'
         PUBLISHED = 'PUBLISHED', 'Manuscript Published'
 
+    # Manuscript status after an event of each type; other events leave it unchanged
+    STATUS_TRANSITIONS = {
+        EventType.SUBMISSION: Manuscript.Status.SUBMISSION,
+        EventType.ACCEPTANCE: Manuscript.Status.ACCEPTED,
+        EventType.REJECTION: Manuscript.Status.REJECTED,
+        EventType.PUBLISHED: Manuscript.Status.PUBLISHED,
+    }
+
     manuscript = models.ForeignKey(
         'Manuscript',
         on_delete=models.CASCADE,
         related_name='events'
     )
+    # Position in the manuscript's log, from 1 without gaps; null only for events not yet backfilled
+    sequence = models.PositiveIntegerField(null=True, blank=True)
     event_type = models.CharField(
         max_length=50,
         choices=EventType.choices
@@ -235,6 +684,11 @@ class ManuscriptEvent(models.Model):
         blank=True,
         help_text="Additional details about the event"
     )
+    txn_index = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Position of the event within a batched transaction"
+    )
     metadata = models.JSONField(
         default=dict,
         blank=True,
@@ -244,9 +698,362 @@ class ManuscriptEvent(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['manuscript', '-timestamp']),
+            models.Index(fields=['manuscript', '-timestamp', '-id']),
             models.Index(fields=['event_type']),
         ]
+        constraints = [
+            # Also the index replay reads the tail of a log through
+            models.UniqueConstraint(fields=['manuscript', 'sequence'], name='unique_manuscript_event_sequence'),
+        ]
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'manuscript_id': self.manuscript_id,
+            'sequence': self.sequence,
+            'event_type': self.event_type,
+            'timestamp': self.timestamp,
+            'actor': self.actor_id,
+            'description': self.description,
+            'txn_hash': self.txn_hash,
+            'txn_index': self.txn_index,
+            'anchor_status': self.anchor_job.status if hasattr(self, 'anchor_job') else None,
+            'metadata': self.metadata,
+        }
+
+    def __str__(self):
+        return f"{self.get_event_type_display()} - {self.manuscript.title} ({self.timestamp})"
+
+
+class ManuscriptSnapshot(models.Model):
+    """
+    Manuscript state folded from its event log up to `sequence`, so replay
+    only has to apply the events after it (see manuscripts/eventstore.py)
+    """
+    manuscript = models.ForeignKey(
+        'Manuscript',
+        on_delete=models.CASCADE,
+        related_name='snapshots'
+    )
+    sequence = models.PositiveIntegerField()
+    state = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['manuscript', 'sequence']
+        ordering = ['-sequence']
+
+    def __str__(self):
+        return f"{self.manuscript_id} at {self.sequence}"
+
+
+class ManuscriptDocument(models.Model):
+    """
+    Read model of the manuscript detail endpoint: the response body,
+    serialized ahead of time and rebuilt whenever the manuscript or its
+    provenance changes, so a read is a single primary key lookup.
+    """
+    manuscript = models.OneToOneField(
+        'Manuscript',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document'
+    )
+    body = models.TextField()
+    etag = models.CharField(max_length=66)
+    updated = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def refresh_on_commit(cls, manuscript_ids):
+        """
+        refresh() once the current transaction commits, or now outside one.
+        The writes of a transaction (its events, their anchor jobs) share a
+        single rebuild however many of them ask for one.
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            cls.refresh(manuscript_ids)
+            return
+        # A queued rebuild is dropped with the transaction or savepoint that queued it if that rolls back
+        pending = next(
+            (func for _, func, _ in connection.run_on_commit if getattr(func, 'pending_documents', None) is not None),
+            None
+        )
+        if pending is None:
+            def pending():
+                manuscript_ids, pending.pending_documents = pending.pending_documents, None
+                cls.refresh(manuscript_ids)
+            pending.pending_documents = set()
+            transaction.on_commit(pending)
+        pending.pending_documents.update(manuscript_ids)
+
+    @classmethod
+    def refresh(cls, manuscript_ids):
+        """Rebuild the documents of the given manuscripts, returns them by manuscript id"""
+        manuscripts = (
+            Manuscript.objects
+            .filter(pk__in=set(manuscript_ids))
+            .select_related('submitted_by')
+            .prefetch_related(
+                'authors',
+                models.Prefetch('events', queryset=ManuscriptEvent.objects.select_related('anchor_job'))
+            )
+        )
+        documents = {}
+        for manuscript in manuscripts:
+            body = json.dumps(manuscript.to_document(), cls=DjangoJSONEncoder)
+            documents[manuscript.pk] = cls(
+                manuscript=manuscript,
+                body=body,
+                etag='"%s"' % hashlib.sha256(body.encode()).hexdigest()
+            )
+        # One upsert however many manuscripts changed
+        upsert(cls, documents.values(), unique_fields=['manuscript'], update_fields=['body', 'etag', 'updated'])
+        response_cache.bump(*(('manuscript', pk) for pk in documents))
+        return documents
+
+
+class SearchTerm(models.Model):
+    """
+    A term of the manuscript search index and the number of manuscripts
+    containing it, as last recounted by search.refresh_doc_freqs()
+    """
+    term = models.CharField(max_length=64, unique=True)
+    doc_freq = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.doc_freq})"
+
+
+class SearchPosting(models.Model):
+    """
+    Occurrence of a term in a manuscript. tf is weighted by the field the
+    term appears in; length and journal are copied from the manuscript so
+    ranking and journal filtering read only this table. impact is the BM25
+    term frequency part of the score when the posting was written, which
+    orders a term's postings best first.
+    """
+    term = models.CharField(max_length=64)
+    manuscript = models.ForeignKey(
+        'Manuscript',
+        on_delete=models.CASCADE,
+        related_name='search_postings'
+    )
+    journal = models.ForeignKey(Journal, on_delete=models.DO_NOTHING, db_constraint=False)
+    tf = models.FloatField()
+    length = models.FloatField()
+    impact = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ['term', 'manuscript']
+        indexes = [
+            models.Index(fields=['term', '-impact']),
+            models.Index(fields=['term', 'journal', '-impact']),
+        ]
+
+
+class SearchDocument(models.Model):
+    """Indexed state of a manuscript, so unchanged manuscripts are not re-indexed"""
+    manuscript = models.OneToOneField(
+        'Manuscript',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    length = models.FloatField()
+    digest = models.CharField(max_length=64)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class AnchorBatch(models.Model):
+    """A single transaction carrying several anchor jobs, either as records or as a Merkle root"""
+    txn_hash = models.CharField(max_length=66, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    merkle_root = models.CharField(max_length=66, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Batch {self.pk} ({self.size} events)"
+
+
+class AnchorJob(models.Model):
+    """
+    Outbox entry for recording a ManuscriptEvent on the contract.
+    Jobs are written in the same transaction as their event and are signed,
+    broadcast and confirmed later by the run_anchor_worker command.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        BROADCAST = 'BROADCAST', 'Broadcast'
+        CONFIRMED = 'CONFIRMED', 'Confirmed'
+        FAILED = 'FAILED', 'Failed'
+
+    event = models.OneToOneField(
+        'ManuscriptEvent',
+        on_delete=models.CASCADE,
+        related_name='anchor_job'
+    )
+    fn_name = models.CharField(
+        max_length=50,
+        help_text="JournalContract function to call"
+    )
+    args = models.JSONField(
+        default=list,
+        help_text="Positional arguments for the contract call"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    txn_hash = models.CharField(max_length=66, blank=True)
+    # Nonce of the transaction, released when the transaction is found dropped
+    nonce = models.PositiveBigIntegerField(null=True, blank=True)
+    batch = models.ForeignKey(
+        'AnchorBatch',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    batch_index = models.PositiveIntegerField(null=True, blank=True)
+    leaf_hash = models.CharField(max_length=66, blank=True)
+    merkle_proof = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Sibling hashes linking leaf_hash to the batch Merkle root"
+    )
+    block_number = models.PositiveBigIntegerField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time a worker may send the job, pushed back after each failed attempt"
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    broadcast_at = models.DateTimeField(null=True, blank=True)
+    confirmed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['updated', 'id']),
+        ]
+
+    def to_dict(self):
+        return {
+            'job_id': self.pk,
+            'event_id': self.event_id,
+            'status': self.status,
+            'txn_hash': self.txn_hash,
+            'batch_index': self.batch_index,
+            'block_number': self.block_number,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_at': self.next_attempt_at,
+            'broadcast_at': self.broadcast_at,
+            'confirmed_at': self.confirmed_at,
+        }
+
+    def batch_record(self):
+        """(manuscriptId, actorId, eventType, metadata) tuple for JournalContract.recordEvents"""
+        return (
+            str(self.event.manuscript_id),
+            str(self.event.actor_id or ''),
+            self.event.event_type,
+            self.args[-1],
+        )
+
+    def __str__(self):
+        return f"{self.fn_name} for event {self.event_id} ({self.status})"
+
+
+class NonceCounter(models.Model):
+    """Next transaction nonce for a signing account, shared by every process"""
+    address = models.CharField(max_length=42, unique=True)
+    next_nonce = models.PositiveBigIntegerField(default=0)
+    # Nonces below next_nonce that no transaction holds, handed out again before next_nonce
+    released = models.JSONField(default=list, blank=True)
+    # When each nonce not yet mined was handed out, as {nonce: POSIX timestamp}
+    allocated = models.JSONField(default=dict, blank=True)
+    synced = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.address} ({self.next_nonce})"
+
+
+class ChainCursor(models.Model):
+    """Progress of the chain log indexer (manuscripts/chainindex.py) through one contract's logs"""
+    contract = models.CharField(max_length=42, unique=True)
+    next_block = models.PositiveBigIntegerField(default=0)
+    block_hash = models.CharField(
+        max_length=66,
+        blank=True,
+        help_text="Hash of the last indexed block"
+    )
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.contract} from block {self.next_block}"
+
+
+class ChainBlock(models.Model):
+    """Hash of an indexed block, kept for the reorg depth so a replaced block can be noticed"""
+    contract = models.CharField(max_length=42)
+    number = models.PositiveBigIntegerField()
+    hash = models.CharField(max_length=66)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contract', 'number'], name='unique_chain_block'),
+        ]
+
+
+class ChainLog(models.Model):
+    """
+    A contract event read back from the chain by the log indexer. The keys
+    the events are looked up by are copied out of `args` into indexed columns.
+    """
+    contract = models.CharField(max_length=42)
+    block_number = models.PositiveBigIntegerField()
+    block_hash = models.CharField(max_length=66)
+    transaction_hash = models.CharField(max_length=66)
+    log_index = models.PositiveIntegerField()
+    event = models.CharField(max_length=50)
+    manuscript_key = models.CharField(max_length=100, blank=True)
+    actor_key = models.CharField(max_length=100, blank=True)
+    event_type = models.CharField(max_length=50, blank=True)
+    root = models.CharField(max_length=66, blank=True)
+    args = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_hash', 'log_index'], name='unique_chain_log'),
+        ]
+        indexes = [
+            models.Index(fields=['manuscript_key', 'block_number', 'log_index']),
+            models.Index(fields=['actor_key', 'block_number']),
+            models.Index(fields=['event', 'block_number']),
+            models.Index(fields=['contract', 'block_number']),
+            models.Index(fields=['root']),
+        ]
+
+    def to_dict(self):
+        return {
+            'id': self.pk,
+            'event': self.event,
+            'manuscript_id': self.manuscript_key,
+            'actor_id': self.actor_key,
+            'event_type': self.event_type,
+            'block_number': self.block_number,
+            'block_hash': self.block_hash,
+            'txn_hash': self.transaction_hash,
+            'log_index': self.log_index,
+            'args': self.args,
+        }
 
     def __str__(self):
-        return f"{self.get_event_type_display()} - {self.manuscript.title} ({self.timestamp})"
\ No newline at end of file
+        return f"{self.event} in block {self.block_number}"
@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from manuscripts.models import NonceCounter
+
+# Send errors meaning the nonce is already taken by a mined or queued transaction
+NONCE_USED_ERRORS = ('nonce too low', 'replacement transaction underpriced', 'already known')
+
+
+def nonce_used(error):
+    """True if a send failed because its nonce belongs to another transaction"""
+    message = str(error).lower()
+    return any(text in message for text in NONCE_USED_ERRORS)
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces for one account from a locked NonceCounter row,
+    so several processes can have transactions in the mempool at once.
+
+    allocate() commits the allocation in its own short transaction, so the
+    counter row is not held while the transaction is sent and a rollback in
+    the caller cannot hand the nonce out a second time. A nonce whose send
+    failed before reaching the node is released and handed out again before
+    new ones. reconcile() compares the counter with the chain after a nonce
+    error or a dropped transaction: it skips nonces used elsewhere and
+    releases the lowest one the chain is still waiting for, so the gap is
+    filled by the next send. A nonce allocated less than ANCHOR_NONCE_GRACE
+    seconds ago is left alone, as its worker may not have sent it yet.
+    """
+
+    def __init__(self, backend, address):
+        self.backend = backend
+        self.address = address
+
+    def _chain_nonce(self, pending=True):
+        return self.backend.transaction_count(self.address, pending=pending)
+
+    def _locked_counter(self):
+        counter = NonceCounter.objects.select_for_update().filter(address=self.address).first()
+        if counter is None:
+            NonceCounter.objects.get_or_create(
+                address=self.address,
+                defaults={'next_nonce': self._chain_nonce(), 'synced': timezone.now()}
+            )
+            counter = NonceCounter.objects.select_for_update().get(address=self.address)
+        return counter
+
+    @transaction.atomic
+    def allocate(self):
+        """
+        Reserve a nonce: the lowest released one, else the next new one.
+        Returns (nonce, reused); a reused nonce may still be held by a
+        transaction stuck in the mempool, which the new one has to outbid.
+        """
+        counter = self._locked_counter()
+        reused = bool(counter.released)
+        if reused:
+            nonce = min(counter.released)
+            counter.released = sorted(set(counter.released) - {nonce})
+        else:
+            nonce = counter.next_nonce
+            counter.next_nonce = nonce + 1
+        counter.allocated[str(nonce)] = timezone.now().timestamp()
+        counter.save(update_fields=['next_nonce', 'released', 'allocated'])
+        return nonce, reused
+
+    @transaction.atomic
+    def release(self, nonce):
+        """Hand back a nonce whose transaction never reached the node"""
+        counter = self._locked_counter()
+        if nonce < counter.next_nonce and nonce not in counter.released:
+            counter.released = sorted(counter.released + [nonce])
+            counter.allocated.pop(str(nonce), None)
+            counter.save(update_fields=['released', 'allocated'])
+
+    @transaction.atomic
+    def reconcile(self, dropped=()):
+        """
+        Bring the counter in line with the chain's mined and pending
+        transaction counts. Released nonces that were mined meanwhile are
+        forgotten, the counter moves past nonces used by other senders of
+        the account, and the first nonce missing from the mempool below the
+        counter is released to fill the gap once it has been allocated for
+        ANCHOR_NONCE_GRACE seconds. Nonces in `dropped`, of transactions the
+        node has given up on, are released straight away if still unmined.
+        Returns the released nonces.
+        """
+        counter = self._locked_counter()
+        mined = self._chain_nonce(pending=False)
+        pending = self._chain_nonce()
+        now = timezone.now().timestamp()
+
+        released = {nonce for nonce in counter.released if nonce >= mined}
+        released.update(nonce for nonce in dropped if mined <= nonce < counter.next_nonce)
+        allocated = {
+            nonce: at for nonce, at in counter.allocated.items()
+            if int(nonce) >= mined and int(nonce) not in released
+        }
+        if pending > counter.next_nonce:
+            counter.next_nonce = pending
+        elif pending < counter.next_nonce:
+            # Transactions from `pending` on cannot be mined until it is taken, but a
+            # recently allocated nonce may only be on its way to the node
+            allocated_at = allocated.get(str(pending))
+            if allocated_at is None or now - allocated_at >= settings.ANCHOR_NONCE_GRACE:
+                released.add(pending)
+                allocated.pop(str(pending), None)
+        counter.released = sorted(released)
+        counter.allocated = allocated
+        counter.synced = timezone.now()
+        counter.save(update_fields=['next_nonce', 'released', 'allocated', 'synced'])
+        return counter.released
+
+    @transaction.atomic
+    def sync(self):
+        """Reset the counter to the chain's pending transaction count, dropping any local drift"""
+        counter = self._locked_counter()
+        counter.next_nonce = self._chain_nonce()
+        counter.released = []
+        counter.allocated = {}
+        counter.synced = timezone.now()
+        counter.save(update_fields=['next_nonce', 'released', 'allocated', 'synced'])
+        return counter.next_nonce
@@ -0,0 +1,134 @@
+import datetime
+
+from django.db.models import Count, F, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from manuscripts.models import Author, Keyword, Manuscript, ManuscriptKeyword
+
+AUTHOR_FIELDS = ('id', 'first_name', 'last_name', 'email', 'affiliation')
+MANUSCRIPT_LIST_FIELDS = ('id', 'title', 'abstract', 'journal_id', 'keywords', 'submitted', 'status')
+ASSIGNMENT_FIELDS = ('id', 'status', 'assigned_date', 'due_date', 'completed_date', 'manuscript')
+
+
+def authors_prefetch(lookup='authors'):
+    """Loads the authors of a whole page in one query, onto `author_list`"""
+    return Prefetch(lookup, queryset=Author.objects.only(*AUTHOR_FIELDS).order_by('id'), to_attr='author_list')
+
+
+def parse_bound(value, end_of_day=False):
+    """An ISO datetime, or a date meaning the start (or end) of that day"""
+    # Dates first, parse_datetime() would also accept a bare date as midnight
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.datetime.combine(day, datetime.time.max if end_of_day else datetime.time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def manuscript_filters(params):
+    """
+    Lookups for the optional ?status=, ?submitted_from=, ?submitted_to= and
+    ?keyword= list filters. Status may be a comma separated list; both dates
+    are inclusive. Raises ValueError on values that cannot be used.
+    """
+    filters = {}
+
+    if params.get('keyword'):
+        filters['keyword_links__keyword__name'] = Keyword.normalize(params['keyword'])
+
+    statuses = [value for value in params.get('status', '').split(',') if value]
+    invalid = [value for value in statuses if value not in Manuscript.Status.values]
+    if invalid:
+        raise ValueError(f"Invalid status: {', '.join(invalid)}")
+    if len(statuses) == 1:
+        filters['status'] = statuses[0]
+    elif statuses:
+        filters['status__in'] = statuses
+
+    if params.get('submitted_from'):
+        filters['submitted__gte'] = parse_bound(params['submitted_from'])
+    if params.get('submitted_to'):
+        filters['submitted__lte'] = parse_bound(params['submitted_to'], end_of_day=True)
+    return filters
+
+
+def keyword_facets(journal_id, status=None, limit=50):
+    """Keywords used in a journal with the number of manuscripts tagged with each, most used first"""
+    links = ManuscriptKeyword.objects.filter(journal_id=journal_id)
+    if status:
+        links = links.filter(manuscript__status=status)
+    return list(
+        links
+        .values('keyword__name')
+        .annotate(count=Count('manuscript_id'))
+        .order_by('-count', 'keyword__name')
+        .values_list('keyword__name', 'count')[:limit]
+    )
+
+
+def manuscript_listing(queryset=None):
+    """
+    Manuscripts with only the listed columns, the submitter's email and the
+    authors, loaded in two queries however many rows the page holds.
+    """
+    queryset = Manuscript.objects.all() if queryset is None else queryset
+    return (
+        queryset
+        .only(*MANUSCRIPT_LIST_FIELDS)
+        .annotate(submitted_by_email=F('submitted_by__email'))
+        .prefetch_related(authors_prefetch())
+    )
+
+
+def assignment_listing(queryset):
+    """Reviewer assignments with their manuscript, journal title and authors in two queries"""
+    return (
+        queryset
+        .select_related('manuscript', 'manuscript__journal_id')
+        .only(
+            *ASSIGNMENT_FIELDS,
+            *(f'manuscript__{field}' for field in MANUSCRIPT_LIST_FIELDS),
+            'manuscript__journal_id__id',
+            'manuscript__journal_id__title',
+        )
+        .annotate(submitted_by_email=F('manuscript__submitted_by__email'))
+        .prefetch_related(authors_prefetch('manuscript__authors'))
+    )
+
+
+def manuscript_summary(manuscript, submitted_by_email):
+    return {
+        'id': manuscript.pk,
+        'title': manuscript.title,
+        'abstract': manuscript.abstract,
+        'journal_id': manuscript.journal_id_id,
+        'keywords': manuscript.keywords,
+        'submitted_by': submitted_by_email,
+        'authors': [author.to_dict() for author in manuscript.author_list],
+        'submitted': manuscript.submitted,
+        'status': manuscript.status
+    }
+
+
+def assignment_summary(assignment):
+    manuscript = assignment.manuscript
+    data = manuscript_summary(manuscript, assignment.submitted_by_email)
+    del data['journal_id']
+    data['journal'] = {
+        'id': manuscript.journal_id.id,
+        'name': manuscript.journal_id.title
+    }
+    data['assignment'] = {
+        'id': assignment.id,
+        'status': assignment.status,
+        'assigned_date': assignment.assigned_date,
+        'due_date': assignment.due_date,
+        'completed_date': assignment.completed_date
+    }
+    return data
@@ -0,0 +1,243 @@
+"""
+Reviewer recommendations for a manuscript.
+
+Every reviewer has a sparse keyword vector (ReviewerKeyword rows and a
+ReviewerVector with its norm) built from the manuscripts they were assigned
+to or reviewed, a submitted review counting more than an assignment. The
+vectors are refreshed from model signals when assignments, reviews or
+manuscript keywords change, so ranking never looks at the review history.
+
+A manuscript is matched against the vectors in a single aggregate query over
+the entries of its keywords, weighted by how rare each keyword is among
+reviewers. The cosine similarity is discounted by the reviewer's open
+assignments, read from the ReviewerWorkload counter in the same query, and
+reviewers with a conflict of interest are left out.
+"""
+import heapq
+import math
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, Sum, Value, When
+from django.db.models.functions import Lower, Trim
+
+from manuscripts.models import (
+    Author, ManuscriptEvent, ManuscriptKeyword, ReviewerAssignment, ReviewerKeyword, ReviewerVector
+)
+from openPublisher.bulk import upsert
+
+ASSIGNED_WEIGHT = 0.5
+REVIEWED_WEIGHT = 1.0
+# A reviewer's score is divided by (1 + LOAD_PENALTY * open assignments)
+LOAD_PENALTY = 0.25
+INACTIVE_STATUSES = (ReviewerAssignment.Status.DECLINED, ReviewerAssignment.Status.WITHDRAWN)
+STATS_CACHE_KEY = 'reviewers:count'
+STATS_CACHE_TIMEOUT = 60
+
+
+def reviewed_manuscripts(reviewer_ids):
+    """{reviewer_id: {manuscript_id: weight}} of the manuscripts each reviewer was assigned to or reviewed"""
+    weights = {reviewer_id: {} for reviewer_id in reviewer_ids}
+    for reviewer_id, manuscript_id in (
+        ReviewerAssignment.objects
+        .filter(reviewer_id__in=reviewer_ids)
+        .exclude(status__in=INACTIVE_STATUSES)
+        .values_list('reviewer_id', 'manuscript_id')
+    ):
+        weights[reviewer_id][manuscript_id] = ASSIGNED_WEIGHT
+
+    by_key = {str(reviewer_id): reviewer_id for reviewer_id in reviewer_ids}
+    for reviewer_key, manuscript_id in (
+        ManuscriptEvent.objects
+        .filter(event_type=ManuscriptEvent.EventType.REVIEW_SUBMITTED, metadata__reviewer_id__in=list(by_key))
+        .values_list('metadata__reviewer_id', 'manuscript_id')
+    ):
+        weights[by_key[reviewer_key]][manuscript_id] = REVIEWED_WEIGHT
+    return weights
+
+
+@transaction.atomic
+def refresh_reviewers(reviewer_ids):
+    """Rebuild the keyword vectors of the given reviewers from their review history, in a fixed number of queries"""
+    reviewer_ids = set(get_user_model().objects.filter(pk__in=set(reviewer_ids)).values_list('pk', flat=True))
+    ReviewerKeyword.objects.filter(reviewer_id__in=reviewer_ids).delete()
+    if not reviewer_ids:
+        return
+
+    manuscripts = reviewed_manuscripts(reviewer_ids)
+    keywords = {}
+    for manuscript_id, keyword_id in (
+        ManuscriptKeyword.objects
+        .filter(manuscript_id__in={pk for weights in manuscripts.values() for pk in weights})
+        .values_list('manuscript_id', 'keyword_id')
+    ):
+        keywords.setdefault(manuscript_id, []).append(keyword_id)
+
+    rows, vectors = [], []
+    for reviewer_id, weights in manuscripts.items():
+        vector = Counter()
+        for manuscript_id, weight in weights.items():
+            for keyword_id in keywords.get(manuscript_id, ()):
+                vector[keyword_id] += weight
+        if vector:
+            rows.extend(
+                ReviewerKeyword(reviewer_id=reviewer_id, keyword_id=keyword_id, weight=weight)
+                for keyword_id, weight in vector.items()
+            )
+            vectors.append(ReviewerVector(
+                reviewer_id=reviewer_id,
+                norm=math.sqrt(sum(weight * weight for weight in vector.values())),
+                manuscripts=len(weights)
+            ))
+
+    ReviewerKeyword.objects.bulk_create(rows)
+    upsert(ReviewerVector, vectors, unique_fields=['reviewer'], update_fields=['norm', 'manuscripts', 'updated'])
+    ReviewerVector.objects.filter(reviewer_id__in=reviewer_ids).exclude(
+        reviewer_id__in=[vector.reviewer_id for vector in vectors]
+    ).delete()
+
+
+def refresh_reviewer(reviewer_id):
+    """Rebuild one reviewer's keyword vector"""
+    refresh_reviewers([reviewer_id])
+
+
+def refresh_manuscript_reviewers(manuscript_id):
+    """Rebuild the vectors of everyone who reviewed a manuscript, after its keywords changed"""
+    refresh_reviewers(
+        ReviewerAssignment.objects.filter(manuscript_id=manuscript_id).values_list('reviewer_id', flat=True)
+    )
+
+
+def rebuild(batch_size=200):
+    """Rebuild every reviewer vector, returns the number of reviewers with one"""
+    reviewer_ids = set(ReviewerAssignment.objects.values_list('reviewer_id', flat=True).distinct())
+    ReviewerVector.objects.exclude(reviewer_id__in=reviewer_ids).delete()
+    ReviewerKeyword.objects.exclude(reviewer_id__in=reviewer_ids).delete()
+    reviewer_ids = list(reviewer_ids)
+    for start in range(0, len(reviewer_ids), batch_size):
+        refresh_reviewers(reviewer_ids[start:start + batch_size])
+    cache.delete(STATS_CACHE_KEY)
+    return ReviewerVector.objects.count()
+
+
+def reviewer_count():
+    """Number of reviewers with a keyword vector, cached briefly"""
+    count = cache.get(STATS_CACHE_KEY)
+    if count is None:
+        count = ReviewerVector.objects.count()
+        cache.set(STATS_CACHE_KEY, count, STATS_CACHE_TIMEOUT)
+    return count
+
+
+def conflicted_reviewers(manuscript):
+    """
+    Ids of profiles who may not review `manuscript`: the submitter, anyone
+    already assigned to it, its authors (by email) and anyone who has
+    published under the same affiliation as one of its authors.
+    """
+    authors = list(manuscript.authors.values_list('email', 'affiliation'))
+    emails = {email.strip().lower() for email, _ in authors if email}
+    affiliations = {affiliation.strip().lower() for _, affiliation in authors if affiliation and affiliation.strip()}
+    if affiliations:
+        emails.update(
+            email.strip().lower()
+            for email in Author.objects
+            .annotate(affiliation_key=Lower(Trim('affiliation')))
+            .filter(affiliation_key__in=affiliations)
+            .values_list('email', flat=True)
+            .distinct()
+        )
+
+    conflicted = {manuscript.submitted_by_id}
+    conflicted.update(manuscript.reviewer_assignments.values_list('reviewer_id', flat=True))
+    if emails:
+        conflicted.update(
+            get_user_model().objects
+            .annotate(email_key=Lower('email'))
+            .filter(email_key__in=emails)
+            .values_list('id', flat=True)
+        )
+    return conflicted
+
+
+def recommend(manuscript, limit=10):
+    """
+    Best reviewers for `manuscript`, as dicts with the reviewer's id, name,
+    email, score, keyword similarity, open assignments and matched keywords.
+    """
+    keywords = dict(manuscript.keyword_links.values_list('keyword_id', 'keyword__name'))
+    if not keywords:
+        return []
+
+    # Inverse reviewer frequency of each keyword, rare expertise counts for more
+    count = max(reviewer_count(), 1)
+    reviewer_freq = dict(
+        ReviewerKeyword.objects
+        .filter(keyword_id__in=list(keywords))
+        .values('keyword_id')
+        .annotate(count=Count('id'))
+        .values_list('keyword_id', 'count')
+    )
+    idf = {keyword_id: math.log(1 + count / reviewer_freq.get(keyword_id, 1)) for keyword_id in keywords}
+    query_norm = math.sqrt(sum(weight * weight for weight in idf.values()))
+
+    dot = Sum(
+        Case(
+            *(When(keyword_id=keyword_id, then=F('weight') * Value(weight)) for keyword_id, weight in idf.items()),
+            output_field=FloatField()
+        )
+    )
+    candidates = (
+        ReviewerKeyword.objects
+        .filter(keyword_id__in=list(keywords), reviewer__is_active=True)
+        .exclude(reviewer_id__in=conflicted_reviewers(manuscript))
+        .values('reviewer_id')
+        .annotate(
+            dot=dot,
+            norm=Max('reviewer__reviewer_vector__norm'),
+            load=Max('reviewer__reviewer_workload__open_assignments')
+        )
+        .values_list('reviewer_id', 'dot', 'norm', 'load')
+    )
+
+    ranked = []
+    load = {}
+    for reviewer_id, dot_product, norm, open_assignments in candidates:
+        similarity = dot_product / (norm * query_norm) if norm else 0.0
+        load[reviewer_id] = max(open_assignments or 0, 0)
+        ranked.append((similarity / (1 + LOAD_PENALTY * load[reviewer_id]), similarity, reviewer_id))
+    best = heapq.nlargest(limit, ranked, key=lambda row: (row[0], str(row[2])))
+    if not best:
+        return []
+
+    reviewer_ids = [reviewer_id for _, _, reviewer_id in best]
+    profiles = (
+        get_user_model().objects
+        .only('id', 'first_name', 'last_name', 'email', 'web3_address')
+        .in_bulk(reviewer_ids)
+    )
+    matched = {}
+    for reviewer_id, keyword_id in (
+        ReviewerKeyword.objects
+        .filter(reviewer_id__in=reviewer_ids, keyword_id__in=list(keywords))
+        .order_by('-weight')
+        .values_list('reviewer_id', 'keyword_id')
+    ):
+        matched.setdefault(reviewer_id, []).append(keywords[keyword_id])
+
+    return [
+        {
+            'id': str(reviewer_id),
+            'name': f"{profiles[reviewer_id].first_name} {profiles[reviewer_id].last_name}",
+            'email': profiles[reviewer_id].email,
+            'web3_address': profiles[reviewer_id].web3_address,
+            'score': round(score, 4),
+            'similarity': round(similarity, 4),
+            'open_assignments': load.get(reviewer_id, 0),
+            'matched_keywords': matched.get(reviewer_id, []),
+        }
+        for score, similarity, reviewer_id in best
+    ]
@@ -0,0 +1,222 @@
+"""
+Full-text search over manuscripts, backed by an inverted index in the
+database (SearchTerm, SearchPosting, SearchDocument).
+
+Manuscripts are re-indexed incrementally from model signals. Queries are
+ranked with BM25 in a single aggregate query over the postings of the
+query terms, and the last query term also matches as a prefix so results
+can follow the user as they type.
+
+Writes only add and delete postings. Term document frequencies are
+recounted by refresh_doc_freqs(), run periodically, so concurrent indexing
+does not queue on the rows of common terms. Each posting keeps its impact,
+the BM25 term frequency part of its score, and ranking only reads the
+MAX_POSTINGS_PER_TERM highest impact postings of each term, so common and
+prefix-expanded terms cost the same as rare ones.
+"""
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+from manuscripts.models import Manuscript, SearchDocument, SearchPosting, SearchTerm
+
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'keywords': 2.0,
+    'authors': 1.5,
+    'abstract': 1.0,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 30
+MAX_POSTINGS_PER_TERM = 2000
+STATS_CACHE_KEY = 'search:stats'
+STATS_CACHE_TIMEOUT = 60
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has in is it its of on or that the to was were which with'.split()
+)
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    return [
+        token[:64]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def manuscript_fields(manuscript):
+    """Searchable text of a manuscript, by field"""
+    return {
+        'title': manuscript.title,
+        'abstract': manuscript.abstract,
+        'keywords': ' '.join(manuscript.keyword_names()),
+        'authors': ' '.join(
+            f"{author.first_name} {author.last_name} {author.affiliation}"
+            for author in manuscript.authors.all()
+        ),
+    }
+
+
+def _weighted_terms(manuscript):
+    counts = Counter()
+    for field, text in manuscript_fields(manuscript).items():
+        for token in tokenize(text):
+            counts[token] += FIELD_WEIGHTS[field]
+    return counts
+
+
+@transaction.atomic
+def index_manuscript(manuscript):
+    """
+    Bring the index entries of one manuscript up to date.
+    Returns False when the indexed text has not changed.
+    """
+    counts = _weighted_terms(manuscript)
+    length = sum(counts.values())
+    digest = hashlib.sha256(
+        json.dumps([manuscript.journal_id_id, sorted(counts.items())]).encode()
+    ).hexdigest()
+
+    document = SearchDocument.objects.select_for_update().filter(pk=manuscript.pk).first()
+    if document is not None and document.digest == digest:
+        return False
+
+    SearchPosting.objects.filter(manuscript_id=manuscript.pk).delete()
+    if counts:
+        # A new term counts this manuscript until refresh_doc_freqs() recounts it
+        SearchTerm.objects.bulk_create([SearchTerm(term=term, doc_freq=1) for term in counts], ignore_conflicts=True)
+        _, avg_length = index_stats()
+        SearchPosting.objects.bulk_create([
+            SearchPosting(term=term, manuscript_id=manuscript.pk, journal_id=manuscript.journal_id_id, tf=tf,
+                          length=length, impact=_impact(tf, length, avg_length))
+            for term, tf in counts.items()
+        ])
+    SearchDocument.objects.update_or_create(manuscript_id=manuscript.pk, defaults={'length': length, 'digest': digest})
+    return True
+
+
+def _impact(tf, length, avg_length):
+    return tf / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+
+
+@transaction.atomic
+def remove_manuscript(manuscript_id):
+    SearchPosting.objects.filter(manuscript_id=manuscript_id).delete()
+    SearchDocument.objects.filter(pk=manuscript_id).delete()
+
+
+def refresh_doc_freqs(batch_size=1000):
+    """
+    Recount the manuscripts containing each term from the postings.
+    Returns the number of terms whose count changed.
+    """
+    counts = dict(SearchPosting.objects.order_by().values_list('term').annotate(count=Count('pk')))
+    changed = []
+    for term in SearchTerm.objects.only('pk', 'term', 'doc_freq').iterator(chunk_size=batch_size):
+        doc_freq = counts.get(term.term, 0)
+        if term.doc_freq != doc_freq:
+            term.doc_freq = doc_freq
+            changed.append(term)
+    SearchTerm.objects.bulk_update(changed, ['doc_freq'], batch_size=batch_size)
+    cache.delete(STATS_CACHE_KEY)
+    return len(changed)
+
+
+def index_stats():
+    """Number of indexed manuscripts and their average weighted length, cached briefly"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        aggregate = SearchDocument.objects.aggregate(count=Count('pk'), avg_length=Avg('length'))
+        stats = (aggregate['count'], aggregate['avg_length'] or 1.0)
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def query_terms(query):
+    """
+    Index terms for a query with their document frequencies. The last token
+    is expanded to the most common indexed terms it is a prefix of.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return {}
+
+    *exact, last = tokens
+    terms = dict(SearchTerm.objects.filter(term__in=exact + [last], doc_freq__gt=0).values_list('term', 'doc_freq'))
+    expansions = (
+        SearchTerm.objects
+        .filter(term__startswith=last, doc_freq__gt=0)
+        .order_by('-doc_freq')
+        .values_list('term', 'doc_freq')[:MAX_PREFIX_EXPANSIONS]
+    )
+    terms.update(expansions)
+    return terms
+
+
+def _scanned_postings(term, journal_id):
+    """Condition selecting the MAX_POSTINGS_PER_TERM highest impact postings of a term, ties included"""
+    condition = Q(term=term)
+    if journal_id is not None:
+        condition &= Q(journal_id=journal_id)
+    # A threshold rather than a LIMIT subquery, which MySQL does not allow under IN
+    cutoff = list(
+        SearchPosting.objects.filter(condition).order_by('-impact')
+        .values_list('impact', flat=True)[MAX_POSTINGS_PER_TERM - 1:MAX_POSTINGS_PER_TERM]
+    )
+    if cutoff:
+        condition &= Q(impact__gte=cutoff[0])
+    return condition
+
+
+def search(query, journal_id=None, offset=0, limit=10):
+    """
+    Manuscript ids and BM25 scores for `query`, best first.
+    Returns [(manuscript_id, score)], fetching one row past `limit` so the
+    caller can tell whether there is a next page.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    count, avg_length = index_stats()
+    idf = Case(
+        *(
+            When(term=term, then=Value(math.log(1 + (count - doc_freq + 0.5) / (doc_freq + 0.5))))
+            for term, doc_freq in terms.items()
+        ),
+        output_field=FloatField()
+    )
+    tf = F('tf')
+    norm = Value(BM25_K1 * (1 - BM25_B)) + Value(BM25_K1 * BM25_B / avg_length) * Cast('length', FloatField())
+    score = idf * tf * Value(BM25_K1 + 1) / (tf + norm)
+
+    scanned = Q()
+    for term in terms:
+        scanned |= _scanned_postings(term, journal_id)
+    ranked = (
+        SearchPosting.objects.filter(scanned)
+        .values('manuscript_id')
+        .annotate(score=Sum(score, output_field=FloatField()))
+        .order_by('-score', '-manuscript_id')
+    )
+    return [(row['manuscript_id'], row['score']) for row in ranked[offset:offset + limit + 1]]
+
+
+def rebuild(batch_size=500):
+    """Index every manuscript, skipping those whose text has not changed"""
+    indexed = 0
+    manuscripts = Manuscript.objects.prefetch_related('authors').order_by('pk')
+    for manuscript in manuscripts.iterator(chunk_size=batch_size):
+        indexed += index_manuscript(manuscript)
+    refresh_doc_freqs()
+    return indexed
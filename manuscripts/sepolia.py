@@ -0,0 +1,154 @@
+import json
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import status
+
+from manuscripts.backends import get_backend
+from manuscripts.contracts import registry
+from manuscripts.nonces import NonceManager, nonce_used
+from utilities import CustomUUIDEncoder
+
+
+class Sepolia:
+    def __init__(self, backend=None):
+        self.backend = backend or get_backend()
+        self.nonces = NonceManager(self.backend, settings.W3_OWNERS_ADDRESS)
+
+    def broadcast(self, fn_name, args):
+        """
+        Signs and sends a contract call without waiting for it to be mined.
+        Args:
+            fn_name: Name of the JournalContract function to call.
+            args: Positional arguments for the function.
+        Returns:
+            The transaction hash as a 0x-prefixed hex string.
+        """
+        return self.send(fn_name, args)[0]
+
+    def send(self, fn_name, args):
+        """As broadcast(), returning (transaction hash, nonce)"""
+        encoded_data = registry.encoder(fn_name)(*args)
+        gas_price = self.backend.gas_price()
+        # Batched calls vary widely in size, so size the gas limit from an estimate
+        gas = self.backend.estimate_gas({
+            'from': settings.W3_OWNERS_ADDRESS,
+            'to': settings.W3_CONTRACT_ADDRESS,
+            'data': encoded_data,
+        })
+
+        nonce, reused = self.nonces.allocate()
+        if reused:
+            # A transaction dropped by this node may still sit in others' mempools, outbid it
+            gas_price = int(gas_price * settings.ANCHOR_REPLACEMENT_GAS_BUMP)
+        txn = {
+            'to': settings.W3_CONTRACT_ADDRESS,
+            'gas': int(gas * settings.ANCHOR_GAS_MARGIN),
+            'gasPrice': gas_price,
+            'nonce': nonce,
+            'data': encoded_data,
+        }
+        try:
+            return self.backend.send_transaction(txn), nonce
+        except Exception as e:
+            if nonce_used(e):
+                self.nonces.reconcile()
+            else:
+                self.nonces.release(nonce)
+            raise
+
+    def deployed_functions(self, fn_names):
+        """
+        Which of `fn_names` the contract at W3_CONTRACT_ADDRESS has. The ABI
+        file can be newer than the deployment, so this looks for each
+        function's selector in the deployed bytecode, where the dispatcher
+        of a solc-compiled contract pushes it.
+        """
+        code = self.backend.get_code(settings.W3_CONTRACT_ADDRESS)
+        encoders = registry.abi().encoders
+        return {
+            fn_name: fn_name in encoders and encoders[fn_name].selector in code
+            for fn_name in fn_names
+        }
+
+    def get_receipt(self, txn_hash):
+        """Returns the receipt of a mined transaction, or None if it is still pending"""
+        return self.backend.get_receipt(txn_hash)
+
+    def block_number(self):
+        return self.backend.block_number()
+
+    def _transact(self, fn_name, args):
+        """Sends a contract call and blocks until its receipt is available"""
+        if not self.backend.is_connected():
+            return JsonResponse(
+                {"result": "error", "message": "No connection to web3 endpoint"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        try:
+            tx_hash = self.broadcast(fn_name, args)
+        except Exception as e:
+            return {'error': f'Error sending raw transaction: {e}'}
+
+        tx_receipt = self.backend.wait_for_receipt(tx_hash)
+        if not tx_receipt:
+            return JsonResponse(
+                {"result": "error", "message": "Transaction receipt not found"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return tx_receipt
+
+    @staticmethod
+    def manuscript_args(manuscript):
+        return [json.dumps(manuscript, cls=CustomUUIDEncoder)]
+
+    @staticmethod
+    def event_args(manuscript_id, actor_id, metadata):
+        return [str(manuscript_id), str(actor_id), json.dumps(metadata, cls=CustomUUIDEncoder)]
+
+    def post_manuscript(self, manuscript):
+        """
+        Publishes the manuscript JSON on the contract.
+        Args:
+            manuscript: The manuscript data (dict or JSON string).
+        Returns:
+            Transaction receipt or error dict.
+        """
+        return self._transact('publishManuscript', self.manuscript_args(manuscript))
+
+    def record_review(self, manuscript_id, reviewer_id, metadata):
+        """
+        Records a review submission event on the contract.
+        Args:
+            manuscript_id: The ID of the manuscript.
+            reviewer_id: The ID of the reviewer.
+            metadata: Additional metadata (dict) to store with the event.
+        Returns:
+            Transaction receipt or error dict.
+        """
+        return self._transact('recordReviewSubmission', self.event_args(manuscript_id, reviewer_id, metadata))
+
+    def record_reviewer_assignment(self, manuscript_id, reviewer_id, metadata):
+        """
+        Records a reviewer assignment event on the contract.
+        Args:
+            manuscript_id: The ID of the manuscript.
+            reviewer_id: The ID of the reviewer.
+            metadata: Additional metadata (dict) to store with the event.
+        Returns:
+            Transaction receipt or error dict.
+        """
+        return self._transact('recordReviewerAssignment', self.event_args(manuscript_id, reviewer_id, metadata))
+
+    def record_corrections(self, manuscript_id, author_id, metadata):
+        """
+        Records a corrections submission event on the contract.
+        Args:
+            manuscript_id: The ID of the manuscript
+            author_id: The ID of the author submitting corrections
+            metadata: Additional metadata (dict) to store with the event
+        Returns:
+            Transaction receipt or error dict
+        """
+        return self._transact('recordCorrections', self.event_args(manuscript_id, author_id, metadata))
@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Profile
+from manuscripts import eventstore, reviewers, search, streams
+from manuscripts.models import (
+    AnchorJob, Author, Manuscript, ManuscriptDocument, ManuscriptEvent, ReviewerAssignment, ReviewerWorkload
+)
+from openPublisher import response_cache
+
+# Profile fields shown with the manuscripts a profile submitted
+PROFILE_LISTED_FIELDS = {'email'}
+
+
+def refresh_manuscripts(manuscripts):
+    """Rebuild the read models of changed manuscripts and invalidate their journals' cached lists"""
+    manuscripts = list(manuscripts)
+    if manuscripts:
+        ManuscriptDocument.refresh([manuscript.pk for manuscript in manuscripts])
+        response_cache.bump(*{('journal', manuscript.journal_id_id) for manuscript in manuscripts})
+
+
+@receiver(post_save, sender=Manuscript, weak=False)
+def index_saved_manuscript(sender, instance, created, **kwargs):
+    if instance.sync_keywords() and not created:
+        transaction.on_commit(lambda: reviewers.refresh_manuscript_reviewers(instance.pk))
+    search.index_manuscript(instance)
+    # A new manuscript gets its document with its submission event
+    if not created:
+        refresh_manuscripts([instance])
+
+
+@receiver(m2m_changed, sender=Manuscript.authors.through, weak=False)
+def index_manuscript_authors(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_manuscript(instance)
+        refresh_manuscripts([instance])
+    elif pk_set:
+        manuscripts = list(Manuscript.objects.filter(pk__in=pk_set))
+        for manuscript in manuscripts:
+            search.index_manuscript(manuscript)
+        refresh_manuscripts(manuscripts)
+
+
+@receiver(post_save, sender=Author, weak=False)
+def index_author_manuscripts(sender, instance, created, **kwargs):
+    if not created:
+        manuscripts = list(instance.manuscript_set.all())
+        for manuscript in manuscripts:
+            search.index_manuscript(manuscript)
+        refresh_manuscripts(manuscripts)
+
+
+def listed_profile_fields(profile):
+    return {field: getattr(profile, field) for field in PROFILE_LISTED_FIELDS}
+
+
+@receiver(pre_save, sender=Profile, weak=False)
+def remember_listed_profile_fields(sender, instance, update_fields=None, **kwargs):
+    instance._previous_listed = None
+    # Logins save last_login alone
+    if instance.pk is None or (update_fields is not None and not PROFILE_LISTED_FIELDS & set(update_fields)):
+        return
+    instance._previous_listed = (
+        Profile.objects.filter(pk=instance.pk).values(*PROFILE_LISTED_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=Profile, weak=False)
+def refresh_submitted_manuscripts(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_listed', None)
+    if created or previous is None or previous == listed_profile_fields(instance):
+        return
+    refresh_manuscripts(Manuscript.objects.filter(submitted_by=instance).only('pk', 'journal_id'))
+
+
+@receiver(pre_delete, sender=Manuscript, weak=False)
+def unindex_manuscript(sender, instance, **kwargs):
+    search.remove_manuscript(instance.pk)
+
+
+@receiver(post_save, sender=ReviewerAssignment, weak=False)
+@receiver(post_delete, sender=ReviewerAssignment, weak=False)
+def refresh_reviewer_vector(sender, instance, **kwargs):
+    # After commit, the reviewer may be going away in the same transaction
+    transaction.on_commit(lambda: reviewers.refresh_reviewer(instance.reviewer_id))
+
+
+@receiver(post_save, sender=ManuscriptEvent, weak=False)
+def snapshot_manuscript_state(sender, instance, created, **kwargs):
+    if created and instance.sequence and eventstore.snapshot_due(instance.sequence):
+        transaction.on_commit(lambda: eventstore.take_snapshot(instance.manuscript_id, instance.sequence))
+
+
+@receiver(post_save, sender=ManuscriptEvent, weak=False)
+@receiver(post_save, sender=AnchorJob, weak=False)
+def wake_streams(sender, instance, **kwargs):
+    transaction.on_commit(streams.broker.notify)
+
+
+@receiver(post_save, sender=ManuscriptEvent, weak=False)
+def refresh_reviewer_vector_on_review(sender, instance, created, **kwargs):
+    if created and instance.event_type == ManuscriptEvent.EventType.REVIEW_SUBMITTED:
+        reviewer_id = (instance.metadata or {}).get('reviewer_id')
+        if reviewer_id:
+            transaction.on_commit(lambda: reviewers.refresh_reviewer(reviewer_id))
+
+
+@receiver(pre_save, sender=ReviewerAssignment, weak=False)
+def remember_assignment_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if instance.pk is not None:
+        instance._previous_status = (
+            ReviewerAssignment.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=ReviewerAssignment, weak=False)
+def count_saved_assignment(sender, instance, **kwargs):
+    was_open = getattr(instance, '_previous_status', None) in ReviewerWorkload.OPEN_STATUSES
+    is_open = instance.status in ReviewerWorkload.OPEN_STATUSES
+    ReviewerWorkload.adjust({instance.reviewer_id: is_open - was_open})
+
+
+@receiver(post_delete, sender=ReviewerAssignment, weak=False)
+def count_deleted_assignment(sender, instance, **kwargs):
+    if instance.status in ReviewerWorkload.OPEN_STATUSES:
+        ReviewerWorkload.adjust({instance.reviewer_id: -1})
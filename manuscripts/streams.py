@@ -0,0 +1,258 @@
+"""
+Server-sent event streams of manuscript events and anchoring progress.
+
+Each process runs one Broker. Streams subscribe to a topic ('manuscript:<id>'
+or 'journal:<id>') and get a bounded queue; a single poller per process reads
+new ManuscriptEvent rows and changed AnchorJob rows after its last cursor and
+fans them out to every subscriber of the topics they belong to. However many
+dashboards are open, the database sees one small query per poll, and none at
+all while nobody is subscribed.
+
+The database is the only channel between processes. Every ASGI process
+runs its own Broker and poller, and each poller reads the same tables, so
+streams can be served by any number of processes behind a load balancer and
+see writes from the anchor worker and from WSGI processes. A commit in the
+same process wakes its poller at once; writes from other processes are seen
+within STREAM_POLL_INTERVAL seconds.
+
+A subscriber that falls more than STREAM_BUFFER_SIZE messages behind is cut
+off rather than buffered without bound. Event messages carry the event id,
+so the client's EventSource reconnects with Last-Event-ID and the missed
+events are replayed from the database before the stream goes live again.
+"""
+import asyncio
+import json
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils import timezone
+
+from manuscripts.models import AnchorJob, ManuscriptEvent
+
+# Put in place of the buffered messages when a subscriber falls too far behind
+OVERFLOW = object()
+
+
+def manuscript_topic(manuscript_id):
+    return f'manuscript:{manuscript_id}'
+
+
+def journal_topic(journal_id):
+    return f'journal:{journal_id}'
+
+
+class Message:
+    """One SSE message; only event messages have an id to resume from"""
+
+    def __init__(self, event, data, id=None):
+        self.event = event
+        self.data = data
+        self.id = id
+
+    def encode(self):
+        lines = [f'event: {self.event}']
+        if self.id is not None:
+            lines.append(f'id: {self.id}')
+        lines.append(f'data: {json.dumps(self.data, cls=DjangoJSONEncoder)}')
+        return '\n'.join(lines) + '\n\n'
+
+
+def event_message(event):
+    return Message('manuscript-event', event.to_dict(), id=event.pk)
+
+
+def anchor_message(job):
+    """Anchoring progress of an event, `job` annotated with its manuscript_id"""
+    return Message('anchor', {
+        'event_id': job.event_id,
+        'manuscript_id': job.manuscript_id,
+        'status': job.status,
+        'txn_hash': job.txn_hash,
+        'block_number': job.block_number,
+        'last_error': job.last_error,
+        'updated': job.updated,
+    })
+
+
+class Subscription:
+
+    def __init__(self, topics, maxsize):
+        self.topics = tuple(topics)
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        """Queue a message, replacing the whole buffer with OVERFLOW once it is full"""
+        if self.overflowed:
+            return
+        if self.queue.full():
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+        else:
+            self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """The next message, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """
+    Fan-out of new events and anchoring changes to this process's stream
+    subscribers, fed by polling the database so writes from any process
+    reach them
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._loop = None
+        self._wake = None
+        self._poller = None
+        self._event_cursor = None
+        self._anchor_cursor = None
+
+    def subscribe(self, topics, maxsize=None):
+        """Subscribe to `topics`; must be called from the event loop serving the streams"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new loop (a restarted server, or a test) starts from a clean slate
+            self._subscribers.clear()
+            self._loop, self._wake, self._poller = loop, asyncio.Event(), None
+
+        subscription = Subscription(topics, maxsize or settings.STREAM_BUFFER_SIZE)
+        for topic in subscription.topics:
+            self._subscribers[topic].add(subscription)
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, message):
+        for subscription in list(self._subscribers.get(topic, ())):
+            subscription.put(message)
+
+    def notify(self):
+        """Wake the poller now; safe to call from any thread"""
+        loop, wake = self._loop, self._wake
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    def _read_changes(self):
+        """New events and anchoring changes since the cursors, advancing them"""
+        if self._event_cursor is None:
+            # Only what happens after the first subscriber arrived, earlier events are served by resume
+            self._event_cursor = ManuscriptEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            self._anchor_cursor = (timezone.now(), 0)
+            return [], []
+
+        events = list(
+            ManuscriptEvent.objects
+            .filter(pk__gt=self._event_cursor)
+            .select_related('anchor_job')
+            .annotate(journal=F('manuscript__journal_id'))
+            .order_by('pk')[:settings.STREAM_BACKLOG_LIMIT]
+        )
+        if events:
+            self._event_cursor = events[-1].pk
+
+        updated, job_id = self._anchor_cursor
+        jobs = list(
+            AnchorJob.objects
+            .filter(Q(updated__gt=updated) | Q(updated=updated, pk__gt=job_id))
+            .annotate(manuscript_id=F('event__manuscript_id'), journal=F('event__manuscript__journal_id'))
+            .order_by('updated', 'pk')[:settings.STREAM_BACKLOG_LIMIT]
+        )
+        if jobs:
+            self._anchor_cursor = (jobs[-1].updated, jobs[-1].pk)
+        return events, jobs
+
+    async def _poll(self):
+        while self._subscribers:
+            # Cleared before reading, so a commit during the read still wakes the next round
+            self._wake.clear()
+            events, jobs = await sync_to_async(self._read_changes)()
+            for event in events:
+                message = event_message(event)
+                self.publish(manuscript_topic(event.manuscript_id), message)
+                self.publish(journal_topic(event.journal), message)
+            for job in jobs:
+                message = anchor_message(job)
+                self.publish(manuscript_topic(job.manuscript_id), message)
+                self.publish(journal_topic(job.journal), message)
+
+            if len(events) < settings.STREAM_BACKLOG_LIMIT and len(jobs) < settings.STREAM_BACKLOG_LIMIT:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), settings.STREAM_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        # Nobody is listening, the next subscriber starts from a fresh cursor
+        self._event_cursor = self._anchor_cursor = None
+
+
+broker = Broker()
+
+
+def missed_events(events, last_event_id):
+    """Events after `last_event_id` from a ManuscriptEvent queryset, oldest first"""
+    return list(
+        events
+        .filter(pk__gt=last_event_id)
+        .select_related('anchor_job')
+        .order_by('pk')[:settings.STREAM_BACKLOG_LIMIT]
+    )
+
+
+async def event_stream(topic, events, last_event_id=None):
+    """
+    SSE body for a topic. With `last_event_id` the events after it are read
+    from the `events` queryset first. Ends after STREAM_MAX_AGE seconds, or
+    when the subscriber overflows, and the client reconnects from the last id
+    it saw; this also bounds how long a stream outlives a vanished client.
+    """
+    subscription = broker.subscribe([topic])
+    try:
+        yield f'retry: {settings.STREAM_RETRY_MS}\n\n'
+        # Subscribed before reading the backlog, so nothing falls in between
+        sent = last_event_id or 0
+        if last_event_id is not None:
+            missed = await sync_to_async(missed_events)(events, last_event_id)
+            for event in missed:
+                yield event_message(event).encode()
+                sent = event.pk
+            if len(missed) == settings.STREAM_BACKLOG_LIMIT:
+                # More to catch up on, the client comes straight back for the next chunk
+                return
+
+        deadline = asyncio.get_running_loop().time() + settings.STREAM_MAX_AGE
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            message = await subscription.get(min(settings.STREAM_HEARTBEAT_INTERVAL, remaining))
+            if message is None:
+                yield ': keep-alive\n\n'
+                continue
+            if message is OVERFLOW:
+                break
+            if message.id is not None:
+                if message.id <= sent:
+                    continue
+                sent = message.id
+            yield message.encode()
+    finally:
+        broker.unsubscribe(subscription)
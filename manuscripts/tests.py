@@ -1,3 +1,1298 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import QuerySet
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+
+from accounts.models import Profile
+from journals.models import Journal
+from rest_framework.authtoken.models import Token
+from manuscripts import anchoring, assignments, chainindex, eventstore, filestore, merkle, reviewers, search, streams
+from manuscripts.backends import LogRecorder, RecordedLogs, SimulatedLedger, Web3Backend
+from manuscripts.models import (
+    AnchorJob, Author, ChainCursor, ChainLog, CorrectionUpload, EventSourcedFieldError, Keyword, Manuscript,
+    ManuscriptDocument, ManuscriptEvent, ManuscriptSnapshot, NonceCounter, ReviewerAssignment, ReviewerWorkload,
+    ReviewerVector, SearchTerm, UploadChunk
+)
+from manuscripts.queries import manuscript_filters
+from manuscripts.sepolia import Sepolia
+from manuscripts.views import AsyncGetLocalManuscripts, EventStreamView
+from openPublisher import async_support, response_cache
+from openPublisher.pagination import KeysetPagination
+
+
+class ManuscriptTestCase(TestCase):
+    """An editor, a journal and a helper to submit manuscripts to it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = Profile.objects.create_superuser(
+            email='editor@example.org', password='password', first_name='Ed', last_name='Itor'
+        )
+        cls.journal = Journal.objects.create(
+            title='Journal', abbreviation='J', description='Journal', publisher='Publisher',
+            online_issn='0000-0001', print_issn='0000-0002', created_by=cls.editor
+        )
+
+    def make_manuscript(self, title='Manuscript', journal=None, submitted_by=None):
+        manuscript = Manuscript.objects.create(
+            title=title,
+            abstract=f'Abstract of {title}',
+            keywords=['keyword'],
+            journal_id=journal or self.journal,
+            submitted_by=submitted_by or self.editor,
+        )
+        event = manuscript.record_submission(actor=submitted_by or self.editor, txn_hash='')
+        return manuscript, event
+
+
+class SearchTests(ManuscriptTestCase):
+    def setUp(self):
+        cache.delete(search.STATS_CACHE_KEY)
+        self.other_journal = Journal.objects.create(
+            title='Other', abbreviation='O', description='Other', publisher='Publisher',
+            online_issn='0000-0003', print_issn='0000-0004', created_by=self.editor
+        )
+
+    def ids(self, query, **kwargs):
+        cache.delete(search.STATS_CACHE_KEY)
+        return [pk for pk, _ in search.search(query, **kwargs)]
+
+    def test_title_outranks_abstract(self):
+        in_abstract, _ = self.make_manuscript('Maize yields')
+        in_abstract.abstract = 'Soil salinity in semi-arid regions'
+        in_abstract.save()
+        in_title, _ = self.make_manuscript('Soil salinity and maize')
+        self.assertEqual(self.ids('salinity'), [in_title.pk, in_abstract.pk])
+
+    def test_last_term_matches_as_prefix(self):
+        manuscript, _ = self.make_manuscript('Groundwater salinity')
+        self.assertEqual(self.ids('groundwater sal'), [manuscript.pk])
+        self.assertEqual(self.ids('sal'), [manuscript.pk])
+        self.assertEqual(self.ids('the of'), [])
+
+    def test_journal_filter(self):
+        here, _ = self.make_manuscript('Irrigation scheduling')
+        self.make_manuscript('Irrigation scheduling', journal=self.other_journal)
+        self.assertEqual(self.ids('irrigation', journal_id=self.journal.pk), [here.pk])
+        self.assertEqual(len(self.ids('irrigation')), 2)
+
+    def test_edits_and_deletes_update_the_index(self):
+        manuscript, _ = self.make_manuscript('Cassava mosaic disease')
+        manuscript.title = 'Banana wilt'
+        manuscript.abstract = 'Spread of a leaf disease'
+        manuscript.save()
+        self.assertEqual(self.ids('cassava'), [])
+        self.assertEqual(self.ids('banana'), [manuscript.pk])
+
+        author = Author.objects.create(first_name='Wanjiru', last_name='Kamau', email='w@example.org',
+                                       affiliation='University')
+        manuscript.authors.add(author)
+        self.assertEqual(self.ids('kamau'), [manuscript.pk])
+
+        search.remove_manuscript(manuscript.pk)
+        self.assertEqual(self.ids('banana'), [])
+        call_command('rebuild_search_index', '--doc-freqs', stdout=StringIO())
+        self.assertEqual(SearchTerm.objects.get(term='banana').doc_freq, 0)
+
+    def test_indexing_leaves_doc_freqs_to_the_batch(self):
+        self.make_manuscript('Millet storage')
+        with CaptureQueriesContext(connection) as queries:
+            self.make_manuscript('Millet storage pests')
+        self.assertFalse([q for q in queries.captured_queries if 'UPDATE' in q['sql'] and 'searchterm' in q['sql']])
+        self.assertEqual(SearchTerm.objects.get(term='millet').doc_freq, 1)
+        self.assertTrue(search.refresh_doc_freqs())
+        self.assertEqual(SearchTerm.objects.get(term='millet').doc_freq, 2)
+        self.assertEqual(SearchTerm.objects.get(term='pests').doc_freq, 1)
+
+    def test_ranking_reads_the_highest_impact_postings_of_a_term(self):
+        short, _ = self.make_manuscript('Teff')
+        longer, _ = self.make_manuscript('Teff')
+        longer.abstract = 'Nutrient uptake of teff under intercropping with legumes'
+        longer.save()
+        self.assertEqual(self.ids('teff'), [short.pk, longer.pk])
+        with mock.patch.object(search, 'MAX_POSTINGS_PER_TERM', 1):
+            self.assertEqual(self.ids('teff'), [short.pk])
+
+    def test_unchanged_text_is_not_reindexed(self):
+        manuscript, _ = self.make_manuscript('Drought tolerance')
+        self.assertFalse(search.index_manuscript(manuscript))
+
+    def test_endpoint_pages_results(self):
+        for i in range(3):
+            self.make_manuscript(f'Sorghum trial {i}')
+        self.assertEqual(self.client.get('/manuscripts/search').status_code, 400)
+        cache.delete(search.STATS_CACHE_KEY)
+        body = self.client.get('/manuscripts/search', {'q': 'sorghum', 'page_size': 2}).json()
+        self.assertEqual(len(body['results']), 2)
+        self.assertIsNotNone(body['next'])
+        body = self.client.get(f'/manuscripts/{self.journal.pk}/search', {'q': 'sorghum', 'page': 2, 'page_size': 2})
+        self.assertEqual(len(body.json()['results']), 1)
+        self.assertIsNone(body.json()['next'])
+
+
+class KeywordTests(ManuscriptTestCase):
+    def tagged(self, title, keywords, status=None):
+        manuscript = Manuscript.objects.create(
+            title=title, abstract='Abstract', keywords=keywords, journal_id=self.journal, submitted_by=self.editor
+        )
+        if status:
+            Manuscript.objects.filter(pk=manuscript.pk).update(status=status)
+        return manuscript
+
+    def names(self, manuscript):
+        return sorted(manuscript.keyword_links.values_list('keyword__name', flat=True))
+
+    def test_keywords_are_normalized(self):
+        manuscript = self.tagged('One', [{'keyword': '  Soil  Salinity '}, 'soil salinity', {'keyword': 'Maize'}, ''])
+        self.assertEqual(self.names(manuscript), ['maize', 'soil salinity'])
+        self.assertEqual(Keyword.objects.count(), 2)
+
+    def test_links_follow_edits(self):
+        manuscript = self.tagged('One', ['maize', 'soil'])
+        manuscript.keywords = ['soil', 'drought']
+        manuscript.save()
+        self.assertEqual(self.names(manuscript), ['drought', 'soil'])
+        self.assertFalse(manuscript.sync_keywords())
+
+    def test_facets(self):
+        self.tagged('One', ['maize', 'soil'])
+        self.tagged('Two', ['maize'], status=Manuscript.Status.REVIEW)
+        self.tagged('Three', ['Maize', 'drought'], status=Manuscript.Status.REVIEW)
+
+        body = self.client.get(f'/manuscripts/{self.journal.pk}/keywords').json()
+        self.assertEqual(body['keywords'], [
+            {'keyword': 'maize', 'count': 3}, {'keyword': 'drought', 'count': 1}, {'keyword': 'soil', 'count': 1},
+        ])
+        body = self.client.get(f'/manuscripts/{self.journal.pk}/keywords', {'status': 'REVIEW', 'limit': 1}).json()
+        self.assertEqual(body['keywords'], [{'keyword': 'maize', 'count': 2}])
+        response = self.client.get(f'/manuscripts/{self.journal.pk}/keywords', {'status': 'LOST'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reviewer_vectors_upsert_on_any_backend(self):
+        reviewer = Profile.objects.create_user(email='r@example.org', password='password', first_name='R',
+                                               last_name='Eviewer')
+        ReviewerAssignment.objects.create(manuscript=self.tagged('One', ['maize', 'soil']), reviewer=reviewer)
+        reviewers.refresh_reviewer(reviewer.pk)
+
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(QuerySet, 'bulk_create') as bulk_create:
+            reviewers.refresh_reviewer(reviewer.pk)
+        upsert = bulk_create.call_args_list[-1].kwargs
+        self.assertTrue(upsert['update_conflicts'])
+        self.assertNotIn('unique_fields', upsert)
+
+        ReviewerAssignment.objects.create(manuscript=self.tagged('Two', ['drought']), reviewer=reviewer)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(connection.features, 'supports_update_conflicts', False):
+            reviewers.refresh_reviewer(reviewer.pk)
+        self.assertEqual(ReviewerVector.objects.get(reviewer=reviewer).manuscripts, 2)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_list_filter(self):
+        tagged = self.tagged('One', ['Soil Salinity'])
+        self.tagged('Two', ['maize'])
+        results = self.client.get(f'/manuscripts/{self.journal.pk}', {'keyword': ' soil  SALINITY'}).json()['results']
+        self.assertEqual([result['id'] for result in results], [tagged.pk])
+        self.assertEqual(results[0]['keywords'], ['Soil Salinity'])
+
+
+class FileTestCase(ManuscriptTestCase):
+    """Manuscript file tests, with MEDIA_ROOT in a temporary directory"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.manuscript, _ = self.make_manuscript()
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.get(user=self.editor).key}'}
+
+
+class ChunkedUploadTests(FileTestCase):
+    content = b'0123456789'
+
+    def url(self, suffix=''):
+        return f'/manuscripts/{self.journal.pk}/{self.manuscript.pk}/uploads{suffix}'
+
+    def start(self, **data):
+        data = {'filename': 'corrections.docx', 'size': len(self.content), 'chunk_size': 4, **data}
+        return self.client.post(self.url(), data, content_type='application/json', **self.auth)
+
+    def put_chunk(self, upload_id, index, data, checksum=None):
+        return self.client.put(
+            self.url(f'/{upload_id}/chunks/{index}'), data, content_type='application/octet-stream',
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(data).hexdigest(), **self.auth
+        )
+
+    def complete(self, upload_id):
+        return self.client.post(self.url(f'/{upload_id}/complete'), **self.auth)
+
+    def test_upload_in_chunks(self):
+        upload = self.start(sha256=hashlib.sha256(self.content).hexdigest()).json()
+        self.assertEqual(upload['chunk_count'], 3)
+        # Out of order, and a chunk sent twice
+        for index in (2, 0, 1, 1):
+            chunk = self.content[index * 4:(index + 1) * 4]
+            self.assertEqual(self.put_chunk(upload['upload_id'], index, chunk).status_code, 200)
+
+        response = self.complete(upload['upload_id'])
+        self.assertEqual(response.status_code, 200)
+        upload = CorrectionUpload.objects.get(pk=upload['upload_id'])
+        self.assertEqual(upload.status, CorrectionUpload.Status.COMPLETE)
+        self.assertEqual(upload.path, filestore.blob_path(hashlib.sha256(self.content).hexdigest()))
+        with default_storage.open(upload.path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_rejects_bad_uploads(self):
+        self.assertEqual(self.start(filename='corrections.pdf').status_code, 400)
+        self.assertEqual(self.start(size=0).status_code, 400)
+        self.assertEqual(self.start(chunk_size=settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE + 1).status_code, 400)
+        self.assertEqual(self.start(sha256='not a digest').status_code, 400)
+
+    def test_chunk_checksum_mismatch(self):
+        upload_id = self.start().json()['upload_id']
+        response = self.put_chunk(upload_id, 0, b'0123', checksum=hashlib.sha256(b'3210').hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('checksum mismatch', response.json()['message'])
+        self.assertEqual(self.client.get(self.url(f'/{upload_id}'), **self.auth).json()['received'], [])
+
+    def test_chunk_of_wrong_length_or_index(self):
+        upload_id = self.start().json()['upload_id']
+        self.assertEqual(self.put_chunk(upload_id, 2, b'89ab').status_code, 400)
+        self.assertEqual(self.put_chunk(upload_id, 3, b'89').status_code, 400)
+
+    def test_complete_with_missing_chunks(self):
+        upload_id = self.start().json()['upload_id']
+        self.put_chunk(upload_id, 0, b'0123')
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Missing chunks: 1, 2')
+        self.assertEqual(CorrectionUpload.objects.get(pk=upload_id).status, CorrectionUpload.Status.OPEN)
+
+    def test_file_checksum_mismatch(self):
+        upload_id = self.start(sha256=hashlib.sha256(b'something else').hexdigest()).json()['upload_id']
+        for index in range(3):
+            self.put_chunk(upload_id, index, self.content[index * 4:(index + 1) * 4])
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'File checksum mismatch')
+
+    def test_uploads_belong_to_their_uploader(self):
+        upload_id = self.start().json()['upload_id']
+        other = Profile.objects.create_user(email='other@example.org', password='password', first_name='O',
+                                            last_name='Ther')
+        response = self.client.get(self.url(f'/{upload_id}'),
+                                   HTTP_AUTHORIZATION=f'Token {Token.objects.get(user=other).key}')
+        self.assertEqual(response.status_code, 404)
+
+    def upload_all(self):
+        upload_id = self.start().json()['upload_id']
+        for index in range(3):
+            self.put_chunk(upload_id, index, self.content[index * 4:(index + 1) * 4])
+        self.assertEqual(self.complete(upload_id).status_code, 200)
+        return upload_id
+
+    def test_upload_backs_one_submission(self):
+        upload_id = self.upload_all()
+        url = f'/manuscripts/{self.journal.pk}/{self.manuscript.pk}/submit-corrections'
+        data = {'upload_id': upload_id, 'comments': 'Fixed typos'}
+        response = self.client.post(url, data, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(CorrectionUpload.objects.get(pk=upload_id).status, CorrectionUpload.Status.ATTACHED)
+
+        response = self.client.post(url, data, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.manuscript.file_versions().count(), 1)
+
+    @override_settings(CHUNKED_UPLOAD_MAX_OPEN=2)
+    def test_open_uploads_per_user_are_capped(self):
+        first = self.start().json()['upload_id']
+        self.assertEqual(self.start().status_code, 201)
+        response = self.start()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 2 uploads', response.json()['message'])
+
+        # An expired upload no longer counts
+        expired = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY + 1)
+        CorrectionUpload.objects.filter(pk=first).update(created=expired)
+        self.assertEqual(self.start().status_code, 201)
+
+    def test_abandoned_uploads_are_cleaned(self):
+        expired = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY + 1)
+        abandoned = CorrectionUpload.objects.get(pk=self.start().json()['upload_id'])
+        self.put_chunk(abandoned.pk, 0, b'0123')
+        UploadChunk.objects.filter(upload=abandoned).update(received=expired)
+        unsubmitted = CorrectionUpload.objects.get(pk=self.upload_all())
+        resumed = self.start().json()['upload_id']
+        CorrectionUpload.objects.filter(pk__in=[abandoned.pk, resumed]).update(created=expired)
+        CorrectionUpload.objects.filter(pk=unsubmitted.pk).update(completed=expired)
+        blob = default_storage.path(unsubmitted.path)
+        os.utime(blob, (expired.timestamp(), expired.timestamp()))
+        self.put_chunk(resumed, 0, b'0123')
+
+        call_command('clean_correction_uploads', stdout=StringIO())
+        self.assertEqual(list(CorrectionUpload.objects.values_list('pk', flat=True)), [uuid.UUID(resumed)])
+        self.assertFalse(default_storage.exists(abandoned.path))
+        self.assertFalse(os.path.exists(blob))
+
+    def test_cleaning_keeps_content_of_stored_files(self):
+        unsubmitted = CorrectionUpload.objects.get(pk=self.upload_all())
+        self.manuscript.add_file(filename='corrections.docx', sha256=unsubmitted.sha256, size=unsubmitted.size,
+                                 uploaded_by=self.editor)
+        expired = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY + 1)
+        CorrectionUpload.objects.filter(pk=unsubmitted.pk).update(completed=expired)
+        os.utime(default_storage.path(unsubmitted.path), (expired.timestamp(), expired.timestamp()))
+
+        call_command('clean_correction_uploads', stdout=StringIO())
+        self.assertFalse(CorrectionUpload.objects.exists())
+        self.assertTrue(default_storage.exists(unsubmitted.path))
+
+
+class FileStoreTests(FileTestCase):
+    def test_identical_content_is_stored_once(self):
+        first = filestore.store([b'same ', b'bytes'])
+        second = filestore.store([b'same bytes'])
+        digest = hashlib.sha256(b'same bytes').hexdigest()
+        self.assertEqual(first, (digest, 10, filestore.blob_path(digest)))
+        self.assertEqual(second, first)
+        self.assertEqual(os.listdir(default_storage.path(f'{filestore.BLOB_ROOT}/tmp')), [])
+        self.assertEqual(filestore.digest_of(first[2]), digest)
+
+    def test_different_content_is_stored_apart(self):
+        _, _, first = filestore.store([b'one'])
+        _, _, second = filestore.store([b'two'])
+        self.assertNotEqual(first, second)
+        self.assertTrue(default_storage.exists(first) and default_storage.exists(second))
+
+    def test_adopt_drops_a_duplicate(self):
+        digest, _, stored = filestore.store([b'content'])
+        default_storage.save('uploads/copy', ContentFile(b'content'))
+        self.assertEqual(filestore.adopt('uploads/copy', digest), stored)
+        self.assertFalse(default_storage.exists('uploads/copy'))
+
+    def test_failed_store_leaves_nothing_behind(self):
+        def chunks():
+            yield b'partial'
+            raise OSError('connection reset')
+
+        with self.assertRaises(OSError):
+            filestore.store(chunks())
+        self.assertEqual(os.listdir(default_storage.path(f'{filestore.BLOB_ROOT}/tmp')), [])
+
+
+class DownloadTests(FileTestCase):
+    content = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        digest, size, _ = filestore.store([self.content])
+        self.manuscript_file = self.manuscript.add_file('corrections.docx', digest, size, self.editor)
+
+    def url(self, suffix='/latest', journal=None):
+        return f'/manuscripts/{(journal or self.journal).pk}/{self.manuscript.pk}/files{suffix}'
+
+    def login(self, email):
+        user = Profile.objects.create_user(email=email, password='password', first_name='A', last_name='User')
+        return {'HTTP_AUTHORIZATION': f'Token {Token.objects.get(user=user).key}'}, user
+
+    def test_full_download(self):
+        response = self.client.get(self.url('/1'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], self.manuscript_file.etag)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range_request(self):
+        response = self.client.get(self.url(), HTTP_RANGE='bytes=2-5', **self.auth)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.client.get(self.url(), HTTP_RANGE='bytes=-3', **self.auth)
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url(), HTTP_RANGE='bytes=10-', **self.auth)
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=self.manuscript_file.etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_range(self):
+        # A stale validator gets the whole file rather than a slice of different bytes
+        response = self.client.get(self.url(), HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url(), HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=self.manuscript_file.etag, **self.auth
+        )
+        self.assertEqual(response.status_code, 206)
+
+    def test_invalid_kind(self):
+        self.assertEqual(self.client.get(self.url(), {'kind': 'OTHER'}, **self.auth).status_code, 400)
+        self.assertEqual(self.client.get(self.url(''), {'kind': 'OTHER'}, **self.auth).status_code, 400)
+
+    def test_other_journal(self):
+        journal = Journal.objects.create(
+            title='Other', abbreviation='O', description='Other', publisher='Publisher',
+            online_issn='0000-0003', print_issn='0000-0004', created_by=self.editor
+        )
+        self.assertEqual(self.client.get(self.url(journal=journal), **self.auth).status_code, 404)
+        self.assertEqual(self.client.get(self.url('', journal=journal), **self.auth).status_code, 404)
+
+    def test_access(self):
+        outsider, _ = self.login('outsider@example.org')
+        self.assertEqual(self.client.get(self.url(), **outsider).status_code, 403)
+        self.assertEqual(self.client.get(self.url(''), **outsider).status_code, 403)
+
+        author, _ = self.login('author@example.org')
+        self.manuscript.authors.add(Author.objects.create(
+            first_name='A', last_name='Author', email='Author@example.org', affiliation='University'
+        ))
+        self.assertEqual(self.client.get(self.url(), **author).status_code, 200)
+
+        reviewer_auth, reviewer = self.login('reviewer@example.org')
+        assignment = ReviewerAssignment.objects.create(manuscript=self.manuscript, reviewer=reviewer)
+        self.assertEqual(self.client.get(self.url(''), **reviewer_auth).status_code, 200)
+        assignment.status = ReviewerAssignment.Status.DECLINED
+        assignment.save()
+        self.assertEqual(self.client.get(self.url(''), **reviewer_auth).status_code, 403)
+
+
+class BulkAssignmentTests(ManuscriptTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.reviewers = [
+            Profile.objects.create_user(
+                email=f'reviewer{i}@example.org', password='password', first_name='Re', last_name=f'Viewer{i}'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.manuscripts = []
+        for title in ('First', 'Second'):
+            manuscript, _ = self.make_manuscript(title)
+            manuscript.record_acceptance(actor=self.editor, txn_hash='')
+            self.manuscripts.append(manuscript)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.get(user=self.editor).key}'}
+
+    def item(self, manuscript, reviewer, **extra):
+        return {'manuscript_id': manuscript.pk, 'reviewer_id': str(reviewer.pk), **extra}
+
+    def post(self, items):
+        return self.client.post(
+            f'/manuscripts/{self.journal.pk}/assign-reviewers', {'assignments': items},
+            content_type='application/json', **self.auth
+        )
+
+    def test_assigns_every_item(self):
+        first, second = self.manuscripts
+        items = [
+            self.item(first, self.reviewers[0], due_date='2030-12-31'),
+            self.item(first, self.reviewers[1]),
+            self.item(second, self.reviewers[0]),
+        ]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 202)
+        data = response.json()['data']
+        self.assertEqual([(row['manuscript_id'], row['reviewer']['id']) for row in data],
+                         [(item['manuscript_id'], item['reviewer_id']) for item in items])
+
+        self.assertEqual(ReviewerAssignment.objects.count(), 3)
+        self.assertEqual(AnchorJob.objects.filter(fn_name='recordReviewerAssignment').count(), 3)
+        # Submission, acceptance, then one event per assignment, numbered in request order
+        first.refresh_from_db()
+        self.assertEqual(first.event_sequence, 4)
+        self.assertEqual(
+            list(first.events.filter(event_type=ManuscriptEvent.EventType.REVIEWER_ASSIGNED)
+                 .order_by('sequence').values_list('sequence', flat=True)),
+            [3, 4]
+        )
+        self.assertEqual(ReviewerWorkload.objects.get(reviewer=self.reviewers[0]).open_assignments, 2)
+
+    def test_nothing_is_written_unless_every_item_is_valid(self):
+        first, second = self.manuscripts
+        ReviewerAssignment.objects.create(manuscript=second, reviewer=self.reviewers[2])
+        other, _ = self.make_manuscript('Not accepted')
+        items = [
+            self.item(first, self.reviewers[0]),
+            self.item(first, self.editor),
+            self.item(first, self.reviewers[0]),
+            self.item(second, self.reviewers[2]),
+            self.item(other, self.reviewers[1]),
+            {'manuscript_id': 'x', 'reviewer_id': 'y'},
+            {'manuscript_id': 0, 'reviewer_id': str(self.reviewers[1].pk)},
+        ]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(ReviewerAssignment.objects.count(), 1)
+        self.assertFalse(AnchorJob.objects.filter(fn_name='recordReviewerAssignment').exists())
+        self.assertEqual(first.events.count(), 2)
+
+    @override_settings(BULK_ASSIGNMENT_MAX_ITEMS=2)
+    def test_item_limit(self):
+        items = [self.item(self.manuscripts[0], reviewer) for reviewer in self.reviewers]
+        self.assertEqual(self.post(items).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post(items[:2]).status_code, 202)
+
+    def test_validation_queries_do_not_grow_with_items(self):
+        items = [self.item(manuscript, reviewer) for manuscript in self.manuscripts for reviewer in self.reviewers]
+        with self.assertNumQueries(3):
+            assignments.validate(self.journal, items[:1])
+        with self.assertNumQueries(3):
+            assignments.validate(self.journal, items)
+
+
+class EventStoreTests(ManuscriptTestCase):
+    def assigned(self, manuscript, number):
+        return ManuscriptEvent(
+            manuscript_id=manuscript.pk, event_type=ManuscriptEvent.EventType.REVIEWER_ASSIGNED,
+            actor=self.editor, txn_hash='', metadata={'reviewer_id': f'reviewer-{number}'}
+        )
+
+    def test_status_changes_only_through_events(self):
+        manuscript, _ = self.make_manuscript()
+        manuscript.status = Manuscript.Status.PUBLISHED
+        with self.assertRaises(EventSourcedFieldError):
+            manuscript.save()
+
+        manuscript.refresh_from_db()
+        manuscript.record_acceptance(actor=self.editor, txn_hash='')
+        manuscript.title = 'Renamed'
+        manuscript.save()
+        self.assertEqual(
+            Manuscript.objects.values_list('status', 'event_sequence', 'title').get(pk=manuscript.pk),
+            (Manuscript.Status.ACCEPTED, 2, 'Renamed')
+        )
+
+    def test_stale_instance_keeps_newer_events(self):
+        manuscript, _ = self.make_manuscript()
+        stale = Manuscript.objects.get(pk=manuscript.pk)
+        manuscript.record_acceptance(actor=self.editor, txn_hash='')
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(
+            Manuscript.objects.values_list('status', 'event_sequence').get(pk=manuscript.pk),
+            (Manuscript.Status.ACCEPTED, 2)
+        )
+
+    def test_assignment_leaves_status_alone(self):
+        manuscript, _ = self.make_manuscript()
+        manuscript.record_acceptance(actor=self.editor, txn_hash='')
+        manuscript.assign_reviewer(self.editor, txn_hash='', actor=self.editor)
+        self.assertEqual(Manuscript.objects.get(pk=manuscript.pk).status, Manuscript.Status.ACCEPTED)
+
+    def test_document_is_rebuilt_once_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            manuscript, _ = self.make_manuscript()
+        with mock.patch.object(ManuscriptDocument, 'refresh', wraps=ManuscriptDocument.refresh) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                event = manuscript.record_acceptance(actor=self.editor, txn_hash='')
+                anchoring.anchor_manuscript(event, manuscript.to_json())
+        refresh.assert_called_once()
+        document = self.client.get(f'/manuscripts/{self.journal.pk}/{manuscript.pk}').json()
+        self.assertEqual(document['status'], Manuscript.Status.ACCEPTED)
+        anchored = {entry['event_type']: entry['anchor_status'] for entry in document['provenance']}
+        self.assertEqual(anchored[ManuscriptEvent.EventType.ACCEPTANCE], AnchorJob.Status.PENDING)
+
+    def test_append_many_sequences_each_log(self):
+        first, _ = self.make_manuscript('First')
+        second, _ = self.make_manuscript('Second')
+        events = eventstore.append_many([
+            self.assigned(first, 1), self.assigned(second, 2), self.assigned(first, 3)
+        ])
+        self.assertEqual([(event.manuscript_id, event.sequence) for event in events],
+                         [(first.pk, 2), (second.pk, 2), (first.pk, 3)])
+        self.assertEqual(Manuscript.objects.get(pk=first.pk).event_sequence, 3)
+        self.assertEqual(eventstore.replay(first.pk)['reviewers'], ['reviewer-1', 'reviewer-3'])
+        self.assertTrue(eventstore.audit(Manuscript.objects.get(pk=second.pk))['consistent'])
+
+    @override_settings(EVENT_SNAPSHOT_INTERVAL=3)
+    def test_snapshots_match_a_full_replay(self):
+        manuscript, _ = self.make_manuscript()
+        with self.captureOnCommitCallbacks(execute=True):
+            manuscript.record_acceptance(actor=self.editor, txn_hash='')
+            eventstore.append_many([self.assigned(manuscript, number) for number in range(5)])
+        manuscript.refresh_from_db()
+        manuscript.record_review(self.editor, 'Fine', 'ACCEPT', actor=self.editor, txn_hash='')
+        self.assertEqual(list(manuscript.snapshots.values_list('sequence', flat=True).order_by('sequence')), [3, 6])
+
+        from_snapshot = eventstore.replay(manuscript.pk)
+        middle = eventstore.replay(manuscript.pk, upto=5)
+        ManuscriptSnapshot.objects.filter(manuscript=manuscript).delete()
+        self.assertEqual(from_snapshot, eventstore.replay(manuscript.pk))
+        self.assertEqual(middle, eventstore.replay(manuscript.pk, upto=5))
+        self.assertEqual((from_snapshot['sequence'], from_snapshot['reviews']), (8, 1))
+
+
+class AsyncSupportTests(TestCase):
+    def query_thread(self):
+        pool = ThreadPoolExecutor(1)
+        self.addCleanup(pool.shutdown)
+        self.addCleanup(lambda: pool.submit(connections.close_all).result())
+        return pool
+
+    @staticmethod
+    def connected():
+        connection.ensure_connection()
+        return connection.connection
+
+    def test_query_threads_keep_their_connection(self):
+        pool = self.query_thread()
+        with mock.patch.object(type(connections['default']), 'close', autospec=True) as close:
+            first = pool.submit(async_support._call, self.connected).result()
+            self.assertIs(pool.submit(async_support._call, self.connected).result(), first)
+            close.assert_not_called()
+
+            # Past its age the connection is closed after the query, never in the middle of a view
+            with self.settings(ASYNC_QUERY_CONN_MAX_AGE=0):
+                pool.submit(async_support._call, self.connected).result()
+            close.assert_called_once()
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_unknown_journal_with_invalid_filter(self):
+        request = RequestFactory().get('/manuscripts/0', {'submitted_from': 'yesterday'})
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = async_to_sync(AsyncGetLocalManuscripts.as_view())(request, journal_id=0)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse([warning for warning in caught if 'never awaited' in str(warning.message)])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ListingQueryTests(ManuscriptTestCase):
+    """Listing pages load in a fixed number of queries whatever their size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.reviewer = Profile.objects.create_user(
+            email='reviewer@example.org', password='password', first_name='Re', last_name='Viewer'
+        )
+        cls.token, _ = Token.objects.get_or_create(user=cls.reviewer)
+        for i in range(12):
+            manuscript = Manuscript.objects.create(
+                title=f'Manuscript {i}', abstract='Abstract', keywords=['keyword'],
+                journal_id=cls.journal, submitted_by=cls.editor
+            )
+            manuscript.authors.set([
+                Author.objects.create(first_name='A', last_name=f'Author {i}.{n}', email='a@example.org',
+                                      affiliation='University')
+                for n in range(2)
+            ])
+            ReviewerAssignment.objects.create(manuscript=manuscript, reviewer=cls.reviewer)
+
+    def assertConstantQueries(self, url, **headers):
+        # Warms the token cache, so both measured requests authenticate alike
+        self.client.get(url, {'page_size': 1}, **headers)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(url, {'page_size': 2}, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        with self.assertNumQueries(len(small)):
+            response = self.client.get(url, {'page_size': 10}, **headers)
+        self.assertEqual(len(response.json()['results']), 10)
+        self.assertEqual(len(response.json()['results'][0]['authors']), 2)
+
+    def test_manuscript_list(self):
+        self.assertConstantQueries(f'/manuscripts/{self.journal.pk}')
+
+    def test_assigned_reviews(self):
+        self.assertConstantQueries('/manuscripts/assigned-reviews', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+
+class ReadModelTests(ManuscriptTestCase):
+    """Manuscript documents and cached lists follow edits made outside the event log"""
+
+    def setUp(self):
+        self.manuscript, _ = self.make_manuscript()
+        self.author = Author.objects.create(first_name='A', last_name='Author', email='a@example.org',
+                                            affiliation='University')
+
+    def document(self):
+        response = self.client.get(f'/manuscripts/{self.journal.pk}/{self.manuscript.pk}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def listing(self):
+        return self.client.get(f'/manuscripts/{self.journal.pk}').json()['results']
+
+    def test_manuscript_save(self):
+        self.document()
+        self.listing()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manuscript.title = 'Renamed'
+            self.manuscript.save()
+        self.assertEqual(self.document()['title'], 'Renamed')
+        self.assertEqual(self.listing()[0]['title'], 'Renamed')
+
+    def test_upsert_on_mysql_names_no_conflict_target(self):
+        # MySQL upserts with ON DUPLICATE KEY UPDATE and rejects unique_fields
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(QuerySet, 'bulk_create') as bulk_create:
+            ManuscriptDocument.refresh([self.manuscript.pk])
+        self.assertTrue(bulk_create.call_args.kwargs['update_conflicts'])
+        self.assertNotIn('unique_fields', bulk_create.call_args.kwargs)
+
+    def test_rebuild_without_upserts(self):
+        reviewer = Profile.objects.create_user(email='r@example.org', password='password', first_name='R',
+                                               last_name='Eviewer')
+        ReviewerAssignment.objects.create(manuscript=self.manuscript, reviewer=reviewer)
+        ReviewerWorkload.objects.filter(reviewer=reviewer).update(open_assignments=5)
+        Manuscript.objects.filter(pk=self.manuscript.pk).update(title='Renamed')
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(connection.features, 'supports_update_conflicts', False):
+            ManuscriptDocument.refresh([self.manuscript.pk])
+            ReviewerWorkload.recount()
+        self.assertEqual(ManuscriptDocument.objects.filter(manuscript=self.manuscript).count(), 1)
+        self.assertEqual(self.document()['title'], 'Renamed')
+        self.assertEqual(ReviewerWorkload.objects.get(reviewer=reviewer).open_assignments, 1)
+
+    def test_authors_changed(self):
+        self.document()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manuscript.authors.add(self.author)
+        self.assertEqual([author['last_name'] for author in self.document()['authors']], ['Author'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.manuscript_set.remove(self.manuscript)
+        self.assertEqual(self.document()['authors'], [])
+
+    def test_author_edited(self):
+        self.manuscript.authors.add(self.author)
+        self.document()
+        self.listing()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.last_name = 'Renamed'
+            self.author.save()
+        self.assertEqual(self.document()['authors'][0]['last_name'], 'Renamed')
+        self.assertEqual(self.listing()[0]['authors'][0]['last_name'], 'Renamed')
+
+    def test_submitter_edited(self):
+        self.listing()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.editor.email = 'new-editor@example.org'
+            self.editor.save()
+        self.assertEqual(self.listing()[0]['submitted_by'], 'new-editor@example.org')
+        self.assertEqual(self.document()['submitted_by'], 'new-editor@example.org')
+
+    def test_profile_saved_unchanged_leaves_documents_alone(self):
+        with mock.patch.object(ManuscriptDocument, 'refresh') as refresh:
+            self.editor.first_name = 'Renamed'
+            self.editor.save()
+        refresh.assert_not_called()
+
+    def test_login_leaves_documents_alone(self):
+        with mock.patch.object(ManuscriptDocument, 'refresh') as refresh:
+            self.editor.last_login = timezone.now()
+            self.editor.save(update_fields=['last_login'])
+        refresh.assert_not_called()
+
+
+class ResponseCacheTests(ManuscriptTestCase):
+    def test_bumps_from_other_processes_are_seen(self):
+        self.make_manuscript('Before')
+        url = f'/manuscripts/{self.journal.pk}'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        # The anchor worker's own connection to the shared cache table
+        other_process = DatabaseCache(settings.CACHES['responses']['LOCATION'], {})
+        other_process.incr(f'version:journal:{self.journal.pk}')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_bump_writes_a_new_version(self):
+        before = response_cache.versions(('journal', self.journal.pk))
+        with mock.patch.object(DatabaseCache, 'incr') as incr:
+            with self.captureOnCommitCallbacks(execute=True):
+                response_cache.bump(('journal', self.journal.pk))
+        incr.assert_not_called()
+        self.assertNotEqual(response_cache.versions(('journal', self.journal.pk)), before)
+
+    @override_settings(RESPONSE_CACHE_STATS_INTERVAL=3600)
+    def test_hits_are_counted_in_process(self):
+        self.make_manuscript()
+        response_cache.reset_stats()
+        url = f'/manuscripts/{self.journal.pk}'
+        self.client.get(url)
+        with mock.patch.object(DatabaseCache, 'incr') as incr, mock.patch.object(DatabaseCache, 'set') as set_:
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        incr.assert_not_called()
+        set_.assert_not_called()
+        self.assertEqual(list(response_cache.stats().values()), [{'hits': 1, 'misses': 1}])
+
+    def test_process_local_cache_expires_quickly(self):
+        self.assertEqual(response_cache._timeout(), settings.RESPONSE_CACHE_TIMEOUT)
+        local = {'default': settings.CACHES['default'], 'responses': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'responses-test'
+        }}
+        with self.settings(CACHES=local):
+            self.assertEqual(response_cache._timeout(), settings.RESPONSE_CACHE_LOCAL_TIMEOUT)
+
+
+class ListingPlanTests(ManuscriptTestCase):
+    """The journal manuscript list is read through its composite indexes, in index order"""
+
+    # How each database's EXPLAIN says the rows had to be sorted after reading
+    SORT_MARKERS = ('TEMP B-TREE', 'filesort', 'Sort Key')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Manuscript.objects.bulk_create([
+            Manuscript(title=f'Manuscript {i}', abstract='Abstract', keywords=[], journal_id=cls.journal,
+                       submitted_by=cls.editor, status=Manuscript.Status.values[i % 3])
+            for i in range(30)
+        ])
+
+    def index_name(self, fields):
+        return next(index.name for index in Manuscript._meta.indexes if index.fields == fields)
+
+    def assertPlanUses(self, params, fields):
+        queryset = (
+            Manuscript.objects
+            .filter(journal_id=self.journal.pk, **manuscript_filters(params))
+            .order_by('-submitted', '-id')
+        )
+        next_page = queryset.filter(KeysetPagination(('submitted', 'id')).after(['2024-06-01T00:00:00+00:00', 1000]))
+        for plan in (queryset[:11].explain(), next_page[:11].explain()):
+            self.assertIn(self.index_name(fields), plan)
+            for marker in self.SORT_MARKERS:
+                self.assertNotIn(marker, plan)
+
+    def test_journal(self):
+        self.assertPlanUses({}, ['journal_id', '-submitted', '-id'])
+
+    def test_journal_and_date_range(self):
+        self.assertPlanUses({'submitted_from': '2024-01-01', 'submitted_to': '2024-12-31'},
+                            ['journal_id', '-submitted', '-id'])
+
+    def test_journal_and_status(self):
+        self.assertPlanUses({'status': Manuscript.Status.REVIEW}, ['journal_id', 'status', '-submitted', '-id'])
+
+    def test_journal_status_and_date_range(self):
+        self.assertPlanUses({'status': Manuscript.Status.SUBMISSION, 'submitted_from': '2024-01-01'},
+                            ['journal_id', 'status', '-submitted', '-id'])
+
+
+class AnchoringTests(ManuscriptTestCase):
+    def setUp(self):
+        self.ledger = SimulatedLedger()
+        self.sepolia = Sepolia(backend=self.ledger)
+
+    def queue_jobs(self, count):
+        jobs = []
+        for i in range(count):
+            manuscript, event = self.make_manuscript(f'Manuscript {i}')
+            jobs.append(anchoring.anchor_manuscript(event, {'id': manuscript.pk, 'title': manuscript.title}))
+        return jobs
+
+    def test_broadcast_and_confirm(self):
+        job, = self.queue_jobs(1)
+        self.assertEqual(anchoring.broadcast_pending(self.sepolia), 1)
+        self.assertEqual(anchoring.confirm_broadcast(self.sepolia), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnchorJob.Status.CONFIRMED)
+        self.assertEqual(job.event.txn_hash, job.txn_hash)
+
+    def test_failed_send_waits_out_backoff(self):
+        job, = self.queue_jobs(1)
+        with mock.patch.object(self.ledger, 'send_transaction', side_effect=ConnectionError('down')):
+            self.assertEqual(anchoring.broadcast_pending(self.sepolia), 0)
+            # The job is not due again in the same pass
+            self.assertEqual(anchoring.broadcast_pending(self.sepolia), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnchorJob.Status.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, 'down')
+        self.assertGreater(job.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+        self.assertEqual(anchoring.broadcast_pending(self.sepolia), 0)
+        AnchorJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(anchoring.broadcast_pending(self.sepolia), 1)
+
+    def test_backoff_grows_and_is_capped(self):
+        with self.settings(ANCHOR_RETRY_BACKOFF=10, ANCHOR_RETRY_MAX_BACKOFF=60):
+            self.assertEqual([anchoring._backoff(n).total_seconds() for n in range(1, 6)], [10, 20, 40, 60, 60])
+
+    @override_settings(ANCHOR_MAX_ATTEMPTS=2)
+    def test_job_fails_after_max_attempts(self):
+        job, = self.queue_jobs(1)
+        with mock.patch.object(self.ledger, 'send_transaction', side_effect=ConnectionError('down')):
+            for _ in range(2):
+                AnchorJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+                anchoring.broadcast_pending(self.sepolia)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnchorJob.Status.FAILED)
+
+        self.assertEqual(anchoring.requeue_failed(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (AnchorJob.Status.PENDING, 0))
+
+    def test_claimed_jobs_are_hidden_from_other_workers(self):
+        self.queue_jobs(3)
+        claimed = anchoring._claim(2)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual([job.pk for job in anchoring._claim(10)], [AnchorJob.objects.order_by('id').last().pk])
+        self.assertEqual(anchoring._claim(10), [])
+
+    @override_settings(ANCHOR_BROADCAST_TIMEOUT=60)
+    def test_dropped_transaction_is_sent_again(self):
+        self.ledger.block_time = 3600
+        first, second = self.queue_jobs(2)
+        anchoring.broadcast_pending(self.sepolia)
+        first.refresh_from_db()
+        dropped_hash = first.txn_hash
+        self.assertTrue(self.ledger.drop(dropped_hash))
+
+        # Still within the timeout
+        self.assertEqual(anchoring.confirm_broadcast(self.sepolia), 0)
+        first.refresh_from_db()
+        self.assertEqual(first.status, AnchorJob.Status.BROADCAST)
+
+        AnchorJob.objects.filter(pk=first.pk).update(broadcast_at=timezone.now() - timedelta(seconds=61))
+        anchoring.confirm_broadcast(self.sepolia)
+        first.refresh_from_db()
+        self.assertEqual(first.status, AnchorJob.Status.PENDING)
+        self.assertEqual(first.txn_hash, '')
+        self.assertIn('not mined', first.last_error)
+        self.assertEqual(NonceCounter.objects.get().released, [0])
+
+        # The resend takes the dropped nonce, so the second transaction can be mined after it
+        self.assertEqual(anchoring.broadcast_pending(self.sepolia), 1)
+        first.refresh_from_db()
+        self.assertNotEqual(first.txn_hash, dropped_hash)
+        self.ledger._mine_block()
+        self.assertEqual(anchoring.confirm_broadcast(self.sepolia), 2)
+        self.assertEqual(AnchorJob.objects.filter(status=AnchorJob.Status.CONFIRMED).count(), 2)
+
+
+class MerkleTests(SimpleTestCase):
+    def leaves(self, count):
+        return [merkle.leaf_hash(('1', 'actor', 'SUBMISSION', str(i))) for i in range(count)]
+
+    def test_single_leaf_is_its_own_root(self):
+        leaf, = self.leaves(1)
+        levels = merkle.build_levels([leaf])
+        self.assertEqual(merkle.merkle_root([leaf]), leaf)
+        self.assertEqual(merkle.merkle_proof(levels, 0), [])
+        self.assertTrue(merkle.verify_proof(leaf, [], leaf))
+
+    def test_unpaired_node_is_carried_up(self):
+        a, b, c = self.leaves(3)
+        self.assertEqual(merkle.merkle_root([a, b, c]), merkle.node_hash(merkle.node_hash(a, b), c))
+        levels = merkle.build_levels([a, b, c])
+        self.assertEqual(
+            merkle.merkle_proof(levels, 2),
+            [{'hash': '0x' + merkle.node_hash(a, b).hex(), 'position': 'left'}]
+        )
+
+    def test_every_leaf_proves_inclusion(self):
+        for count in (2, 3, 5, 7, 8, 13):
+            leaves = self.leaves(count)
+            levels = merkle.build_levels(leaves)
+            root = levels[-1][0]
+            for index, leaf in enumerate(leaves):
+                self.assertTrue(merkle.verify_proof(leaf, merkle.merkle_proof(levels, index), root), (count, index))
+
+    def test_tampered_proofs_fail(self):
+        leaves = self.leaves(5)
+        levels = merkle.build_levels(leaves)
+        root = levels[-1][0]
+        proof = merkle.merkle_proof(levels, 1)
+
+        other_hash = [dict(proof[0], hash='0x' + leaves[4].hex())] + proof[1:]
+        swapped = [dict(proof[0], position='right')] + proof[1:]
+        self.assertFalse(merkle.verify_proof(leaves[1], other_hash, root))
+        self.assertFalse(merkle.verify_proof(leaves[1], swapped, root))
+        self.assertFalse(merkle.verify_proof(leaves[1], proof[:-1], root))
+        self.assertFalse(merkle.verify_proof(leaves[2], proof, root))
+
+    def test_empty_tree(self):
+        with self.assertRaises(ValueError):
+            merkle.build_levels([])
+
+
+class EventProofTests(ManuscriptTestCase):
+    def setUp(self):
+        self.sepolia = Sepolia(backend=SimulatedLedger())
+        self.client.force_login(self.editor)
+        self.jobs = []
+        for i in range(3):
+            manuscript, event = self.make_manuscript(f'Manuscript {i}')
+            self.jobs.append(anchoring.anchor_manuscript(event, {'id': manuscript.pk}))
+
+    def proof_url(self, job):
+        return f'/manuscripts/{self.journal.pk}/{job.event.manuscript_id}/events/{job.event_id}/proof'
+
+    def test_proof_of_merkle_anchored_event(self):
+        anchoring.broadcast_batch(self.sepolia, window=0, use_merkle=True)
+        job = AnchorJob.objects.get(pk=self.jobs[2].pk)
+        response = self.client.get(self.proof_url(job))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['verified'])
+        self.assertEqual(body['merkle_root'], job.batch.merkle_root)
+        self.assertEqual(body['leaf_hash'], '0x' + merkle.leaf_hash(body['record']).hex())
+        self.assertTrue(anchoring.verify_inclusion(job))
+
+    def test_tampered_proof_is_not_verified(self):
+        anchoring.broadcast_batch(self.sepolia, window=0, use_merkle=True)
+        job = AnchorJob.objects.get(pk=self.jobs[0].pk)
+        job.merkle_proof[0]['hash'] = '0x' + '00' * 32
+        job.save(update_fields=['merkle_proof'])
+        self.assertFalse(self.client.get(self.proof_url(job)).json()['verified'])
+
+        job = AnchorJob.objects.get(pk=self.jobs[1].pk)
+        job.args = job.args[:-1] + ['{"tampered": true}']
+        job.save(update_fields=['args'])
+        self.assertFalse(self.client.get(self.proof_url(job)).json()['verified'])
+
+    def test_no_proof_outside_merkle_batches(self):
+        anchoring.broadcast_pending(self.sepolia)
+        self.assertEqual(self.client.get(self.proof_url(self.jobs[0])).status_code, 404)
+        response = self.client.get(f'/manuscripts/{self.journal.pk}/{self.jobs[0].event.manuscript_id}/events/0/proof')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(STREAM_POLL_INTERVAL=0.05)
+class BrokerTests(ManuscriptTestCase):
+    def test_events_written_elsewhere_are_polled(self):
+        manuscript, _ = self.make_manuscript()
+        broker = streams.Broker()
+
+        async def scenario():
+            subscription = broker.subscribe([streams.manuscript_topic(manuscript.pk)])
+            # The first poll only sets the cursors
+            await asyncio.sleep(0.1)
+            # Written without waking the broker, as another process would
+            event = await sync_to_async(manuscript.record_acceptance)(actor=self.editor, txn_hash='')
+            message = await subscription.get(timeout=2)
+            broker.unsubscribe(subscription)
+            return event, message
+
+        event, message = async_to_sync(scenario)()
+        self.assertIsNotNone(message)
+        self.assertEqual((message.event, message.id), ('manuscript-event', event.pk))
+
+    def test_stream_views_are_abstract(self):
+        with self.assertRaises(TypeError):
+            EventStreamView()
+
+
+class AnchorWorkerTests(TestCase):
+    def run_worker(self, ledger, mode):
+        with mock.patch('manuscripts.sepolia.get_backend', return_value=ledger):
+            call_command('run_anchor_worker', '--mode', mode, '--once', stdout=StringIO())
+
+    def test_batch_mode_needs_record_events(self):
+        v1 = SimulatedLedger(deployed_functions=['publishManuscript', 'recordReviewerAssignment'])
+        with self.assertRaisesMessage(CommandError, 'recordEvents'):
+            self.run_worker(v1, 'batch')
+        self.run_worker(v1, 'single')
+        self.run_worker(SimulatedLedger(), 'batch')
+
+    def test_merkle_mode_needs_anchor_root(self):
+        batching = SimulatedLedger(deployed_functions=['publishManuscript', 'recordEvents'])
+        with self.assertRaisesMessage(CommandError, 'anchorRoot'):
+            self.run_worker(batching, 'merkle')
+        self.run_worker(batching, 'batch')
+        self.run_worker(SimulatedLedger(), 'merkle')
+
+
+class NonceManagerTests(TestCase):
+    def setUp(self):
+        self.ledger = SimulatedLedger()
+        self.sepolia = Sepolia(backend=self.ledger)
+        self.address = settings.W3_OWNERS_ADDRESS
+
+    def send(self):
+        return self.sepolia.broadcast('recordCorrections', Sepolia.event_args(1, 2, {'file': 'corrections.pdf'}))
+
+    def test_consecutive_nonces(self):
+        self.assertEqual([self.sepolia.nonces.allocate() for _ in range(3)], [(0, False), (1, False), (2, False)])
+
+    def test_failed_send_releases_its_nonce(self):
+        self.send()
+        with mock.patch.object(self.ledger, 'send_transaction', side_effect=ConnectionError('down')):
+            with self.assertRaises(ConnectionError):
+                self.send()
+        self.assertEqual(NonceCounter.objects.get().released, [1])
+
+        self.send()
+        self.assertEqual(self.ledger.transaction_count(self.address, pending=False), 2)
+        self.assertEqual(NonceCounter.objects.get().released, [])
+
+    def test_nonce_used_elsewhere_moves_the_counter(self):
+        self.send()
+        # Three transactions from the same account sent by another tool
+        self.ledger.next_nonce[self.address] += 3
+        with self.assertRaisesMessage(ValueError, 'nonce too low'):
+            self.send()
+        self.assertEqual(NonceCounter.objects.get().next_nonce, 4)
+        self.send()
+        self.assertEqual(self.ledger.transaction_count(self.address, pending=False), 5)
+
+    def test_reconcile_fills_gap_with_higher_gas_price(self):
+        self.ledger.block_time = 3600
+        dropped = self.send()
+        self.send()
+        self.ledger.drop(dropped)
+        self.assertEqual(self.ledger.transaction_count(self.address), 0)
+
+        # Too recent to tell a dropped transaction from one still being sent
+        self.assertEqual(self.sepolia.nonces.reconcile(), [])
+        with override_settings(ANCHOR_NONCE_GRACE=0):
+            self.assertEqual(self.sepolia.nonces.reconcile(), [0])
+        self.send()
+        replacement = self.ledger.mempool[(self.address, 0)]
+        self.assertGreater(replacement['gasPrice'], SimulatedLedger.GAS_PRICE)
+        self.ledger._mine_block()
+        self.assertEqual(self.ledger.transaction_count(self.address, pending=False), 2)
+        self.assertEqual(self.sepolia.nonces.reconcile(), [])
+
+    def test_reconcile_keeps_nonce_allocated_but_not_yet_sent(self):
+        self.send()
+        # Another worker holds nonce 1 while it signs, this one sends nonce 2
+        self.assertEqual(self.sepolia.nonces.allocate(), (1, False))
+        self.send()
+        self.assertEqual(self.sepolia.nonces.reconcile(), [])
+        self.assertEqual(self.sepolia.nonces.allocate(), (3, False))
+
+        allocated = NonceCounter.objects.get().allocated
+        self.assertEqual(sorted(allocated), ['1', '2', '3'])
+        with override_settings(ANCHOR_NONCE_GRACE=0):
+            self.assertEqual(self.sepolia.nonces.reconcile(), [1])
+
+
+class ChainIndexTests(TestCase):
+    def setUp(self):
+        self.ledger = SimulatedLedger()
+        self.sepolia = Sepolia(backend=self.ledger)
+        self.contract = settings.W3_CONTRACT_ADDRESS
+
+    def send(self, manuscript_id):
+        self.sepolia.broadcast('recordReviewerAssignment', Sepolia.event_args(manuscript_id, 'reviewer', {}))
+
+    def index(self, backend=None):
+        return chainindex.index_logs(backend or self.ledger, batch_blocks=2, reorg_depth=4)
+
+    def indexed(self):
+        return list(ChainLog.objects.order_by('block_number', 'log_index').values_list('manuscript_key', flat=True))
+
+    def record(self, logs=None):
+        recorder = LogRecorder(self.ledger)
+        chainindex.index_logs(recorder, contract=self.contract)
+        path = os.path.join(tempfile.mkdtemp(), 'logs.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        recorder.save(path)
+        if logs is not None:
+            with open(path) as f:
+                recording = json.load(f)
+            recording['logs'] = logs(recording['logs'])
+            with open(path, 'w') as f:
+                json.dump(recording, f)
+        return path
+
+    def test_incremental_indexing(self):
+        for manuscript_id in (1, 2, 3):
+            self.send(manuscript_id)
+        self.assertEqual(self.index()['logs'], 3)
+        self.assertEqual(self.index()['logs'], 0)
+
+        self.send(4)
+        stats = self.index()
+        self.assertEqual(stats['logs'], 1)
+        self.assertEqual(stats['next_block'], self.ledger.block_number() + 1)
+        self.assertEqual(self.indexed(), ['1', '2', '3', '4'])
+
+    def test_reorg_rewinds_and_reads_again(self):
+        for manuscript_id in (1, 2, 3):
+            self.send(manuscript_id)
+        self.index()
+
+        # Blocks 2 and 3 are replaced by a fork without their transactions, then manuscript 4 lands on it
+        self.ledger.reorg(2)
+        self.send(4)
+        stats = self.index()
+        self.assertEqual(stats['rewound'], 2)
+        self.assertEqual(self.indexed(), ['1', '4'])
+
+    def test_replay_of_a_recording(self):
+        for manuscript_id in (1, 2):
+            self.send(manuscript_id)
+        path = self.record()
+        chainindex.reset(self.contract, 0)
+        self.assertEqual(self.index(RecordedLogs(path))['logs'], 2)
+        self.assertEqual(self.indexed(), ['1', '2'])
+
+    def test_duplicate_logs_are_stored_once(self):
+        for manuscript_id in (1, 2):
+            self.send(manuscript_id)
+        path = self.record(logs=lambda logs: logs + logs)
+        chainindex.reset(self.contract, 0)
+        self.index(RecordedLogs(path))
+        self.assertEqual(self.indexed(), ['1', '2'])
+
+        # Read again from the start with the rows still there
+        ChainCursor.objects.filter(contract=self.contract).update(next_block=0)
+        self.index(RecordedLogs(path))
+        self.assertEqual(self.indexed(), ['1', '2'])
+
+    def test_logs_are_decoded_with_the_indexed_contracts_abi(self):
+        v2 = Web3.to_checksum_address('0x' + '12' * 20)
+        v2_abi = os.path.join(settings.BASE_DIR, 'JournalContractV2.json')
+        with open(v2_abi) as f:
+            event = next(item for item in json.load(f)['abi'] if item.get('name') == 'ReviewerAssigned')
+        raw_log = {
+            'address': v2,
+            'topics': [HexBytes(event_abi_to_log_topic(event)), HexBytes(b'\x01' * 32), HexBytes(b'\x02' * 32)],
+            'data': HexBytes(encode(['string'], ['{}'])),
+            'blockNumber': 7,
+            'blockHash': HexBytes(b'\x07' * 32),
+            'transactionHash': HexBytes(b'\x08' * 32),
+            'transactionIndex': 0,
+            'logIndex': 0,
+            'removed': False,
+        }
+        backend = Web3Backend(Web3())
+        with mock.patch.object(backend.web3.eth, 'get_logs', return_value=[raw_log]):
+            with self.assertRaises(ValueError):
+                backend.get_logs(v2, 7, 7)
+            with self.settings(INDEXER_CONTRACT_ABIS={v2.lower(): v2_abi}):
+                [log] = backend.get_logs(v2, 7, 7)
+        self.assertEqual(log['event'], 'ReviewerAssigned')
+        self.assertEqual(log['args']['manuscriptKey'], '0x' + '01' * 32)
+        self.assertEqual(chainindex.log_row(v2, log).manuscript_key, '0x' + '01' * 32)
@@ -0,0 +1,208 @@
+"""
+Resumable chunked uploads of correction files.
+
+An upload reserves a storage path up front. Each chunk is streamed
+from the request body straight into its offset in that file while being
+hashed, so memory use does not depend on the chunk or file size and the
+bytes are never copied again. A chunk only counts as received once its
+SHA-256 matches the one the client sent. Completing the upload checks that
+every chunk is present and hashes the whole file, which then moves into
+the content-addressed store (manuscripts/filestore.py).
+
+A user may have CHUNKED_UPLOAD_MAX_OPEN uploads in progress. Uploads that
+receive no chunk for CHUNKED_UPLOAD_EXPIRY seconds, or are completed but
+never submitted for as long, are deleted with their files by
+clean_abandoned() (manage.py clean_correction_uploads). A completed upload
+backs one corrections submission, after which it is marked attached.
+
+Chunks are written with positioned writes, so this needs a storage backend
+with local paths (FileSystemStorage).
+"""
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from accounts.models import Profile
+from manuscripts import filestore
+from manuscripts.models import CorrectionUpload, ManuscriptFile, UploadChunk
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    """A request the upload cannot accept; the message is safe to return to the client"""
+
+
+def _checksum(value, what):
+    value = (value or '').strip().lower()
+    if not SHA256_RE.match(value):
+        raise UploadError(f"{what} must be a hex SHA-256 digest")
+    return value
+
+
+def start_upload(manuscript, user, filename, size, chunk_size=None, sha256=''):
+    if not filename or not filename.lower().endswith('.docx'):
+        raise UploadError("Only Ms Word files are accepted")
+    try:
+        size = int(size)
+        chunk_size = int(chunk_size or settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+    except (TypeError, ValueError):
+        raise UploadError("File size and chunk size must be integers")
+    if size <= 0:
+        raise UploadError("File size must be positive")
+    if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f"File size exceeds {settings.CHUNKED_UPLOAD_MAX_SIZE // (1024 * 1024)}MB limit")
+    if not 0 < chunk_size <= settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f"Chunk size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes")
+    if sha256:
+        sha256 = _checksum(sha256, "File checksum")
+
+    with transaction.atomic():
+        # One user's starts take turns, so concurrent requests cannot pass the cap together
+        Profile.objects.select_for_update().filter(pk=user.pk).first()
+        if _in_progress(user) >= settings.CHUNKED_UPLOAD_MAX_OPEN:
+            raise UploadError(
+                f"At most {settings.CHUNKED_UPLOAD_MAX_OPEN} uploads can be in progress, complete or wait out one first"
+            )
+
+        # Reserve the final path now, storage picks a free name if it is taken
+        path = default_storage.save(
+            f'manuscripts/{manuscript.id}/corrections_{timezone.now().strftime("%Y%m%d_%H%M%S")}.docx',
+            ContentFile(b'')
+        )
+        return CorrectionUpload.objects.create(
+            manuscript=manuscript,
+            uploaded_by=user,
+            filename=os.path.basename(filename),
+            path=path,
+            size=size,
+            chunk_size=chunk_size,
+            sha256=sha256,
+        )
+
+
+def _expiry_cutoff():
+    return timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+
+
+def _in_progress(user):
+    """Open uploads of `user` that have not expired"""
+    cutoff = _expiry_cutoff()
+    return (
+        CorrectionUpload.objects
+        .filter(uploaded_by=user, status=CorrectionUpload.Status.OPEN)
+        .filter(Q(created__gte=cutoff) | Q(chunks__received__gte=cutoff))
+        .distinct()
+        .count()
+    )
+
+
+def abandoned_uploads(cutoff=None):
+    """Open uploads with no chunk since `cutoff`, and uploads completed before it but never submitted"""
+    cutoff = cutoff or _expiry_cutoff()
+    stale_open = (
+        Q(status=CorrectionUpload.Status.OPEN, created__lt=cutoff)
+        & (Q(last_chunk__isnull=True) | Q(last_chunk__lt=cutoff))
+    )
+    unsubmitted = Q(status=CorrectionUpload.Status.COMPLETE, completed__lt=cutoff)
+    return CorrectionUpload.objects.annotate(last_chunk=Max('chunks__received')).filter(stale_open | unsubmitted)
+
+
+def clean_abandoned(cutoff=None):
+    """
+    Delete abandoned uploads with their reserved files. The file of a
+    completed upload sits in the content-addressed store and is only deleted
+    if no stored manuscript file has the same content.
+    Returns the number of uploads deleted.
+    """
+    cutoff = cutoff or _expiry_cutoff()
+    deleted = 0
+    for upload_id in list(abandoned_uploads(cutoff).values_list('pk', flat=True)):
+        with transaction.atomic():
+            upload = CorrectionUpload.objects.select_for_update().filter(pk=upload_id).first()
+            # Skip an upload that was resumed or submitted since it was listed
+            if upload is None or not abandoned_uploads(cutoff).filter(pk=upload_id).exists():
+                continue
+            if upload.status == CorrectionUpload.Status.OPEN:
+                default_storage.delete(upload.path)
+            else:
+                filestore.remove_unreferenced(
+                    upload.sha256,
+                    lambda: (
+                        ManuscriptFile.objects.filter(sha256=upload.sha256).exists()
+                        or CorrectionUpload.objects.filter(sha256=upload.sha256).exclude(pk=upload.pk).exists()
+                    ),
+                    cutoff.timestamp()
+                )
+            upload.delete()
+            deleted += 1
+    return deleted
+
+
+def write_chunk(upload, index, stream, length, checksum):
+    """Stream one chunk from `stream` into place and record it if its checksum matches"""
+    if upload.status != CorrectionUpload.Status.OPEN:
+        raise UploadError("Upload is already complete")
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError(f"Chunk index must be between 0 and {upload.chunk_count - 1}")
+    expected = upload.chunk_length(index)
+    if length != expected:
+        raise UploadError(f"Chunk {index} must be {expected} bytes, got {length}")
+    checksum = _checksum(checksum, "Chunk checksum")
+
+    digest = hashlib.sha256()
+    offset = index * upload.chunk_size
+    written = 0
+    fd = os.open(default_storage.path(upload.path), os.O_WRONLY)
+    try:
+        while written < length:
+            data = stream.read(min(settings.CHUNKED_UPLOAD_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            digest.update(data)
+            os.pwrite(fd, data, offset + written)
+            written += len(data)
+    finally:
+        os.close(fd)
+
+    if written != length:
+        raise UploadError(f"Chunk {index} ended after {written} of {length} bytes")
+    if digest.hexdigest() != checksum:
+        raise UploadError(f"Chunk {index} checksum mismatch")
+
+    UploadChunk.objects.update_or_create(upload=upload, index=index, defaults={'size': length, 'sha256': checksum})
+
+
+def complete_upload(upload):
+    """Check that every chunk arrived and the file matches its checksum, then mark it complete"""
+    with transaction.atomic():
+        upload = CorrectionUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != CorrectionUpload.Status.OPEN:
+            return upload
+
+        received = set(upload.chunks.values_list('index', flat=True))
+        missing = sorted(set(range(upload.chunk_count)) - received)
+        if missing:
+            raise UploadError(f"Missing chunks: {', '.join(str(index) for index in missing)}")
+        if default_storage.size(upload.path) != upload.size:
+            raise UploadError("Assembled file size does not match the declared size")
+
+        sha256 = filestore.digest_of(upload.path)
+        if upload.sha256 and upload.sha256 != sha256:
+            raise UploadError("File checksum mismatch")
+
+        # Hand the verified file over to the content-addressed store
+        upload.path = filestore.adopt(upload.path, sha256)
+        upload.sha256 = sha256
+        upload.status = CorrectionUpload.Status.COMPLETE
+        upload.completed = timezone.now()
+        upload.save(update_fields=['path', 'sha256', 'status', 'completed'])
+    return upload
@@ -7,12 +7,34 @@ app_name = "manuscripts"
 
 urlpatterns = [
     path('<journal_id>/submit', views.SubmitManuscript.as_view(), name="submit"),
-    path('<journal_id>', views.GetLocalManuscripts.as_view(), name="list"),
     path('assigned-reviews', views.AssignedReviews.as_view(), name="assigned-reviews"),
+    path('search', views.SearchManuscripts.as_view(), name="search"),
+    path('<journal_id>', views.GetLocalManuscripts.as_view(), name="list"),
+    path('<journal_id>/search', views.SearchManuscripts.as_view(), name="journal-search"),
+    path('<journal_id>/keywords', views.JournalKeywords.as_view(), name="keywords"),
+    path('<journal_id>/stream', views.JournalEventStream.as_view(), name="journal-stream"),
+    path('<journal_id>/assign-reviewers', views.BulkAssignReviewers.as_view(), name="bulk-assign-reviewers"),
     path('<journal_id>/<manuscript_id>', views.GetLocalManuscriptById.as_view(), name="get"),
     path('<journal_id>/<manuscript_id>/change-status', views.ChangeManuscriptStatus.as_view(), name="change-status"),
     path('<journal_id>/<manuscript_id>/assign-reviewer', views.AssignReviewer.as_view(), name="assign-reviewer"),
+    path('<journal_id>/<manuscript_id>/reviewer-recommendations', views.ReviewerRecommendations.as_view(),
+         name="reviewer-recommendations"),
     path('<journal_id>/<manuscript_id>/submit-review', views.SubmitReview.as_view(), name="submit-review"),
     path('<journal_id>/<manuscript_id>/submit-corrections', views.SubmitCorrections.as_view(), name="submit-corrections"),
+    path('<journal_id>/<manuscript_id>/uploads', views.StartCorrectionUpload.as_view(), name="start-upload"),
+    path('<journal_id>/<manuscript_id>/uploads/<upload_id>', views.CorrectionUploadStatus.as_view(), name="upload-status"),
+    path('<journal_id>/<manuscript_id>/uploads/<upload_id>/chunks/<int:index>', views.PutUploadChunk.as_view(),
+         name="upload-chunk"),
+    path('<journal_id>/<manuscript_id>/uploads/<upload_id>/complete', views.CompleteCorrectionUpload.as_view(),
+         name="complete-upload"),
+    path('<journal_id>/<manuscript_id>/files', views.ManuscriptFiles.as_view(), name="files"),
+    path('<journal_id>/<manuscript_id>/files/latest', views.DownloadManuscriptFile.as_view(), name="latest-file"),
+    path('<journal_id>/<manuscript_id>/files/<int:version>', views.DownloadManuscriptFile.as_view(), name="file"),
     path('<journal_id>/<manuscript_id>/publish', views.PublishManuscript.as_view(), name="publish"),
+    path('<journal_id>/<manuscript_id>/events', views.ManuscriptEvents.as_view(), name="events"),
+    path('<journal_id>/<manuscript_id>/chain-events', views.ManuscriptChainEvents.as_view(), name="chain-events"),
+    path('<journal_id>/<manuscript_id>/stream', views.ManuscriptEventStream.as_view(), name="stream"),
+    path('<journal_id>/<manuscript_id>/state', views.ManuscriptState.as_view(), name="state"),
+    path('<journal_id>/<manuscript_id>/events/<event_id>/anchor', views.AnchorStatus.as_view(), name="anchor-status"),
+    path('<journal_id>/<manuscript_id>/events/<event_id>/proof', views.EventProof.as_view(), name="event-proof"),
 ]
@@ -1,274 +1,162 @@
-import json
+import asyncio
+from abc import ABC, abstractmethod
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404
 
+from accounts.authentication import CachedTokenAuthentication
 from accounts.models import Profile
 from journals.models import Journal
-from manuscripts.models import Manuscript, Author, ManuscriptEvent, ReviewerAssignment
-from utilities import CustomUUIDEncoder
+from manuscripts import chainindex, eventstore, filestore, streams
+from manuscripts.anchoring import (
+    anchor_manuscript, anchor_reviewer_assignment, anchor_review, anchor_corrections, verify_inclusion
+)
+from manuscripts.assignments import AssignmentError, assign_reviewers
+from manuscripts.models import (
+    Manuscript, Author, ChainLog, CorrectionUpload, EventSequenceConflict, ManuscriptDocument, ManuscriptEvent,
+    ManuscriptFile, ReviewerAssignment, AnchorJob
+)
+from manuscripts.downloads import file_response
+from manuscripts.reviewers import recommend
+from manuscripts.search import search
+from manuscripts.uploads import UploadError, complete_upload, start_upload, write_chunk
+from manuscripts.queries import (
+    assignment_listing, assignment_summary, keyword_facets, manuscript_filters, manuscript_listing, manuscript_summary
+)
+from openPublisher import response_cache
+from openPublisher.async_support import api_error, api_response, run_query
+from openPublisher.pagination import KeysetPagination, apaginate_by_number
 from json import JSONDecodeError
-from django.conf import settings
-from django.core.files.storage import default_storage
-from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 from rest_framework import permissions, status
 from rest_framework.parsers import JSONParser
 from django.db import transaction
-from django.utils import timezone
+from django.views import View
 from rest_framework.parsers import MultiPartParser, FormParser
 
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, NotAuthenticated, NotFound, ParseError, PermissionDenied
+)
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.authentication import TokenAuthentication
-
-
-class Sepolia:
-    def record_review(self, manuscript_id, reviewer_id, metadata):
-        """
-        Records a review submission event on the contract.
-        Args:
-            manuscript_id: The ID of the manuscript.
-            reviewer_id: The ID of the reviewer.
-            metadata: Additional metadata (dict) to store with the event.
-        Returns:
-            Transaction receipt or error dict.
-        """
-        if not self.web3.is_connected():
-            return JsonResponse(
-                {"result": "error", "message": "No connection to web3 endpoint"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        with open("JournalContract.json", 'r') as f:
-            compiled_contract = json.load(f)
-        abi = compiled_contract['abi']
-        contract = self.web3.eth.contract(address=settings.W3_CONTRACT_ADDRESS, abi=abi)
-
-        # Prepare the data for the contract call
-        metadata_json = json.dumps(metadata, cls=CustomUUIDEncoder)
-        encoded_data = contract.encodeABI(
-            fn_name='recordReviewSubmission',
-            args=[str(manuscript_id), str(reviewer_id), metadata_json]
-        )
-        nonce = self.web3.eth.get_transaction_count(settings.W3_OWNERS_ADDRESS)
-        transaction = {
-            'to': settings.W3_CONTRACT_ADDRESS,
-            'gas': 2000000,
-            'gasPrice': self.web3.eth.gas_price,
-            'nonce': nonce,
-            'data': encoded_data,
-        }
 
-        signed_txn = self.web3.eth.account.sign_transaction(transaction, settings.W3_PRIV_KEY)
-        try:
-            tx_hash = self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-        except Exception as e:
-            return {'error': f'Error sending raw transaction: {e}'}
-
-        tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
-        if not tx_receipt:
-            return JsonResponse(
-                {"result": "error", "message": "Transaction receipt not found"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        return tx_receipt
-
-    def record_reviewer_assignment(self, manuscript_id, reviewer_id, metadata):
-        """
-        Records a reviewer assignment event on the contract.
-        Args:
-            manuscript_id: The ID of the manuscript.
-            reviewer_id: The ID of the reviewer.
-            metadata: Additional metadata (dict) to store with the event.
-        Returns:
-            Transaction receipt or error dict.
-        """
-        if not self.web3.is_connected():
-            return JsonResponse(
-                {"result": "error", "message": "No connection to web3 endpoint"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
 
-        with open("JournalContract.json", 'r') as f:
-            compiled_contract = json.load(f)
-        abi = compiled_contract['abi']
-        contract = self.web3.eth.contract(address=settings.W3_CONTRACT_ADDRESS, abi=abi)
+class Pagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
 
-        # Prepare the data for the contract call
-        metadata_json = json.dumps(metadata, cls=CustomUUIDEncoder)
-        encoded_data = contract.encodeABI(
-            fn_name='recordReviewerAssignment',
-            args=[str(manuscript_id), str(reviewer_id), metadata_json]
-        )
-        nonce = self.web3.eth.get_transaction_count(settings.W3_OWNERS_ADDRESS)
-        transaction = {
-            'to': settings.W3_CONTRACT_ADDRESS,
-            'gas': 2000000,
-            'gasPrice': self.web3.eth.gas_price,
-            'nonce': nonce,
-            'data': encoded_data,
-        }
 
-        signed_txn = self.web3.eth.account.sign_transaction(transaction, settings.W3_PRIV_KEY)
+class GetLocalManuscripts(APIView):
+    authentication_classes = []
+    permission_classes = []
+    pagination_class = Pagination
+    
+    def get(self, request, journal_id, *args, **kwargs):
         try:
-            tx_hash = self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-        except Exception as e:
-            return {'error': f'Error sending raw transaction: {e}'}
-
-        tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
-        if not tx_receipt:
-            return JsonResponse(
-                {"result": "error", "message": "Transaction receipt not found"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        return tx_receipt
-    def __init__(self):
-        self.web3 = settings.W3
-        with open("JournalContract.json", 'r') as f:
-            compiled_contract = json.load(f)
-        self.abi = compiled_contract['abi']
-        self.contract = self.web3.eth.contract(
-            address=settings.W3_CONTRACT_ADDRESS,
-            abi=self.abi
+            journal_id = int(journal_id)
+        except ValueError:
+            raise Http404
+
+        # Cached per page and filter under the journal's version, which every manuscript event bumps
+        (status_code, data), hit = response_cache.cached(
+            'manuscripts.list', [('journal', journal_id)], lambda: self.build(request, journal_id),
+            extra=request.build_absolute_uri()
         )
+        if status_code != status.HTTP_200_OK:
+            response = JsonResponse(data, status=status_code)
+        else:
+            response = Response(data, status=status_code)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
 
-    def post_manuscript(self, manuscript):
-        global tx_hash
-        if not self.web3.is_connected():
-            return JsonResponse(
-                {"result": "error", "message": "No connection to web3 endpoint"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        with open("JournalContract.json", 'r') as f:
-            compiled_contract = json.load(f)
+    def build(self, request, journal_id):
+        journal = get_object_or_404(Journal, pk=journal_id)
 
-        abi = compiled_contract['abi']
-        contract = self.web3.eth.contract(address=settings.W3_CONTRACT_ADDRESS, abi=abi)
+        try:
+            filters = manuscript_filters(request.GET)
+        except ValueError as e:
+            return status.HTTP_400_BAD_REQUEST, {"result": "error", "message": str(e)}
+
+        # Manuscripts of this journal, with authors and submitter loaded per page rather than per row
+        manuscripts = manuscript_listing(Manuscript.objects.filter(journal_id=journal, **filters)).order_by('-submitted')
+
+        # Initialize paginator, keyset on (submitted, id) when the client asks for a cursor
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination(('submitted', 'id'))
+        else:
+            paginator = self.pagination_class()
+        paginated_manuscripts = paginator.paginate_queryset(manuscripts, request)
 
-        json_string = json.dumps(manuscript, cls=CustomUUIDEncoder)
-        encoded_data = contract.encodeABI(fn_name='publishManuscript', args=[json_string])
-        nonce = self.web3.eth.get_transaction_count(settings.W3_OWNERS_ADDRESS)
-        transaction = {
-            'to': settings.W3_CONTRACT_ADDRESS,
-            'gas': 2000000,
-            'gasPrice': self.web3.eth.gas_price,
-            'nonce': nonce,
-            'data': encoded_data,
-        }
+        # Prepare the response data
+        manuscript_list = [
+            manuscript_summary(manuscript, manuscript.submitted_by_email)
+            for manuscript in paginated_manuscripts
+        ]
 
-        signed_txn = self.web3.eth.account.sign_transaction(transaction, settings.W3_PRIV_KEY)
-        try:
-            tx_hash = self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-        except Exception as e:
-            # print("send_raw_transaction failed", e)
-            return {'error': f'Error sending raw transaction: {e}'}
+        return status.HTTP_200_OK, paginator.get_paginated_response(manuscript_list).data
 
-        tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
-        if not tx_receipt:
-            return JsonResponse(
-                {"result": "error", "message": "Transaction receipt not found"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        
-        return tx_receipt
-
-    def record_corrections(self, manuscript_id, author_id, metadata):
-        """
-        Records a corrections submission event on the contract.
-        Args:
-            manuscript_id: The ID of the manuscript
-            author_id: The ID of the author submitting corrections
-            metadata: Additional metadata (dict) to store with the event
-        Returns:
-            Transaction receipt or error dict
-        """
-        if not self.web3.is_connected():
-            return JsonResponse(
-                {"result": "error", "message": "No connection to web3 endpoint"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
 
-        with open("JournalContract.json", 'r') as f:
-            compiled_contract = json.load(f)
-        abi = compiled_contract['abi']
-        contract = self.web3.eth.contract(address=settings.W3_CONTRACT_ADDRESS, abi=abi)
+class AsyncGetLocalManuscripts(View):
+    """
+    GetLocalManuscripts for the ASGI application. The journal check, the
+    total count and the page are read side by side, and the response is
+    cached under the same entries as the sync view.
+    """
 
-        # Prepare the data for the contract call
-        metadata_json = json.dumps(metadata, cls=CustomUUIDEncoder)
-        encoded_data = contract.encodeABI(
-            fn_name='recordCorrections',
-            args=[str(manuscript_id), str(author_id), metadata_json]
-        )
-        nonce = self.web3.eth.get_transaction_count(settings.W3_OWNERS_ADDRESS)
-        transaction = {
-            'to': settings.W3_CONTRACT_ADDRESS,
-            'gas': 2000000,
-            'gasPrice': self.web3.eth.gas_price,
-            'nonce': nonce,
-            'data': encoded_data,
-        }
+    pagination_class = Pagination
 
-        signed_txn = self.web3.eth.account.sign_transaction(transaction, settings.W3_PRIV_KEY)
+    async def get(self, request, journal_id, *args, **kwargs):
+        request = Request(request)
         try:
-            tx_hash = self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-        except Exception as e:
-            return {'error': f'Error sending raw transaction: {e}'}
-
-        tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
-        if not tx_receipt:
-            return JsonResponse(
-                {"result": "error", "message": "Transaction receipt not found"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            (status_code, data), hit = await response_cache.acached(
+                'manuscripts.list', [('journal', journal_id)], lambda: self.build(request, journal_id),
+                extra=request.build_absolute_uri()
             )
-        return tx_receipt
-
-
-class Pagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
-class GetLocalManuscripts(APIView):
-    authentication_classes = []
-    permission_classes = []
-    pagination_class = Pagination
-    
-    def get(self, request, *args, **kwargs):
-        # Get all manuscripts
-        manuscripts = Manuscript.objects.all().order_by('-submitted')
-        
-        # Initialize paginator
-        paginator = self.pagination_class()
-        paginated_manuscripts = paginator.paginate_queryset(manuscripts, request)
-        
-        # Prepare the response data
-        manuscript_list = []
-        for manuscript in paginated_manuscripts:
-            manuscript_data = {
-                'id': manuscript.pk,
-                'title': manuscript.title,
-                'abstract': manuscript.abstract,
-                'journal_id': manuscript.journal_id_id,
-                'keywords': manuscript.keywords,
-                'submitted_by': manuscript.submitted_by.username if manuscript.submitted_by else None,
-                'authors': [
-                    {
-                        'id': author.id,
-                        'first_name': author.first_name,
-                        'last_name': author.last_name,
-                        'email': author.email,
-                        'affiliation': author.affiliation
-                    }
-                    for author in manuscript.authors.all()
-                ],
-                'submitted': manuscript.submitted,
-                'status': manuscript.status
-            }
-            manuscript_list.append(manuscript_data)
-        
-        return paginator.get_paginated_response(manuscript_list)
+        except APIException as e:
+            return api_error(e)
+        if status_code != status.HTTP_200_OK:
+            response = JsonResponse(data, status=status_code)
+        else:
+            response = api_response(data, status=status_code)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    async def build(self, request, journal_id):
+        # Only started where it is awaited, so no path leaves the read pending
+        journal_exists = Journal.objects.filter(pk=journal_id).exists
+        try:
+            filters = manuscript_filters(request.GET)
+        except ValueError as e:
+            if not await run_query(journal_exists):
+                raise NotFound("No Journal matches the given query.")
+            return status.HTTP_400_BAD_REQUEST, {"result": "error", "message": str(e)}
+
+        manuscripts = manuscript_listing(
+            Manuscript.objects.filter(journal_id=journal_id, **filters)
+        ).order_by('-submitted')
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination(('submitted', 'id'))
+            page = paginator.apaginate_queryset(manuscripts, request)
+        else:
+            paginator = self.pagination_class()
+            page = apaginate_by_number(paginator, manuscripts, request)
+
+        exists, paginated_manuscripts = await asyncio.gather(run_query(journal_exists), page)
+        if not exists:
+            raise NotFound("No Journal matches the given query.")
+
+        manuscript_list = [
+            manuscript_summary(manuscript, manuscript.submitted_by_email)
+            for manuscript in paginated_manuscripts
+        ]
+        return status.HTTP_200_OK, paginator.get_paginated_response(manuscript_list).data
 
 
 class GetLocalManuscriptById(APIView):
@@ -277,54 +165,71 @@ class GetLocalManuscriptById(APIView):
     
     def get(self, request, manuscript_id, *args, **kwargs):
         try:
-            manuscript = Manuscript.objects.get(pk=manuscript_id)
-            
-            # Prepare the detailed manuscript data
-            manuscript_data = {
-                'id': manuscript.pk,
-                'title': manuscript.title,
-                'abstract': manuscript.abstract,
-                'keywords': [keyword.get('keyword') for keyword in manuscript.keywords],
-                'journal_id': manuscript.journal_id_id,
-                'submitted_by': manuscript.submitted_by.username if manuscript.submitted_by else None,
-                'authors': [
-                    {
-                        'id': author.id,
-                        'first_name': author.first_name,
-                        'last_name': author.last_name,
-                        'email': author.email,
-                        'affiliation': author.affiliation
-                    }
-                    for author in manuscript.authors.all()
-                ],
-                'submitted': manuscript.submitted,
-                # 'journal_id': manuscript
-                'status': manuscript.status,
-                'provenance': [
-                    {
-                        'id': event.id,
-                        'manuscript_id': event.manuscript_id,
-                        'event_type': event.event_type,
-                        'timestamp': event.timestamp,
-                        'actor': event.actor_id,
-                        'description': event.description,
-                        'txn_hash': event.txn_hash,
-                        'metadata': event.metadata,
-                    }
-                    for event in manuscript.get_provenance()
-                ]
-            }
-            return JsonResponse(manuscript_data, status=status.HTTP_200_OK)
-            
-        except Manuscript.DoesNotExist:
+            manuscript_id = int(manuscript_id)
+        except ValueError:
+            raise Http404
+
+        document, hit = response_cache.cached(
+            'manuscripts.detail', [('manuscript', manuscript_id)], lambda: self.build(manuscript_id)
+        )
+        if not document:
+            return JsonResponse(
+                {"result": "error", "message": f"Manuscript {manuscript_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        body, etag = document
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    def build(self, manuscript_id):
+        """(body, etag) of the precomputed read model, built on first access for older manuscripts"""
+        document = ManuscriptDocument.objects.filter(pk=manuscript_id).first()
+        if document is None:
+            document = ManuscriptDocument.refresh([manuscript_id]).get(manuscript_id)
+        if document is None:
+            return ()
+        return document.body, document.etag
+
+
+class AsyncGetLocalManuscriptById(View):
+    """GetLocalManuscriptById for the ASGI application, a single primary key lookup of the read model"""
+
+    async def get(self, request, manuscript_id, *args, **kwargs):
+        document, hit = await response_cache.acached(
+            'manuscripts.detail', [('manuscript', manuscript_id)], lambda: self.build(manuscript_id)
+        )
+        if not document:
             return JsonResponse(
                 {"result": "error", "message": f"Manuscript {manuscript_id} not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        body, etag = document
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    async def build(self, manuscript_id):
+        document = await ManuscriptDocument.objects.filter(pk=manuscript_id).afirst()
+        if document is None:
+            document = (await sync_to_async(ManuscriptDocument.refresh)([manuscript_id])).get(manuscript_id)
+        if document is None:
+            return ()
+        return document.body, document.etag
+
 
 class SubmitManuscript(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
     model = Manuscript
 
@@ -356,59 +261,39 @@ class SubmitManuscript(APIView):
             )
             author_ids.append(author.id)
 
-        sepolia = Sepolia()
-        tx_receipt = sepolia.post_manuscript(manuscript_data)
+        journal_id = manuscript_data.get("journal_id")
+        if not journal_id:
+            return JsonResponse(
+                {"result": "error", "message": "Journal ID is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Ensure the journal exists
+        journal = get_object_or_404(Journal, pk=journal_id)
+
+        manuscript = Manuscript.objects.create(
+            title=manuscript_data.get("title"),
+            abstract=manuscript_data.get("abstract"),
+            keywords=manuscript_data.get("keywords"),
+            journal_id=journal,
+            submitted_by_id=manuscript_data.get("submitted_by_id"),
+        )
+        manuscript.authors.set(author_ids)
+
+        # record submission event and queue it for anchoring in the same transaction
+        event = manuscript.record_submission(actor=request.user, txn_hash='')
+        anchor_job = anchor_manuscript(event, manuscript_data)
 
         resp_data = {
-            "status": tx_receipt.status,
-            "block_number": tx_receipt.blockNumber,
-            "gas_used": tx_receipt.gasUsed,
-            "tx_index": tx_receipt.transactionIndex
+            "result": "accepted",
+            "manuscript_id": manuscript.pk,
+            "event_id": event.pk,
+            "anchor": anchor_job.to_dict(),
         }
-
-        if tx_receipt.status == 1:  # save manuscript data to db
-
-            try:
-                journal_id = manuscript_data.get("journal_id")
-                if not journal_id:
-                    return JsonResponse(
-                        {"result": "error", "message": "Journal ID is required"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                # Ensure the journal exists
-                journal = get_object_or_404(Journal, pk=journal_id)
-            except Exception as e:
-                print(f"Error finding journal with id {journal_id} ", e)
-                resp_data["error"] = f"Error saving manuscript to db: {e}"
-
-            try:
-                manuscript = Manuscript.objects.create(
-                    title=manuscript_data.get("title"),
-                    abstract=manuscript_data.get("abstract"),
-                    keywords=manuscript_data.get("keywords"),
-                    journal_id=journal,
-                    submitted_by_id=manuscript_data.get("submitted_by_id"),
-                )
-                # Update the authors field to use IDs instead of dict
-                manuscript_data['authors'] = author_ids
-                manuscript.authors.set(author_ids)
-
-                resp_data["manuscript_id"] = manuscript.pk
-
-                # record submission event
-                txn_hash = tx_receipt.transactionHash.hex()
-                if not txn_hash.startswith('0x'):
-                    txn_hash = '0x' + txn_hash
-                manuscript.record_submission(actor=request.user, txn_hash=txn_hash)
-            except Exception as e:
-                print("Error saving manuscript to db", e)
-                resp_data["error"] = f"Error saving manuscript to db: {e}"
-
-        return JsonResponse(data=resp_data, status=status.HTTP_201_CREATED)
+        return JsonResponse(data=resp_data, status=status.HTTP_202_ACCEPTED)
 
 
 class ChangeManuscriptStatus(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
     model = Manuscript
 
@@ -427,30 +312,39 @@ class ChangeManuscriptStatus(APIView):
                 {"result": "error", "message": "Invalid status"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        sepolia = Sepolia()
-        if req_status == 'ACCEPTED':
-            manuscript.status = Manuscript.Status.ACCEPTED
-            tx_receipt = sepolia.post_manuscript(manuscript.to_json())
-            txn_hash = tx_receipt.transactionHash.hex()
-            if not txn_hash.startswith('0x'):
-                txn_hash = '0x' + txn_hash
-            manuscript.record_acceptance(actor=request.user, txn_hash=txn_hash)
-        if req_status == 'REJECTED':
-            manuscript.status = Manuscript.Status.REJECTED
-            tx_receipt = sepolia.post_manuscript(manuscript.to_json())
-            txn_hash = tx_receipt.transactionHash.hex()
-            if not txn_hash.startswith('0x'):
-                txn_hash = '0x' + txn_hash
-            manuscript.record_rejection(actor=request.user, reason='', txn_hash=txn_hash)
+        event = None
+        try:
+            with transaction.atomic():
+                if req_status == 'ACCEPTED':
+                    event = manuscript.record_acceptance(actor=request.user, txn_hash='')
+                if req_status == 'REJECTED':
+                    event = manuscript.record_rejection(actor=request.user, reason='', txn_hash='')
+                if event is not None:
+                    anchor_job = anchor_manuscript(event, manuscript.to_json())
+        except EventSequenceConflict as e:
+            return JsonResponse(
+                {"result": "error", "message": f"{e}, reload the manuscript and retry"},
+                status=status.HTTP_409_CONFLICT
+            )
 
+        if event is None:
+            return JsonResponse(
+                {"result": "success", "message": "Manuscript status updated"},
+                status=status.HTTP_200_OK
+            )
         return JsonResponse(
-            {"result": "success", "message": "Manuscript status updated"},
-            status=status.HTTP_200_OK
+            {
+                "result": "accepted",
+                "message": "Manuscript status updated",
+                "event_id": event.pk,
+                "anchor": anchor_job.to_dict(),
+            },
+            status=status.HTTP_202_ACCEPTED
         )
 
 class AssignReviewer(APIView):
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -519,46 +413,25 @@ class AssignReviewer(APIView):
                     due_date=due_date if due_date else None
                 )
 
-                # Record reviewer assignment on the contract
-                sepolia = Sepolia()
                 metadata = {
                     'reviewer_id': str(reviewer.id),
                     'reviewer_name': f"{reviewer.first_name} {reviewer.last_name}",
                     'reviewer_email': reviewer.email
                 }
-                tx_receipt = sepolia.record_reviewer_assignment(manuscript.id, reviewer.id, metadata)
-                txn_hash = ''
-                if isinstance(tx_receipt, dict) and 'error' in tx_receipt:
-                    # Optionally handle error, e.g. log or notify
-                    return Response(
-                        {"result": "error", "message": tx_receipt['error']},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-                else:
-                    txn_hash = tx_receipt.transactionHash.hex()
-                    if not txn_hash.startswith('0x'):
-                        txn_hash = '0x' + txn_hash            
 
                 # Assign the reviewer
-                manuscript.reviewers.add(reviewer)             
-
-                # Update manuscript status
-                if manuscript.status == Manuscript.Status.SUBMISSION:
-                    manuscript.status = Manuscript.Status.REVIEW
-                    manuscript.save()
-                # Record the event
-                manuscript.create_event(
+                manuscript.reviewers.add(reviewer)
+
+                # Record the event and queue it for anchoring
+                event = manuscript.create_event(
                     event_type=ManuscriptEvent.EventType.REVIEWER_ASSIGNED,
                     actor=request.user,
-                    txn_hash=txn_hash,
-                    metadata={
-                        'reviewer_id': str(reviewer.id),
-                        'reviewer_name': f"{reviewer.first_name} {reviewer.last_name}",
-                        'reviewer_email': reviewer.email
-                    }
+                    txn_hash='',
+                    metadata=metadata
                 )
+                anchor_job = anchor_reviewer_assignment(event, manuscript.id, reviewer.id, metadata)
                 resp_data = {
-                    "result": "success",
+                    "result": "accepted",
                     "message": "Reviewer assigned successfully",
                     "data": {
                         "manuscript_id": manuscript.id,
@@ -569,11 +442,13 @@ class AssignReviewer(APIView):
                             "email": reviewer.email,
                             "web3_address": reviewer.web3_address,
                         },
-                        "status": manuscript.status
+                        "status": manuscript.status,
+                        "event_id": event.pk,
+                        "anchor": anchor_job.to_dict(),
                     }
                 }
-                # Return success response with reviewer details
-                return Response(resp_data, status=status.HTTP_200_OK)
+                # Return accepted response with reviewer details
+                return Response(resp_data, status=status.HTTP_202_ACCEPTED)
 
         except Journal.DoesNotExist:
             return Response(
@@ -590,14 +465,102 @@ class AssignReviewer(APIView):
                 {"result": "error", "message": "Reviewer not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except EventSequenceConflict as e:
+            return JsonResponse(
+                {"result": "error", "message": f"{e}, reload the manuscript and retry"},
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
             return Response(
                 {"result": "error", "message": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+class BulkAssignReviewers(APIView):
+    """
+    Assign many reviewers in one request. The body is
+    {"assignments": [{"manuscript_id", "reviewer_id", "due_date"}, ...]};
+    either every assignment is made or none is, with the invalid items listed.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, journal_id, *args, **kwargs):
+        journal = get_object_or_404(Journal, id=journal_id)
+        try:
+            data = JSONParser().parse(request)
+        except JSONDecodeError:
+            return JsonResponse(
+                {"result": "error", "message": "JSON decoding error"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        items = data.get('assignments') if isinstance(data, dict) else None
+        try:
+            created = assign_reviewers(journal, items, request.user)
+        except AssignmentError as e:
+            return JsonResponse(
+                {"result": "error", "message": str(e), "errors": e.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "result": "accepted",
+                "message": f"{len(created)} reviewer(s) assigned successfully",
+                "data": [
+                    {
+                        "assignment_id": assignment.id,
+                        "manuscript_id": assignment.manuscript_id,
+                        "manuscript_title": assignment.manuscript.title,
+                        "reviewer": {
+                            "id": str(assignment.reviewer.id),
+                            "name": f"{assignment.reviewer.first_name} {assignment.reviewer.last_name}",
+                            "email": assignment.reviewer.email,
+                            "web3_address": assignment.reviewer.web3_address,
+                        },
+                        "due_date": assignment.due_date,
+                        "event_id": event.pk,
+                        "anchor": anchor_job.to_dict(),
+                    }
+                    for assignment, event, anchor_job in created
+                ],
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ReviewerRecommendations(APIView):
+    """
+    Reviewers ranked for a manuscript by how closely their past reviews match
+    its keywords, discounted by their open assignments. Submitter, authors,
+    authors' colleagues by affiliation and assigned reviewers are left out.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, journal_id, manuscript_id, *args, **kwargs):
+        manuscript = get_object_or_404(Manuscript, id=manuscript_id, journal_id=journal_id)
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+
+        return JsonResponse(
+            {
+                'manuscript_id': manuscript.id,
+                'keywords': manuscript.keyword_names(),
+                'reviewers': recommend(manuscript, limit=limit),
+            },
+            status=status.HTTP_200_OK
+        )
+
+
 class SubmitReview(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, manuscript_id, *args, **kwargs):
@@ -658,56 +621,29 @@ class SubmitReview(APIView):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
 
-                # Record on blockchain
+                # Record the review event and queue it for anchoring on the contract
                 try:
-                    sepolia = Sepolia()
-                    tx_receipt = sepolia.record_review(
+                    event = manuscript.record_review(
+                        reviewer=request.user,
+                        comments=comments,
+                        verdict=verdict,
+                        actor=request.user,
+                        txn_hash=''
+                    )
+                    anchor_job = anchor_review(
+                        event,
                         manuscript_id=str(manuscript.id),
                         reviewer_id=str(request.user.id),
                         metadata=metadata
                     )
-                except Exception as e:
-                    return Response(
-                        {
-                            "result": "error",
-                            "message": f"Blockchain recording failed: {str(e)}",
-                            "location": "Blockchain interaction"
-                        },
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-
-                if isinstance(tx_receipt, dict) and 'error' in tx_receipt:
-                    return Response(
-                        {
-                            "result": "error",
-                            "message": tx_receipt['error'],
-                            "location": "Transaction receipt"
-                        },
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-
-                try:
-                    txn_hash = tx_receipt.transactionHash.hex()
-                    if not txn_hash.startswith('0x'):
-                        txn_hash = '0x' + txn_hash
-                except Exception as e:
+                except EventSequenceConflict as e:
                     return Response(
                         {
                             "result": "error",
-                            "message": f"Error processing transaction hash: {str(e)}",
-                            "location": "Transaction hash processing"
+                            "message": f"{e}, reload the manuscript and retry",
+                            "location": "Event recording"
                         },
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-
-                # Record the review event
-                try:
-                    manuscript.record_review(
-                        reviewer=request.user,
-                        comments=comments,
-                        verdict=verdict,
-                        actor=request.user,
-                        txn_hash=txn_hash
+                        status=status.HTTP_409_CONFLICT
                     )
                 except Exception as e:
                     return Response(
@@ -719,10 +655,10 @@ class SubmitReview(APIView):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
 
-                # Return success response
+                # Return accepted response, the transaction hash is filled in by the anchor worker
                 return Response(
                     {
-                        "result": "success",
+                        "result": "accepted",
                         "message": "Review submitted successfully",
                         "data": {
                             "manuscript_id": str(manuscript.id),
@@ -730,10 +666,11 @@ class SubmitReview(APIView):
                             "reviewer_id": str(request.user.id),
                             "status": reviewer_assignment.status,
                             "verdict": verdict,
-                            "transaction_hash": str(txn_hash)
+                            "event_id": event.pk,
+                            "anchor": anchor_job.to_dict(),
                         }
                     },
-                    status=status.HTTP_200_OK
+                    status=status.HTTP_202_ACCEPTED
                 )
 
         except ReviewerAssignment.DoesNotExist:
@@ -765,7 +702,7 @@ class SubmitReview(APIView):
             )
         
 class SubmitCorrections(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser, JSONParser)  # Add JSONParser
 
@@ -783,6 +720,7 @@ class SubmitCorrections(APIView):
                     try:
                         data = JSONParser().parse(request)
                         manuscript_file = data.get('manuscript_file')
+                        upload_id = data.get('upload_id')
                         changes_description = data.get('comments')
                         journal_id = data.get('journal_id')
                         manuscript_id = data.get('manuscript_id')
@@ -798,12 +736,13 @@ class SubmitCorrections(APIView):
                 else:
                     # Handle multipart form data
                     manuscript_file = request.FILES.get('manuscript_file')
+                    upload_id = request.POST.get('upload_id')
                     changes_description = request.POST.get('comments')
                     journal_id = request.POST.get('journal_id')
                     manuscript_id = request.POST.get('manuscript_id')
 
                 # Validate required fields
-                if not manuscript_file:
+                if not manuscript_file and not upload_id:
                     return Response(
                         {
                             "result": "error",
@@ -823,77 +762,111 @@ class SubmitCorrections(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
 
-                # Validate file type and size
-                if not manuscript_file.name.lower().endswith('.docx'):
-                    return Response(
-                        {
-                            "result": "error",
-                            "message": "Only Ms Word files are accepted"
-                        },
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+                if upload_id:
+                    # The file was sent in chunks and already verified in place
+                    try:
+                        upload = CorrectionUpload.objects.select_for_update().filter(
+                            pk=upload_id,
+                            manuscript=manuscript,
+                            uploaded_by=request.user,
+                            status=CorrectionUpload.Status.COMPLETE
+                        ).first()
+                    except ValidationError:
+                        upload = None
+                    if upload is None:
+                        return Response(
+                            {
+                                "result": "error",
+                                "message": "No completed upload found for this manuscript"
+                            },
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    filename, sha256, size = upload.filename, upload.sha256, upload.size
+                else:
+                    # Validate file type and size
+                    if not manuscript_file.name.lower().endswith('.docx'):
+                        return Response(
+                            {
+                                "result": "error",
+                                "message": "Only Ms Word files are accepted"
+                            },
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
 
-                # Check file size (20MB limit)
-                if manuscript_file.size > 20 * 1024 * 1024:
-                    return Response(
-                        {
-                            "result": "error",
-                            "message": "File size exceeds 20MB limit"
-                        },
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+                    # Check file size (20MB limit)
+                    if manuscript_file.size > 20 * 1024 * 1024:
+                        return Response(
+                            {
+                                "result": "error",
+                                "message": "File size exceeds 20MB limit"
+                            },
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
 
-                # Save the file
-                manuscript_file_path = f'manuscripts/{manuscript.id}/corrections_{timezone.now().strftime("%Y%m%d_%H%M%S")}.docx'
-                default_storage.save(manuscript_file_path, manuscript_file)
+                    # Hash while streaming into the content-addressed store, identical files are kept once
+                    sha256, size, _ = filestore.store(manuscript_file.chunks())
+                    filename = manuscript_file.name
 
-                # Record on blockchain
-                sepolia = Sepolia()
                 metadata = {
                     'author_id': str(request.user.id),
                     'author_name': f"{request.user.first_name} {request.user.last_name}",
                     'changes_description': changes_description,
-                    'file_path': manuscript_file_path
+                    'file_sha256': sha256,
+                    'file_size': size
                 }
-                tx_receipt = sepolia.record_corrections(
-                    manuscript_id=str(manuscript.id),
-                    author_id=str(request.user.id),
-                    metadata=metadata
-                )
 
-                if isinstance(tx_receipt, dict) and 'error' in tx_receipt:
-                    return Response(
-                        {"result": "error", "message": tx_receipt['error']},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-
-                txn_hash = tx_receipt.transactionHash.hex()
-                if not txn_hash.startswith('0x'):
-                    txn_hash = '0x' + txn_hash
-
-                # Record the corrections event
-                manuscript.record_corrections(
+                # Record the corrections event and queue it for anchoring on the contract
+                event = manuscript.record_corrections(
                     actor=request.user,
                     changes_description=changes_description,
-                    txn_hash=txn_hash
+                    txn_hash=''
+                )
+                stored_file = manuscript.add_file(
+                    filename=filename,
+                    sha256=sha256,
+                    size=size,
+                    uploaded_by=request.user,
+                    event=event,
+                    kind=ManuscriptFile.Kind.CORRECTIONS
+                )
+                if upload_id:
+                    # An upload is attached once, it cannot back a second submission
+                    upload.status = CorrectionUpload.Status.ATTACHED
+                    upload.save(update_fields=['status'])
+                anchor_job = anchor_corrections(
+                    event,
+                    manuscript_id=str(manuscript.id),
+                    author_id=str(request.user.id),
+                    metadata=metadata
                 )
 
-                # Return success response
+                # Return accepted response
                 return Response(
                     {
-                        "result": "success",
+                        "result": "accepted",
                         "message": "Corrections submitted successfully",
                         "data": {
                             "manuscript_id": str(manuscript.id),
                             "manuscript_title": manuscript.title,
                             "author_id": str(request.user.id),
-                            "file_path": manuscript_file_path,
-                            "transaction_hash": txn_hash
+                            "file_path": stored_file.path,
+                            "file": stored_file.to_dict(),
+                            "event_id": event.pk,
+                            "anchor": anchor_job.to_dict(),
                         }
                     },
-                    status=status.HTTP_200_OK
+                    status=status.HTTP_202_ACCEPTED
                 )
 
+        except EventSequenceConflict as e:
+            return Response(
+                {
+                    "result": "error",
+                    "message": f"{e}, reload the manuscript and retry",
+                    "location": "Event recording"
+                },
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
             return Response(
                 {
@@ -904,8 +877,133 @@ class SubmitCorrections(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class CorrectionUploadMixin:
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_upload(self, request, manuscript_id, upload_id):
+        try:
+            return CorrectionUpload.objects.get(pk=upload_id, manuscript_id=manuscript_id, uploaded_by=request.user)
+        except (CorrectionUpload.DoesNotExist, ValidationError):
+            raise Http404
+
+
+class StartCorrectionUpload(CorrectionUploadMixin, APIView):
+    """Open a resumable chunked upload for a corrections file"""
+
+    def post(self, request, manuscript_id, *args, **kwargs):
+        manuscript = get_object_or_404(Manuscript, id=manuscript_id)
+        try:
+            upload = start_upload(
+                manuscript,
+                request.user,
+                filename=request.data.get('filename'),
+                size=request.data.get('size'),
+                chunk_size=request.data.get('chunk_size'),
+                sha256=request.data.get('sha256', ''),
+            )
+        except UploadError as e:
+            return JsonResponse({"result": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse(upload.to_dict(), status=status.HTTP_201_CREATED)
+
+
+class CorrectionUploadStatus(CorrectionUploadMixin, APIView):
+    """Which chunks of an upload have been received, so an interrupted client can resume"""
+
+    def get(self, request, manuscript_id, upload_id, *args, **kwargs):
+        return JsonResponse(self.get_upload(request, manuscript_id, upload_id).to_dict(), status=status.HTTP_200_OK)
+
+
+class PutUploadChunk(CorrectionUploadMixin, APIView):
+    """
+    Receive one chunk as the raw request body, with its SHA-256 in the
+    X-Chunk-Sha256 header. Re-sending a chunk overwrites it.
+    """
+
+    def put(self, request, manuscript_id, upload_id, index, *args, **kwargs):
+        upload = self.get_upload(request, manuscript_id, upload_id)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        try:
+            write_chunk(upload, index, request.stream, length, request.headers.get('X-Chunk-Sha256'))
+        except UploadError as e:
+            return JsonResponse({"result": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse(
+            {"result": "success", "upload_id": str(upload.id), "index": index},
+            status=status.HTTP_200_OK
+        )
+
+
+class CompleteCorrectionUpload(CorrectionUploadMixin, APIView):
+    """Verify an upload once all chunks are in; its upload_id can then be passed to submit-corrections"""
+
+    def post(self, request, manuscript_id, upload_id, *args, **kwargs):
+        upload = self.get_upload(request, manuscript_id, upload_id)
+        try:
+            upload = complete_upload(upload)
+        except UploadError as e:
+            return JsonResponse({"result": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse(upload.to_dict(), status=status.HTTP_200_OK)
+
+
+class ManuscriptFileMixin:
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_manuscript(self, request, journal_id, manuscript_id):
+        """The manuscript in this journal, if the user may read its files"""
+        manuscript = get_object_or_404(Manuscript, id=manuscript_id, journal_id=journal_id)
+        if not manuscript.can_read_files(request.user):
+            raise PermissionDenied("You do not have access to this manuscript's files")
+        return manuscript
+
+    def get_kind(self, request):
+        kind = request.GET.get('kind', ManuscriptFile.Kind.CORRECTIONS)
+        if kind not in ManuscriptFile.Kind.values:
+            raise ParseError("Invalid file kind")
+        return kind
+
+
+class ManuscriptFiles(ManuscriptFileMixin, APIView):
+    """All stored versions of a manuscript's files, newest first"""
+
+    def get(self, request, journal_id, manuscript_id, *args, **kwargs):
+        manuscript = self.get_manuscript(request, journal_id, manuscript_id)
+        kind = self.get_kind(request)
+
+        return JsonResponse(
+            {
+                'manuscript_id': manuscript.id,
+                'kind': kind,
+                'versions': [manuscript_file.to_dict() for manuscript_file in manuscript.file_versions(kind)],
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class DownloadManuscriptFile(ManuscriptFileMixin, APIView):
+    """Download the latest or a given version of a manuscript file, with Range and ETag support"""
+
+    def get(self, request, journal_id, manuscript_id, version=None, *args, **kwargs):
+        manuscript = self.get_manuscript(request, journal_id, manuscript_id)
+        files = manuscript.file_versions(self.get_kind(request))
+        if version is None:
+            manuscript_file = files.order_by('-version').first()
+        else:
+            manuscript_file = files.filter(version=version).first()
+        if manuscript_file is None:
+            return JsonResponse(
+                {"result": "error", "message": "File not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return file_response(request, manuscript_file, immutable=version is not None)
+
+
 class PublishManuscript(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def post(self, request, manuscript_id, *args, **kwargs):
@@ -923,72 +1021,381 @@ class PublishManuscript(APIView):
         #         status=status.HTTP_400_BAD_REQUEST
         #     )
 
-        sepolia = Sepolia()
-        txn_receipt = sepolia.post_manuscript(manuscript.to_json())
-        
-        txn_hash = txn_receipt.transactionHash.hex()
-        if not txn_hash.startswith('0x'):
-            txn_hash = '0x' + txn_hash
-        manuscript.publish(actor=request.user, txn_hash=txn_hash)
+        manuscript_json = manuscript.to_json()
+        try:
+            with transaction.atomic():
+                event = manuscript.publish(actor=request.user, txn_hash='')
+                anchor_job = anchor_manuscript(event, manuscript_json)
+        except EventSequenceConflict as e:
+            return JsonResponse(
+                {"result": "error", "message": f"{e}, reload the manuscript and retry"},
+                status=status.HTTP_409_CONFLICT
+            )
 
         return JsonResponse(
-            {"result": "success", "message": "Manuscript published successfully"},
-            status=status.HTTP_200_OK
+            {
+                "result": "accepted",
+                "message": "Manuscript published successfully",
+                "event_id": event.pk,
+                "anchor": anchor_job.to_dict(),
+            },
+            status=status.HTTP_202_ACCEPTED
         )
 
 class AssignedReviews(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = Pagination
 
     def get(self, request, *args, **kwargs):
         # Get all reviewer assignments for the authenticated user
-        assignments = ReviewerAssignment.objects.filter(
-            reviewer=request.user,
-            status__in=[
-                ReviewerAssignment.Status.PENDING,
-                ReviewerAssignment.Status.ACCEPTED
-            ]
-        ).select_related('manuscript', 'manuscript__journal_id', 'manuscript__submitted_by')
+        assignments = assignment_listing(
+            ReviewerAssignment.objects.filter(
+                reviewer=request.user,
+                status__in=[
+                    ReviewerAssignment.Status.PENDING,
+                    ReviewerAssignment.Status.ACCEPTED
+                ]
+            )
+        )
 
-        # Initialize paginator
-        paginator = self.pagination_class()
+        # Initialize paginator, keyset on (assigned_date, id) when the client asks for a cursor
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination(('assigned_date', 'id'))
+        else:
+            paginator = self.pagination_class()
         paginated_assignments = paginator.paginate_queryset(assignments, request)
 
         # Prepare the response data
-        manuscript_list = []
-        for assignment in paginated_assignments:
-            manuscript = assignment.manuscript
-            manuscript_data = {
-                'id': manuscript.pk,
-                'title': manuscript.title,
-                'abstract': manuscript.abstract,
-                'journal': {
-                    'id': manuscript.journal_id.id,
-                    'name': manuscript.journal_id.name
-                },
-                'keywords': manuscript.keywords,
-                'submitted_by': manuscript.submitted_by.username if manuscript.submitted_by else None,
-                'authors': [
-                    {
-                        'id': author.id,
-                        'first_name': author.first_name,
-                        'last_name': author.last_name,
-                        'email': author.email,
-                        'affiliation': author.affiliation
-                    }
-                    for author in manuscript.authors.all()
-                ],
-                'assignment': {
-                    'id': assignment.id,
-                    'status': assignment.status,
-                    'assigned_date': assignment.assigned_date,
-                    'due_date': assignment.due_date,
-                    'completed_date': assignment.completed_date
-                },
-                'submitted': manuscript.submitted,
-                'status': manuscript.status
-            }
-            manuscript_list.append(manuscript_data)
+        manuscript_list = [assignment_summary(assignment) for assignment in paginated_assignments]
 
         return paginator.get_paginated_response(manuscript_list)
+
+
+class AsyncAssignedReviews(View):
+    """AssignedReviews for the ASGI application, with the count and the page read side by side"""
+
+    authentication = CachedTokenAuthentication()
+    pagination_class = Pagination
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(request)
+        try:
+            principal = await self.authentication.aauthenticate(request)
+            if principal is None:
+                raise NotAuthenticated()
+        except (AuthenticationFailed, NotAuthenticated) as e:
+            response = api_error(e)
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+            return response
+
+        assignments = assignment_listing(
+            ReviewerAssignment.objects.filter(
+                reviewer_id=principal[0].pk,
+                status__in=[
+                    ReviewerAssignment.Status.PENDING,
+                    ReviewerAssignment.Status.ACCEPTED
+                ]
+            )
+        )
+
+        try:
+            if KeysetPagination.requested(request):
+                paginator = KeysetPagination(('assigned_date', 'id'))
+                paginated_assignments = await paginator.apaginate_queryset(assignments, request)
+            else:
+                paginator = self.pagination_class()
+                paginated_assignments = await apaginate_by_number(paginator, assignments, request)
+        except APIException as e:
+            return api_error(e)
+
+        manuscript_list = [assignment_summary(assignment) for assignment in paginated_assignments]
+        return api_response(paginator.get_paginated_response(manuscript_list).data)
+
+
+class JournalKeywords(APIView):
+    """Keyword facet counts for a journal's manuscripts, optionally for one status"""
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, journal_id, *args, **kwargs):
+        try:
+            journal_id = int(journal_id)
+        except ValueError:
+            raise Http404
+
+        req_status = request.GET.get('status')
+        if req_status and req_status not in Manuscript.Status.values:
+            return JsonResponse(
+                {"result": "error", "message": "Invalid status"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.GET.get('limit', 50)), 1), 500)
+        except ValueError:
+            limit = 50
+
+        def build():
+            get_object_or_404(Journal, pk=journal_id)
+            return [
+                {'keyword': name, 'count': count}
+                for name, count in keyword_facets(journal_id, status=req_status, limit=limit)
+            ]
+
+        keywords, hit = response_cache.cached(
+            'manuscripts.keywords', [('journal', journal_id)], build, extra=f'{req_status}:{limit}'
+        )
+        response = JsonResponse({'journal_id': journal_id, 'keywords': keywords}, status=status.HTTP_200_OK)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+
+class SearchManuscripts(APIView):
+    """Full-text search over titles, abstracts, keywords and authors, optionally within one journal"""
+
+    authentication_classes = []
+    permission_classes = []
+    pagination_class = Pagination
+
+    def get(self, request, journal_id=None, *args, **kwargs):
+        if journal_id is not None:
+            get_object_or_404(Journal, pk=journal_id)
+
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse(
+                {"result": "error", "message": "Search query is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        page_size = self.pagination_class().get_page_size(request)
+
+        hits = search(query, journal_id=journal_id, offset=(page - 1) * page_size, limit=page_size)
+        has_next = len(hits) > page_size
+        hits = hits[:page_size]
+
+        manuscripts = manuscript_listing(Manuscript.objects.filter(pk__in=[pk for pk, _ in hits])).in_bulk()
+        results = []
+        for pk, score in hits:
+            manuscript = manuscripts[pk]
+            data = manuscript_summary(manuscript, manuscript.submitted_by_email)
+            data['score'] = round(score, 4)
+            results.append(data)
+
+        next_url = None
+        if has_next:
+            next_url = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        return JsonResponse({'query': query, 'next': next_url, 'results': results}, status=status.HTTP_200_OK)
+
+
+class ManuscriptEvents(APIView):
+    """Provenance feed of a manuscript, newest first, paged by (timestamp, id) cursors"""
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, manuscript_id, *args, **kwargs):
+        if not Manuscript.objects.filter(pk=manuscript_id).exists():
+            return JsonResponse(
+                {"result": "error", "message": f"Manuscript {manuscript_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        events = ManuscriptEvent.objects.filter(manuscript_id=manuscript_id).select_related('anchor_job')
+
+        paginator = KeysetPagination(('timestamp', 'id'))
+        paginated_events = paginator.paginate_queryset(events, request)
+
+        return paginator.get_paginated_response([event.to_dict() for event in paginated_events])
+
+
+class ManuscriptChainEvents(APIView):
+    """
+    Contract events emitted for a manuscript, newest first, as indexed by
+    `manage.py index_chain_logs`. Read from ChainLog, never from the node.
+    """
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, manuscript_id, *args, **kwargs):
+        if not Manuscript.objects.filter(pk=manuscript_id).exists():
+            return JsonResponse(
+                {"result": "error", "message": f"Manuscript {manuscript_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        logs = ChainLog.objects.filter(manuscript_key__in=chainindex.id_keys(manuscript_id))
+
+        paginator = KeysetPagination(('block_number', 'id'))
+        paginated_logs = paginator.paginate_queryset(logs, request)
+
+        return paginator.get_paginated_response([log.to_dict() for log in paginated_logs])
+
+
+class ManuscriptState(APIView):
+    """
+    State of a manuscript replayed from its event log, from the newest
+    snapshot onwards. ?at=<sequence> replays only up to that event.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, manuscript_id, *args, **kwargs):
+        manuscript = get_object_or_404(Manuscript.objects.only('id', 'status', 'event_sequence'), pk=manuscript_id)
+        at = request.GET.get('at')
+        if at is None:
+            return JsonResponse(eventstore.audit(manuscript), status=status.HTTP_200_OK)
+
+        try:
+            at = int(at)
+        except ValueError:
+            return JsonResponse(
+                {"result": "error", "message": "at must be an event sequence number"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return JsonResponse(
+            {'manuscript_id': manuscript.pk, 'state': eventstore.replay(manuscript.pk, upto=at)},
+            status=status.HTTP_200_OK
+        )
+
+
+class AnchorStatus(APIView):
+    """Poll the on-chain anchoring status of a manuscript event"""
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, manuscript_id, event_id, *args, **kwargs):
+        try:
+            anchor_job = AnchorJob.objects.get(event_id=event_id, event__manuscript_id=manuscript_id)
+        except AnchorJob.DoesNotExist:
+            return JsonResponse(
+                {"result": "error", "message": f"No anchor job for event {event_id}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        data = anchor_job.to_dict()
+        # What the contract emitted for this event, from the local log index rather than the node
+        data['indexed_logs'] = [log.to_dict() for log in chainindex.job_logs(anchor_job)]
+        return JsonResponse(data, status=status.HTTP_200_OK)
+
+
+class EventProof(APIView):
+    """Merkle inclusion proof for an event anchored as part of a batch root"""
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, manuscript_id, event_id, *args, **kwargs):
+        try:
+            anchor_job = AnchorJob.objects.select_related('event', 'batch').get(
+                event_id=event_id,
+                event__manuscript_id=manuscript_id
+            )
+        except AnchorJob.DoesNotExist:
+            return JsonResponse(
+                {"result": "error", "message": f"No anchor job for event {event_id}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if anchor_job.batch is None or not anchor_job.batch.merkle_root:
+            return JsonResponse(
+                {"result": "error", "message": f"Event {event_id} has not been anchored in a Merkle batch"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return JsonResponse(
+            {
+                'event_id': anchor_job.event_id,
+                'record': anchor_job.batch_record(),
+                'leaf_hash': anchor_job.leaf_hash,
+                'proof': anchor_job.merkle_proof,
+                'merkle_root': anchor_job.batch.merkle_root,
+                'txn_hash': anchor_job.txn_hash,
+                'anchor_status': anchor_job.status,
+                'verified': verify_inclusion(anchor_job),
+                'root_indexed': chainindex.root_anchored(anchor_job.batch.merkle_root),
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class EventStreamView(View, ABC):
+    """
+    Server-sent events base: pushes new events and anchoring changes as they
+    happen instead of clients polling. A Last-Event-ID header (or
+    ?last_event_id=) replays the events after that id first. Streams are
+    only served by the ASGI application.
+    """
+
+    @abstractmethod
+    def topic(self, **kwargs):
+        """Broker topic the stream subscribes to"""
+
+    @abstractmethod
+    def events(self, **kwargs):
+        """ManuscriptEvent queryset that missed events are replayed from"""
+
+    @abstractmethod
+    async def exists(self, **kwargs):
+        """True if the streamed manuscript or journal exists"""
+
+    async def get(self, request, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {"result": "error", "message": "Event streams are only served over ASGI"},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        if last_event_id is not None:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                return JsonResponse(
+                    {"result": "error", "message": "Last-Event-ID must be an event id"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        if not await self.exists(**kwargs):
+            return JsonResponse({"result": "error", "message": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(
+            streams.event_stream(self.topic(**kwargs), self.events(**kwargs), last_event_id),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class ManuscriptEventStream(EventStreamView):
+    """Live events and anchoring changes of one manuscript"""
+
+    def topic(self, manuscript_id, **kwargs):
+        return streams.manuscript_topic(manuscript_id)
+
+    def events(self, manuscript_id, **kwargs):
+        return ManuscriptEvent.objects.filter(manuscript_id=manuscript_id)
+
+    async def exists(self, journal_id, manuscript_id, **kwargs):
+        return await Manuscript.objects.filter(pk=manuscript_id, journal_id=journal_id).aexists()
+
+
+class JournalEventStream(EventStreamView):
+    """Live events and anchoring changes of every manuscript in a journal"""
+
+    def topic(self, journal_id, **kwargs):
+        return streams.journal_topic(journal_id)
+
+    def events(self, journal_id, **kwargs):
+        return ManuscriptEvent.objects.filter(manuscript__journal_id=journal_id)
+
+    async def exists(self, journal_id, **kwargs):
+        return await Journal.objects.filter(pk=journal_id).aexists()
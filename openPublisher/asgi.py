@@ -2,6 +2,9 @@
 ASGI config for openPublisher project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The server-sent event streams (manuscripts/streams.py) are only served here,
+and requests are resolved against ASGI_ROOT_URLCONF, which routes the main
+read endpoints to their async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +12,21 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'openPublisher.settings')
 
-application = get_asgi_application()
+
+class OpenPublisherASGIHandler(ASGIHandler):
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_ROOT_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = OpenPublisherASGIHandler()
@@ -0,0 +1,19 @@
+"""
+URL configuration of the ASGI application (see openPublisher/asgi.py).
+
+The read endpoints below are served by their async views; the routes only
+match numeric ids, so anything else falls through to the same patterns as
+the WSGI application.
+"""
+from django.urls import path
+
+from journals.views import AsyncJournalDetails
+from manuscripts.views import AsyncAssignedReviews, AsyncGetLocalManuscriptById, AsyncGetLocalManuscripts
+from openPublisher import urls
+
+urlpatterns = [
+    path('journals/<int:pk>/details', AsyncJournalDetails.as_view()),
+    path('manuscripts/assigned-reviews', AsyncAssignedReviews.as_view()),
+    path('manuscripts/<int:journal_id>', AsyncGetLocalManuscripts.as_view()),
+    path('manuscripts/<int:journal_id>/<int:manuscript_id>', AsyncGetLocalManuscriptById.as_view()),
+] + urls.urlpatterns
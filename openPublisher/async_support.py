@@ -0,0 +1,79 @@
+"""
+Helpers for the async read views served by the ASGI application.
+
+Django's async ORM methods hand every query of a request to the same sync
+thread, so they run one after another. run_queries() sends independent
+reads to a small pool of ASYNC_QUERY_WORKERS threads instead, each with
+its own database connection, so e.g. a page of rows and its total count
+are read at the same time. A pool thread keeps its connection from one
+query to the next, whatever CONN_MAX_AGE says for request connections,
+and replaces it once it has failed or is ASYNC_QUERY_CONN_MAX_AGE seconds
+old. Only for reads: the callables run outside any transaction of the
+caller.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+_executor = None
+# Per pool thread: alias -> (DB-API connection, when it was first seen)
+_opened = threading.local()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.ASYNC_QUERY_WORKERS, thread_name_prefix='async-query')
+    return _executor
+
+
+def _recycle_connections():
+    """Close this thread's connections that failed or are too old; the next query opens a new one"""
+    now = time.monotonic()
+    opened = _opened.__dict__
+    for connection in connections.all(initialized_only=True):
+        raw = connection.connection
+        if raw is None:
+            continue
+        if opened.get(connection.alias, (None, None))[0] is not raw:
+            opened[connection.alias] = (raw, now)
+        if connection.errors_occurred:
+            if not connection.is_usable():
+                connection.close()
+                continue
+            connection.errors_occurred = False
+        if now - opened[connection.alias][1] >= settings.ASYNC_QUERY_CONN_MAX_AGE:
+            connection.close()
+
+
+def _call(function):
+    try:
+        return function()
+    finally:
+        _recycle_connections()
+
+
+async def run_query(function):
+    """Result of calling `function` on a query thread"""
+    return await asyncio.get_running_loop().run_in_executor(_pool(), _call, function)
+
+
+async def run_queries(*functions):
+    """Results of calling each of `functions` on its own query thread, all at once"""
+    return await asyncio.gather(*(run_query(function) for function in functions))
+
+
+def api_response(data, status=200):
+    """JSON rendered the way DRF's Response renders it, so both versions of a view return the same bytes"""
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def api_error(exc):
+    """Response for a DRF APIException raised in a plain async view"""
+    return api_response({'detail': exc.detail}, status=exc.status_code)
@@ -0,0 +1,38 @@
+"""
+Bulk upserts that run on every database the project supports.
+
+bulk_create(update_conflicts=True, unique_fields=...) only works where the
+backend can name the conflict target (PostgreSQL, SQLite). MySQL cannot and
+rejects unique_fields; its INSERT ... ON DUPLICATE KEY UPDATE fires on any
+unique key instead, which is the same thing for models whose only unique
+key besides the primary key is the one upserted on. Backends without
+upserts at all fall back to deleting the conflicting rows and inserting.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+
+def upsert(model, objs, unique_fields, update_fields):
+    """Insert `objs`, or update `update_fields` of the rows with the same `unique_fields` values"""
+    objs = list(objs)
+    if not objs:
+        return objs
+
+    using = router.db_for_write(model)
+    features = connections[using].features
+    if features.supports_update_conflicts_with_target:
+        return model.objects.using(using).bulk_create(
+            objs, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields
+        )
+    if features.supports_update_conflicts:
+        return model.objects.using(using).bulk_create(objs, update_conflicts=True, update_fields=update_fields)
+
+    attnames = [model._meta.get_field(name).attname for name in unique_fields]
+    with transaction.atomic(using=using):
+        model.objects.using(using).filter(
+            reduce(or_, (Q(**{attname: getattr(obj, attname) for attname in attnames}) for obj in objs))
+        ).delete()
+        return model.objects.using(using).bulk_create(objs)
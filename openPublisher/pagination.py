@@ -0,0 +1,180 @@
+import base64
+import binascii
+import datetime
+import json
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from openPublisher.async_support import run_queries, run_query
+
+
+def _cursor_value(value):
+    # Full microsecond precision, DjangoJSONEncoder would cut datetimes to milliseconds
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite key such as (submitted, id), newest
+    first unless `descending` is False.
+
+    Each page is fetched with a range condition on the key instead of an
+    OFFSET, so deep pages cost the same as the first one. The total count is
+    only computed when the client asks for it with ?count=true.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def __init__(self, fields, descending=True):
+        self.fields = fields
+        self.descending = descending
+
+    @classmethod
+    def requested(cls, request):
+        """True if the client opted into cursor pagination"""
+        return cls.cursor_query_param in request.query_params or request.query_params.get('pagination') == 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position, default=_cursor_value).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound('Invalid cursor')
+        return position
+
+    def position(self, item):
+        if isinstance(item, dict):
+            # A values() row
+            return [item[field] for field in self.fields]
+        values = []
+        for field in self.fields:
+            value = item
+            for attr in field.split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def after(self, position):
+        """Rows strictly after `position` in key order"""
+        lookup = 'lt' if self.descending else 'gt'
+        conditions = []
+        for i, field in enumerate(self.fields):
+            equal = {self.fields[j]: position[j] for j in range(i)}
+            conditions.append(Q(**equal, **{f'{field}__{lookup}': position[i]}))
+        return reduce(or_, conditions)
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param) in ('1', 'true')
+
+    def page_query(self, queryset, request):
+        """The requested page plus one row, to tell whether another page follows"""
+        self.request = request
+        self.size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(*(f'{prefix}{field}' for field in self.fields))
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:self.size + 1]
+
+    def page(self, rows):
+        self.has_next = len(rows) > self.size
+        rows = rows[:self.size]
+        self.next_position = self.position(rows[-1]) if self.has_next else None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.page_query(queryset, request)
+        self.count = queryset.count() if self.count_requested(request) else None
+        return self.page(list(page))
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views, reading the count and the page side by side"""
+        page = self.page_query(queryset, request)
+        if self.count_requested(request):
+            self.count, rows = await run_queries(queryset.count, lambda: list(page))
+        else:
+            self.count, rows = None, await run_query(lambda: list(page))
+        return self.page(rows)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, 'pagination', 'cursor')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+
+async def apaginate_by_number(paginator, queryset, request):
+    """
+    PageNumberPagination.paginate_queryset() for async views. The total
+    count and the page are read side by side; the page number is checked
+    against the count afterwards, except for 'last', which needs it first.
+    """
+    paginator.request = request
+    page_size = paginator.get_page_size(request)
+    number = request.query_params.get(paginator.page_query_param) or 1
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+
+    def invalid(message):
+        return NotFound(paginator.invalid_page_message.format(page_number=number, message=message))
+
+    if number in paginator.last_page_strings:
+        django_paginator.count = await run_query(queryset.count)
+        number = django_paginator.num_pages
+    try:
+        index = int(number)
+    except (TypeError, ValueError):
+        raise invalid('That page number is not an integer')
+    if index < 1:
+        raise invalid('That page number is less than 1')
+
+    bottom = (index - 1) * page_size
+    if 'count' in django_paginator.__dict__:
+        rows = await run_query(lambda: list(queryset[bottom:bottom + page_size]))
+    else:
+        django_paginator.count, rows = await run_queries(
+            queryset.count, lambda: list(queryset[bottom:bottom + page_size])
+        )
+    try:
+        paginator.page = django_paginator.page(index)
+    except InvalidPage as exc:
+        raise invalid(str(exc))
+    paginator.page.object_list = rows
+    return rows
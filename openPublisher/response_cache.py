@@ -0,0 +1,177 @@
+"""
+Versioned cache for public read endpoints.
+
+Cached entries are keyed by the version counters of the objects they were
+built from, e.g. ('journal', 3). Writes bump those counters once their
+transaction commits, so the next read misses and rebuilds, and stale
+entries are never read again and simply age out. A bump writes a new
+version rather than incrementing it, as DatabaseCache.incr() is a read
+followed by a write and two concurrent bumps could store the same value.
+
+Counters and entries live in the RESPONSE_CACHE_ALIAS cache, by default
+database backed so every process sees every bump. A process-local cache
+cannot see bumps made by other processes, so its entries expire after
+RESPONSE_CACHE_LOCAL_TIMEOUT seconds instead of RESPONSE_CACHE_TIMEOUT.
+Hit/miss statistics are counted in each process and added to the shared
+cache at most every RESPONSE_CACHE_STATS_INTERVAL seconds, so a hit costs
+no cache write.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+STATS_NAMES_KEY = 'stats:names'
+
+_stats_lock = threading.Lock()
+_stats = Counter()
+_stats_flushed = time.monotonic()
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(scope, pk):
+    return f'version:{scope}:{pk}'
+
+
+def _fresh_version():
+    # Clock plus random low digits: never a value old entries were keyed by, nor one a concurrent bump wrote
+    return time.time_ns() // 1000 * 1000 + secrets.randbelow(1000)
+
+
+def versions(*scopes):
+    """Current version of each (scope, pk), creating counters that do not exist yet"""
+    cache = _cache()
+    keys = [_version_key(scope, pk) for scope, pk in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh_version(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate everything cached under these (scope, pk) once the current transaction commits"""
+    def _bump():
+        cache = _cache()
+        cache.set_many({_version_key(scope, pk): _fresh_version() for scope, pk in scopes}, timeout=None)
+    transaction.on_commit(_bump)
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        _stats[name, outcome] += 1
+        if time.monotonic() - _stats_flushed < settings.RESPONSE_CACHE_STATS_INTERVAL:
+            return
+    flush_stats()
+
+
+def flush_stats():
+    """Add this process's hit/miss counts to the shared ones"""
+    global _stats_flushed
+    with _stats_lock:
+        counts = dict(_stats)
+        _stats.clear()
+        _stats_flushed = time.monotonic()
+    if not counts:
+        return
+
+    cache = _cache()
+    for (name, outcome), count in counts.items():
+        key = f'stats:{name}:{outcome}'
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.set(key, count, timeout=None)
+    names = cache.get(STATS_NAMES_KEY, set())
+    listed = names | {name for name, outcome in counts}
+    if listed != names:
+        cache.set(STATS_NAMES_KEY, listed, timeout=None)
+
+
+def _lookup(name, scopes, extra):
+    """(key, value) of a cache entry, value None on a miss"""
+    digest = hashlib.sha256(extra.encode()).hexdigest()[:16]
+    version = '.'.join(str(v) for v in versions(*scopes))
+    key = f'response:{name}:{version}:{digest}'
+
+    value = _cache().get(key)
+    if value is not None:
+        _count(name, 'hits')
+    return key, value
+
+
+def _timeout():
+    if isinstance(_cache(), LocMemCache):
+        return settings.RESPONSE_CACHE_LOCAL_TIMEOUT
+    return settings.RESPONSE_CACHE_TIMEOUT
+
+
+def _store(name, key, value):
+    _cache().set(key, value, timeout=_timeout())
+    _count(name, 'misses')
+
+
+def cached(name, scopes, build, extra=''):
+    """
+    Value of `build()` for the current versions of `scopes`.
+    Returns (value, hit). `extra` distinguishes variants of the same entry,
+    such as the query string of a list page.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return build(), False
+
+    key, value = _lookup(name, scopes, extra)
+    if value is not None:
+        return value, True
+
+    value = build()
+    _store(name, key, value)
+    return value, False
+
+
+async def acached(name, scopes, build, extra=''):
+    """cached() for async views, with `build` a coroutine function. Shares entries with cached()."""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return await build(), False
+
+    key, value = await sync_to_async(_lookup)(name, scopes, extra)
+    if value is not None:
+        return value, True
+
+    value = await build()
+    await sync_to_async(_store)(name, key, value)
+    return value, False
+
+
+def stats():
+    """Hit and miss counts per cached endpoint, as flushed by every process"""
+    flush_stats()
+    cache = _cache()
+    result = {}
+    for name in sorted(cache.get(STATS_NAMES_KEY, set())):
+        counts = cache.get_many([f'stats:{name}:hits', f'stats:{name}:misses'])
+        result[name] = {
+            'hits': counts.get(f'stats:{name}:hits', 0),
+            'misses': counts.get(f'stats:{name}:misses', 0),
+        }
+    return result
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+    cache = _cache()
+    names = cache.get(STATS_NAMES_KEY, set())
+    cache.delete_many([f'stats:{name}:{outcome}' for name in names for outcome in ('hits', 'misses')])
+    cache.delete(STATS_NAMES_KEY)
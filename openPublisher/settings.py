@@ -67,6 +67,13 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'openPublisher.wsgi.application'
+ASGI_APPLICATION = 'openPublisher.asgi.application'
+# The ASGI application serves the main read endpoints with async views
+ASGI_ROOT_URLCONF = 'openPublisher.asgi_urls'
+# Threads for the independent reads async views run side by side, each holds a database connection
+ASYNC_QUERY_WORKERS = 8
+# Seconds a query thread reuses its connection before opening a new one
+ASYNC_QUERY_CONN_MAX_AGE = 300
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -128,6 +135,22 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MAX_UPLOAD_SIZE = 5242880
 FILE_UPLOAD_PERMISSIONS = 0o640
 
+# Resumable chunked uploads of correction files, written straight to MEDIA_ROOT (see manuscripts/uploads.py)
+CHUNKED_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+CHUNKED_UPLOAD_BUFFER_SIZE = 64 * 1024
+CHUNKED_UPLOAD_MAX_OPEN = 5  # uploads a user may have in progress at once
+# Seconds an upload may sit without a new chunk, or complete without being submitted, before
+# `manage.py clean_correction_uploads` deletes it
+CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Manuscript file downloads. None streams files from Django in CHUNKED_UPLOAD_BUFFER_SIZE blocks;
+# 'x-accel-redirect' hands them to nginx through an internal location mapping
+# FILE_DOWNLOAD_ACCEL_PREFIX to MEDIA_ROOT, 'x-sendfile' to Apache mod_xsendfile / lighttpd by full path.
+FILE_DOWNLOAD_OFFLOAD = None
+FILE_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
 BASE_URL = 'localhost'
 LOGIN_URL = '/profiles/login'
 
@@ -153,12 +176,20 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # 'rest_framework.authentication.BasicAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
 
+# Token -> user lookups kept in-process by CachedTokenAuthentication. Evictions are announced to
+# other processes through a generation key in the shared 'tokens' cache, which each process reads
+# every TOKEN_AUTH_CACHE_SYNC_INTERVAL seconds
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TTL = 300  # seconds
+TOKEN_AUTH_CACHE_ALIAS = 'tokens'
+TOKEN_AUTH_CACHE_SYNC_INTERVAL = 5  # seconds
+
 CORS_ORIGIN_ALLOW_ALL = False
 
 CORS_ORIGIN_WHITELIST = [
@@ -172,9 +203,94 @@ CORS_ALLOW_CREDENTIALS = True
 W3 = Web3(Web3.HTTPProvider('https://sepolia.infura.io/v3/33402a9c3c794b65ae627ce14205f81a'))
 W3_OWNERS_ADDRESS = Web3.to_checksum_address("0x674938B41B6ed666989f4C476A721224288F0b1E".lower())
 W3_CONTRACT_ADDRESS = Web3.to_checksum_address("0xcD60Ce70ce63f5081F0ea1d9b78da6cd2e6C9EcB")
+# JournalContractV2.json for a contract deployed from JournalContractV2.sol, which takes the same calls
+W3_CONTRACT_ABI = os.path.join(BASE_DIR, 'JournalContract.json')
+# 'web3' sends transactions to W3, 'simulated' runs JournalContract in an in-memory ledger
+W3_BACKEND = 'web3'
+W3_SIMULATED_LEDGER = {
+    'block_time': 12,
+    'receipt_latency': 0,
+    'failure_rate': 0.0,
+    'revert_rate': 0.0,
+    'seed': 0,
+}
 W3_PRIV_KEY = secrets.get('W3_PRIV_KEY')
 W3_TEST_ACCOUNTS = [
     W3_OWNERS_ADDRESS,
     Web3.to_checksum_address("0x0297F6C254CeD9B8A3A3d829dfA80ccB73d5e6ED".lower()),
     Web3.to_checksum_address("0xB4a271B7e99B07Cd8989f8e1C7ccfc42Fd41eC6A".lower())
 ]
+
+# ON-CHAIN ANCHORING
+# Events are queued as AnchorJob rows and sent by `manage.py run_anchor_worker`
+ANCHOR_MAX_ATTEMPTS = 8
+# A failed send is retried after ANCHOR_RETRY_BACKOFF seconds, doubled after every further failure
+ANCHOR_RETRY_BACKOFF = 30
+ANCHOR_RETRY_MAX_BACKOFF = 3600
+ANCHOR_CLAIM_TIMEOUT = 120  # seconds a job being sent is hidden from other workers
+ANCHOR_BROADCAST_TIMEOUT = 900  # seconds without a receipt before a transaction counts as dropped and is resent
+ANCHOR_NONCE_GRACE = 300  # seconds an allocated nonce may be missing from the mempool before it is handed out again
+ANCHOR_CONFIRMATIONS = 1
+ANCHOR_POLL_INTERVAL = 2
+ANCHOR_GAS_MARGIN = 1.2
+# Gas price multiplier for a send that reuses the nonce of a dropped transaction, nodes want at least 1.1
+ANCHOR_REPLACEMENT_GAS_BUMP = 1.125
+# 'single' sends one transaction per event, 'batch' groups events into recordEvents calls,
+# 'merkle' sends only the Merkle root of each batch and keeps inclusion proofs locally.
+# The contract at W3_CONTRACT_ADDRESS predates recordEvents and anchorRoot: 'batch' and 'merkle' need
+# JournalContract.sol redeployed and the address updated, run_anchor_worker refuses to start otherwise.
+ANCHOR_MODE = 'single'
+ANCHOR_BATCH_SIZE = 20
+ANCHOR_BATCH_WINDOW = 10  # seconds a partial batch waits for more events
+
+# CONTRACT LOG INDEX
+# `manage.py index_chain_logs` copies the contract's events into ChainLog rows (manuscripts/chainindex.py)
+INDEXER_START_BLOCK = 0  # set to the contract's deployment block to skip reading older ranges
+INDEXER_BATCH_BLOCKS = 2000  # blocks per eth_getLogs call, halved while the node refuses a range
+INDEXER_REORG_DEPTH = 12  # blocks behind the head that may still be replaced
+INDEXER_POLL_INTERVAL = 12
+# ABI file of each contract other than W3_CONTRACT_ADDRESS that `index_chain_logs --contract` reads,
+# by address, e.g. a JournalContractV2 deployment: {'0x...': os.path.join(BASE_DIR, 'JournalContractV2.json')}
+INDEXER_CONTRACT_ABIS = {}
+
+# A manuscript's state is snapshotted every this many events, replay then reads at most this many
+EVENT_SNAPSHOT_INTERVAL = 50
+
+# EVENT STREAMS
+# Server-sent event streams of manuscript events (manuscripts/streams.py) need the ASGI application.
+# Each process polls the database for new events, so streams work with any number of ASGI workers.
+STREAM_POLL_INTERVAL = 2  # seconds between checks for events written by other processes
+STREAM_BUFFER_SIZE = 100  # messages a slow subscriber may fall behind before it is cut off
+STREAM_BACKLOG_LIMIT = 500  # events replayed per reconnect, and read per poll
+STREAM_HEARTBEAT_INTERVAL = 15
+STREAM_MAX_AGE = 300  # seconds before a stream closes and the client resumes with Last-Event-ID
+STREAM_RETRY_MS = 3000
+
+# Largest number of (manuscript, reviewer) pairs accepted by one bulk assignment request
+BULK_ASSIGNMENT_MAX_ITEMS = 500
+
+# RESPONSE CACHE
+# Public manuscript and journal reads are cached under per-journal and per-manuscript version counters
+# (see openPublisher/response_cache.py). Writes from every process, the anchor worker included, bump
+# the counters, so the 'responses' cache is kept in the database where all of them see it; create its
+# table once with `manage.py createcachetable`. FileBasedCache on a shared directory works as well.
+# With a per-process backend such as LocMemCache entries only live RESPONSE_CACHE_LOCAL_TIMEOUT seconds.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'response_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'token_cache',
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_LOCAL_TIMEOUT = 5
+RESPONSE_CACHE_STATS_INTERVAL = 60  # seconds between adding a process's hit/miss counts to the shared ones
@@ -0,0 +1,71 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import Profile
+from journals.models import Journal
+from manuscripts.anchoring import anchor_manuscript, broadcast_batch, broadcast_pending, confirm_broadcast
+from manuscripts.backends import SimulatedLedger
+from manuscripts.models import AnchorJob, Manuscript
+from manuscripts.sepolia import Sepolia
+
+
+def run(*script_args):
+    """
+    End-to-end throughput of the anchoring pipeline against the simulated ledger.
+    Everything is written inside one transaction that is rolled back at the end.
+
+    python manage.py runscript bench_anchor_pipeline --script-args events=500 mode=batch block_time=0.5
+    """
+    options = {'events': '200', 'mode': 'single', 'poll': '0.05'}
+    options.update(arg.split('=', 1) for arg in script_args)
+    ledger_options = dict(settings.W3_SIMULATED_LEDGER, block_time=0.2)
+    for key in ledger_options:
+        if key in options:
+            ledger_options[key] = type(ledger_options[key])(float(options[key]))
+
+    events = int(options['events'])
+    sepolia = Sepolia(backend=SimulatedLedger(**ledger_options))
+
+    with transaction.atomic():
+        tag = uuid.uuid4().hex[:8]
+        profile = Profile.objects.create_user(
+            email=f'bench-{tag}@example.com', password=None, first_name='Bench', last_name=tag
+        )
+        journal = Journal.objects.create(
+            title=f'Bench {tag}', abbreviation=f'B-{tag}', description='', publisher='bench',
+            online_issn=f'on-{tag}', print_issn=f'pr-{tag}', created_by=profile
+        )
+        sepolia.nonces.sync()
+
+        started = time.perf_counter()
+        for i in range(events):
+            manuscript = Manuscript.objects.create(
+                title=f'Bench manuscript {i}', abstract='', keywords=[], journal_id=journal, submitted_by=profile
+            )
+            event = manuscript.record_submission(actor=profile, txn_hash='')
+            anchor_manuscript(event, {'title': manuscript.title, 'journal_id': journal.pk})
+        enqueued = time.perf_counter()
+
+        jobs = AnchorJob.objects.filter(event__manuscript__journal_id=journal)
+        open_statuses = [AnchorJob.Status.PENDING, AnchorJob.Status.BROADCAST]
+        while jobs.filter(status__in=open_statuses).exists():
+            if options['mode'] == 'single':
+                broadcast_pending(sepolia, limit=events)
+            else:
+                broadcast_batch(sepolia, window=0, use_merkle=options['mode'] == 'merkle')
+            confirm_broadcast(sepolia)
+            time.sleep(float(options['poll']))
+        finished = time.perf_counter()
+
+        confirmed = jobs.filter(status=AnchorJob.Status.CONFIRMED).count()
+        transactions = len(sepolia.backend.receipts)
+        gas = sum(receipt.gasUsed for receipt in sepolia.backend.receipts.values())
+        transaction.set_rollback(True)
+
+    print(f"mode={options['mode']} events={events} ledger={ledger_options}")
+    print(f"  enqueue:   {events / (enqueued - started):10.1f} events/s")
+    print(f"  anchored:  {confirmed / (finished - started):10.1f} events/s end to end ({finished - started:.2f}s)")
+    print(f"  chain:     {transactions} transactions, {gas / max(confirmed, 1):.0f} gas per event")
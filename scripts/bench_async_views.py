@@ -0,0 +1,220 @@
+import asyncio
+import io
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from manuscripts.models import Manuscript, ReviewerWorkload
+
+
+def endpoints(journal_id, manuscript_id, token):
+    """(name, path, query, headers) of the benchmarked read endpoints"""
+    auth = [('Authorization', f'Token {token}')] if token else []
+    cases = [
+        ('manuscripts', f'/manuscripts/{journal_id}', '', []),
+        ('manuscripts p2', f'/manuscripts/{journal_id}', 'page=2', []),
+        ('manuscript', f'/manuscripts/{journal_id}/{manuscript_id}', '', []),
+        ('journal', f'/journals/{journal_id}/details', '', []),
+    ]
+    if token:
+        cases.append(('assigned', '/manuscripts/assigned-reviews', '', auth))
+    return cases
+
+
+def wsgi_caller(host):
+    from openPublisher.wsgi import application
+
+    def call(path, query, headers):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': host,
+            'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        environ.update((f"HTTP_{name.upper().replace('-', '_')}", value) for name, value in headers)
+        status = []
+        body = application(environ, lambda code, response_headers, exc_info=None: status.append(code))
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return int(status[0].split()[0])
+    return call
+
+
+def asgi_caller(host):
+    from openPublisher.asgi import application
+
+    async def call(path, query, headers):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', host.encode())] + [
+                (name.lower().encode(), value.encode()) for name, value in headers
+            ],
+            'server': (host, 80), 'client': ('127.0.0.1', 0),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await application(scope, receive, send)
+        return status[0]
+    return call
+
+
+def http_caller(base_url, session):
+    async def call(path, query, headers):
+        url = f"{base_url.rstrip('/')}{path}" + (f'?{query}' if query else '')
+        async with session.get(url, headers=dict(headers)) as response:
+            await response.read()
+            return response.status
+    return call
+
+
+def run_threads(call, cases, requests, concurrency):
+    """Latencies and wall time of `requests` sync calls spread over `concurrency` threads"""
+    latencies = {name: [] for name, _, _, _ in cases}
+    lock = threading.Lock()
+    errors = []
+
+    def one(i):
+        name, path, query, headers = cases[i % len(cases)]
+        started = time.perf_counter()
+        status = call(path, query, headers)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies[name].append(elapsed)
+            if status >= 400:
+                errors.append((name, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return latencies, time.perf_counter() - started, errors
+
+
+async def run_tasks(call, cases, requests, concurrency):
+    """Latencies and wall time of `requests` async calls with at most `concurrency` in flight"""
+    latencies = {name: [] for name, _, _, _ in cases}
+    errors = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            name, path, query, headers = cases[i % len(cases)]
+            started = time.perf_counter()
+            status = await call(path, query, headers)
+            latencies[name].append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append((name, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started, errors
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def report(label, latencies, elapsed, errors):
+    everything = [latency for values in latencies.values() for latency in values]
+    print(
+        f"{label:>5}: {len(everything) / elapsed:8.0f} req/s  p50 {percentile(everything, 0.5) * 1000:7.2f} ms"
+        f"  p99 {percentile(everything, 0.99) * 1000:7.2f} ms  errors {len(errors)}"
+    )
+    for name, values in latencies.items():
+        print(
+            f"       {name:<15} p50 {percentile(values, 0.5) * 1000:7.2f} ms"
+            f"  p99 {percentile(values, 0.99) * 1000:7.2f} ms  mean {statistics.fmean(values) * 1000:7.2f} ms"
+        )
+    if errors:
+        print(f"       first error: {errors[0]}")
+
+
+def run(*script_args):
+    """
+    p50/p99 latency and requests per second of the read endpoints served by
+    the WSGI application (sync views) and the ASGI application (async views),
+    with `concurrency` requests in flight. Reads existing rows: the journal
+    with the most manuscripts unless journal= is given, and the token of the
+    reviewer with the most open assignments unless token= is given.
+
+    In-process, the WSGI application is called from a thread per concurrent
+    request and the ASGI application from tasks on one event loop, which
+    leaves out the HTTP servers. To include them, start both servers and pass
+    their base URLs, e.g. gunicorn on :8000 and uvicorn on :8001:
+
+    python manage.py runscript bench_async_views --script-args requests=5000 concurrency=100
+    python manage.py runscript bench_async_views \\
+        --script-args wsgi_url=http://localhost:8000 asgi_url=http://localhost:8001
+
+    response_cache=0 turns the response cache off for in-process runs.
+    """
+    options = {'requests': '2000', 'concurrency': '50', 'host': 'localhost', 'response_cache': '1'}
+    options.update(arg.split('=', 1) for arg in script_args)
+    requests, concurrency = int(options['requests']), int(options['concurrency'])
+
+    journal_id = options.get('journal') or (
+        Manuscript.objects
+        .values('journal_id')
+        .annotate(count=Count('id'))
+        .order_by('-count')
+        .values_list('journal_id', flat=True)
+        .first()
+    )
+    manuscript_id = Manuscript.objects.filter(journal_id=journal_id).values_list('pk', flat=True).first()
+    if journal_id is None or manuscript_id is None:
+        print("Needs at least one journal with a manuscript")
+        return
+
+    token = options.get('token')
+    if token is None:
+        reviewer_id = (
+            ReviewerWorkload.objects
+            .filter(open_assignments__gt=0)
+            .order_by('-open_assignments')
+            .values_list('reviewer_id', flat=True)
+            .first()
+        )
+        token = Token.objects.filter(user_id=reviewer_id).values_list('key', flat=True).first()
+
+    cases = endpoints(journal_id, manuscript_id, token)
+    print(f"journal={journal_id} manuscript={manuscript_id} requests={requests} concurrency={concurrency}")
+
+    if 'wsgi_url' in options or 'asgi_url' in options:
+        import aiohttp
+
+        async def over_http():
+            connector = aiohttp.TCPConnector(limit=concurrency)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                for label in ('wsgi', 'asgi'):
+                    if f'{label}_url' in options:
+                        call = http_caller(options[f'{label}_url'], session)
+                        report(label, *await run_tasks(call, cases, requests, concurrency))
+        asyncio.run(over_http())
+        return
+
+    host = options['host']
+    with override_settings(RESPONSE_CACHE_ENABLED=options['response_cache'] not in ('0', 'false')):
+        # One untimed pass each, to load code paths and warm the response cache alike
+        run_threads(wsgi_caller(host), cases, len(cases), 1)
+        asyncio.run(run_tasks(asgi_caller(host), cases, len(cases), 1))
+
+        report('wsgi', *run_threads(wsgi_caller(host), cases, requests, concurrency))
+        report('asgi', *asyncio.run(run_tasks(asgi_caller(host), cases, requests, concurrency)))
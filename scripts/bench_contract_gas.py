@@ -0,0 +1,109 @@
+import json
+import os
+
+from django.conf import settings
+from eth_utils import keccak
+from web3 import Web3
+
+from manuscripts.sepolia import Sepolia
+from scripts.web3_compile_contract import CONTRACTS, compile_contract, source_sha256
+
+
+def local_web3(rpc_url):
+    """A local node at `rpc_url` such as anvil or a hardhat node, else an in-process py-evm chain"""
+    if rpc_url:
+        return Web3(Web3.HTTPProvider(rpc_url))
+    from web3 import EthereumTesterProvider
+    return Web3(EthereumTesterProvider())
+
+
+def load_contract(name):
+    """
+    ABI and bytecode from <name>.json when it was compiled from the current
+    <name>.sol, else compiled afresh
+    """
+    path = os.path.join(settings.BASE_DIR, f'{name}.json')
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            compiled_contract = json.load(f)
+        if compiled_contract.get('bytecode') and compiled_contract.get('source_sha256') == source_sha256(name):
+            return compiled_contract['abi'], compiled_contract['bytecode']
+    return compile_contract(name)
+
+
+def operations(manuscript_id, reviewer_id, batch_size):
+    """(name, fn_name, args) of the calls the anchor worker sends, with realistic payload sizes"""
+    manuscript = {
+        'id': manuscript_id,
+        'title': 'Effects of soil salinity on smallholder maize yields in semi-arid Kenya',
+        'abstract': 'x' * 1200,
+        'keywords': ['salinity', 'maize', 'smallholder', 'semi-arid'],
+        'authors': [{'email': f'author{i}@example.org', 'name': f'Author {i}', 'affiliation': 'University'}
+                    for i in range(3)],
+    }
+    assignment = {'reviewer_id': reviewer_id, 'reviewer_name': 'Reviewer Name', 'reviewer_email': 'r@example.org'}
+    review = {'reviewer_id': reviewer_id, 'verdict': 'MINOR_REVISION', 'comments': 'x' * 500}
+    corrections = {'author_id': reviewer_id, 'file': 'corrections_v2.pdf', 'notes': 'x' * 200}
+    records = [
+        (str(manuscript_id), reviewer_id, 'REVIEWER_ASSIGNED', json.dumps(assignment))
+        for _ in range(batch_size)
+    ]
+    return [
+        ('publishManuscript', 'publishManuscript', Sepolia.manuscript_args(manuscript)),
+        ('recordReviewerAssignment', 'recordReviewerAssignment',
+         Sepolia.event_args(manuscript_id, reviewer_id, assignment)),
+        ('recordReviewSubmission', 'recordReviewSubmission', Sepolia.event_args(manuscript_id, reviewer_id, review)),
+        ('recordCorrections', 'recordCorrections', Sepolia.event_args(manuscript_id, reviewer_id, corrections)),
+        (f'recordEvents x{batch_size}', 'recordEvents', [records]),
+        ('anchorRoot', 'anchorRoot', [keccak(text=f'root:{manuscript_id}'), batch_size]),
+    ]
+
+
+def measure(web3, name, rounds, batch_size, submitters):
+    """Mean gas used per operation over `rounds` rounds, then the gas of a submitter lookup"""
+    abi, bytecode = load_contract(name)
+    deployer = web3.eth.accounts[0]
+    tx_hash = web3.eth.contract(abi=abi, bytecode=bytecode).constructor().transact({'from': deployer})
+    receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+    contract = web3.eth.contract(address=receipt.contractAddress, abi=abi)
+
+    gas = {'deploy': [receipt.gasUsed]}
+    senders = web3.eth.accounts[:submitters]
+    for i in range(rounds):
+        for label, fn_name, args in operations(i + 1, f'd6f5c1d2-4a4e-4b6e-9a7e-{i:012d}', batch_size):
+            sender = senders[i % len(senders)] if fn_name == 'publishManuscript' else deployer
+            tx_hash = getattr(contract.functions, fn_name)(*args).transact({'from': sender})
+            gas.setdefault(label, []).append(web3.eth.wait_for_transaction_receipt(tx_hash).gasUsed)
+
+    # A view costs nothing to call, but nodes cap eth_call gas; v1 scans every manuscript twice
+    lookup = contract.functions.getManuscriptsBySubmitter(senders[0]).estimate_gas({'from': deployer})
+    gas[f'getManuscriptsBySubmitter ({rounds} stored)'] = [lookup]
+    return {label: sum(values) / len(values) for label, values in gas.items()}
+
+
+def run(*script_args):
+    """
+    Gas used by JournalContract (v1) and JournalContractV2 per operation on a
+    local EVM, with the payloads the anchor worker sends. Uses the bytecode in
+    <contract>.json, compiling the .sol source when it has none or is stale, and deploys
+    both to an in-process py-evm chain, or to a local node given as rpc=:
+
+    python manage.py runscript bench_contract_gas --script-args rounds=20 submitters=4
+    python manage.py runscript bench_contract_gas --script-args rpc=http://127.0.0.1:8545
+    """
+    options = {'rounds': '10', 'batch': '20', 'submitters': '4', 'rpc': ''}
+    options.update(arg.split('=', 1) for arg in script_args)
+    rounds, batch_size, submitters = int(options['rounds']), int(options['batch']), int(options['submitters'])
+
+    try:
+        web3 = local_web3(options['rpc'])
+    except ImportError as e:
+        print(f"No in-process EVM ({e}): pip install 'eth-tester[py-evm]' or pass rpc=<local node URL>")
+        return
+    results = [measure(web3, name, rounds, batch_size, submitters) for name in CONTRACTS]
+
+    print(f"rounds={rounds} batch={batch_size} submitters={submitters}")
+    print(f"{'operation':<40} {'v1 gas':>12} {'v2 gas':>12} {'saved':>8}")
+    for label, v1 in results[0].items():
+        v2 = results[1][label]
+        print(f"{label:<40} {v1:12.0f} {v2:12.0f} {(1 - v2 / v1) * 100:7.1f}%")
@@ -0,0 +1,30 @@
+import json
+import timeit
+
+from django.conf import settings
+
+from manuscripts.contracts import registry
+from manuscripts.sepolia import Sepolia
+
+
+def legacy_encode(args):
+    # What every Sepolia write method used to do per request
+    with open(settings.W3_CONTRACT_ABI, 'r') as f:
+        compiled_contract = json.load(f)
+    contract = settings.W3.eth.contract(address=settings.W3_CONTRACT_ADDRESS, abi=compiled_contract['abi'])
+    return contract.encodeABI(fn_name='recordReviewSubmission', args=args)
+
+
+def registry_encode(args):
+    registry.contract(settings.W3, settings.W3_CONTRACT_ADDRESS)
+    return registry.encoder('recordReviewSubmission')(*args)
+
+
+def run(*script_args):
+    iterations = int(script_args[0]) if script_args else 1000
+    args = Sepolia.event_args(1, 'd6f5c1d2-4a4e-4b6e-9a7e-7d0b2e2f9c11', {'comments': 'x' * 500, 'verdict': 'ACCEPT'})
+    assert legacy_encode(args) == registry_encode(args)
+
+    for name, fn in (('legacy', legacy_encode), ('registry', registry_encode)):
+        seconds = min(timeit.repeat(lambda: fn(args), number=iterations, repeat=3))
+        print(f"{name:>8}: {seconds / iterations * 1e6:9.1f} us per encode ({iterations} iterations)")
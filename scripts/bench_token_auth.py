@@ -0,0 +1,52 @@
+import time
+import uuid
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.authentication import CachedTokenAuthentication
+from accounts.models import Profile
+
+
+def run(*script_args):
+    """
+    Authenticated requests per second through the stock TokenAuthentication
+    and CachedTokenAuthentication, over a pool of users. Rows are written in
+    a transaction that is rolled back at the end.
+
+    python manage.py runscript bench_token_auth --script-args requests=20000 users=50
+    """
+    options = {'requests': '10000', 'users': '20'}
+    options.update(arg.split('=', 1) for arg in script_args)
+    requests, users = int(options['requests']), int(options['users'])
+    factory = APIRequestFactory()
+
+    with transaction.atomic():
+        tag = uuid.uuid4().hex[:8]
+        keys = []
+        for i in range(users):
+            profile = Profile.objects.create_user(
+                email=f'bench-{tag}-{i}@example.com', password=None, first_name='Bench', last_name=tag
+            )
+            keys.append(Token.objects.get(user=profile).key)
+        http_requests = [
+            Request(factory.get('/', HTTP_AUTHORIZATION=f'Token {keys[i % users]}')) for i in range(requests)
+        ]
+
+        CachedTokenAuthentication.cache.clear()
+        for name, authentication in (('stock', TokenAuthentication()), ('cached', CachedTokenAuthentication())):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for request in http_requests:
+                    user, _ = authentication.authenticate(request)
+                    user.email, user.is_staff
+                elapsed = time.perf_counter() - started
+            print(f"{name:>8}: {requests / elapsed:10.0f} requests/s, {len(queries.captured_queries)} queries")
+
+        cache = CachedTokenAuthentication.cache
+        print(f"  cache: {cache.hits} hits, {cache.misses} misses, {len(cache)} entries")
+        transaction.set_rollback(True)
@@ -0,0 +1,41 @@
+from django.db import connection
+
+from journals.models import Journal
+from manuscripts.models import Manuscript
+from manuscripts.queries import manuscript_filters
+from openPublisher.pagination import KeysetPagination
+
+
+def run(*script_args):
+    """
+    Prints the query plan of the journal manuscript list for each filter
+    combination, to check it stays an index range scan on (journal_id, ...).
+    ListingPlanTests in manuscripts/tests.py asserts the same plans; this
+    shows them against a real database and its statistics.
+    Optional args: journal_id, then key=value filters, e.g. status=REVIEW
+    """
+    journal_id = int(script_args[0]) if script_args else Journal.objects.values_list('pk', flat=True).first()
+    extra = dict(arg.split('=', 1) for arg in script_args[1:])
+
+    cases = {
+        'journal': {},
+        'journal + status': {'status': Manuscript.Status.REVIEW},
+        'journal + statuses': {'status': 'REVIEW,ACCEPTED'},
+        'journal + date range': {'submitted_from': '2024-01-01', 'submitted_to': '2024-12-31'},
+        'journal + status + date range': {
+            'status': Manuscript.Status.SUBMISSION, 'submitted_from': '2024-01-01', 'submitted_to': '2024-12-31'
+        },
+    }
+    if extra:
+        cases = {'custom': extra}
+
+    keyset = KeysetPagination(('submitted', 'id'))
+    for name, params in cases.items():
+        queryset = Manuscript.objects.filter(journal_id=journal_id, **manuscript_filters(params))
+        queryset = queryset.order_by('-submitted', '-id')
+        page = queryset.filter(keyset.after(['2024-06-01T00:00:00+00:00', 1000]))[:11]
+        print(f"== {name} ({connection.vendor})")
+        print(queryset[:11].explain())
+        print("-- next page")
+        print(page.explain())
+        print()
@@ -1,31 +1,76 @@
+from solcx import compile_source, install_solc, set_solc_version
+from django.conf import settings
+import hashlib
+import json
+import os
 
+SOLC_VERSION = '0.8.10'
+CONTRACTS = ('JournalContract', 'JournalContractV2')
 
-from solcx import compile_source, install_solc,set_solc_version, get_installable_solc_versions, get_installed_solc_versions
 
-# Install specific version of solc (for example, '0.8.0')
-install_solc('0.8.10')
-set_solc_version('0.8.10')
-from django.conf import settings
-import os
+def source_sha256(name):
+    """SHA-256 of <BASE_DIR>/<name>.sol, saved with the artifact to tell when it is stale"""
+    with open(os.path.join(settings.BASE_DIR, f'{name}.sol'), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-def run():
-    web3 = settings.W3
-    contract_src = os.path.join(settings.BASE_DIR, 'JournalContract.sol')
-    # contract_src = '../JournalContract.sol'
 
-    compiled_sol = compile_source(open(contract_src).read())
-    contract_interface = compiled_sol['<stdin>:JournalContract']
-    # contract_interface = compiled_sol['JournalContract']
+def compile_contract(name):
+    """ABI and bytecode of the contract `name` in <BASE_DIR>/<name>.sol"""
+    # Install specific version of solc
+    install_solc(SOLC_VERSION)
+    set_solc_version(SOLC_VERSION)
+
+    contract_src = os.path.join(settings.BASE_DIR, f'{name}.sol')
+    compiled_sol = compile_source(open(contract_src).read(), optimize=True)
+    contract_interface = compiled_sol[f'<stdin>:{name}']
+    return contract_interface['abi'], contract_interface['bin']
+
+
+def save_artifact(name):
+    """Compile `name` and write its ABI and bytecode to <BASE_DIR>/<name>.json"""
+    abi, bytecode = compile_contract(name)
+    contract_json_path = os.path.join(settings.BASE_DIR, f'{name}.json')
+    with open(contract_json_path, 'w') as f:
+        json.dump(
+            {"abi": abi, "bytecode": bytecode, "solc": SOLC_VERSION, "source_sha256": source_sha256(name)},
+            f, indent=2
+        )
+    print(f"Updated ABI saved to {contract_json_path}")
+    return abi, bytecode
 
-    bytecode = contract_interface['bin']
-    abi = contract_interface['abi']
 
+def run(*script_args):
+    """
+    Compile JournalContract.sol, or contract=JournalContractV2, save its ABI and
+    bytecode to <contract>.json and deploy it to W3 unless deploy=0:
+
+    python manage.py runscript web3_compile_contract --script-args contract=JournalContractV2
+
+    contract=all deploy=0 regenerates the artifacts of every contract without deploying.
+    Point W3_CONTRACT_ABI and W3_CONTRACT_ADDRESS at the new contract to use it.
+    """
+    options = {'contract': 'JournalContract', 'deploy': '1'}
+    options.update(arg.split('=', 1) for arg in script_args)
+    name = options['contract']
+
+    if name == 'all':
+        for contract_name in CONTRACTS:
+            save_artifact(contract_name)
+        return
+
+    abi, bytecode = save_artifact(name)
+
+    if options['deploy'] in ('0', 'false'):
+        return
+
+    web3 = settings.W3
     contract = web3.eth.contract(abi=abi, bytecode=bytecode)
-    tx_data = contract.constructor().build_transaction({
+    constructor = contract.constructor()
+    tx_data = constructor.build_transaction({
         'from': settings.W3_OWNERS_ADDRESS,
         'nonce': web3.eth.get_transaction_count(settings.W3_OWNERS_ADDRESS),
-        'gas': 1728712,
-        'gasPrice': web3.to_wei('21', 'gwei')
+        'gas': int(constructor.estimate_gas({'from': settings.W3_OWNERS_ADDRESS}) * settings.ANCHOR_GAS_MARGIN),
+        'gasPrice': web3.eth.gas_price
     })
 
     signed_tx = web3.eth.account.sign_transaction(tx_data, settings.W3_PRIV_KEY)
@@ -35,10 +80,3 @@ def run():
 
     contract_address = tx_receipt['contractAddress']
     print(f"Contract deployed at: {contract_address}")
-    
-    # Save the new ABI to JournalContract.json
-    import json
-    contract_json_path = os.path.join(settings.BASE_DIR, 'JournalContract.json')
-    with open(contract_json_path, 'w') as f:
-        json.dump({"abi": abi}, f, indent=2)
-    print(f"Updated ABI saved to {contract_json_path}")
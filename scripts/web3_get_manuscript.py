@@ -1,25 +1,42 @@
 from django.conf import settings
-import json
+from web3 import Web3
 
+from manuscripts import chainindex
+from manuscripts.contracts import abi_path, registry
 
-def run():
-    web3 = settings.W3
-    sender_account = settings.W3_OWNERS_ADDRESS
-    print(sender_account)
-    if web3.is_connected():
-        # Load contract ABI and bytecode from Remix compilation output
-        with open("JournalContract.json", 'r') as f:
-            compiled_contract = json.load(f)
-
-        contract = web3.eth.contract(
-            address=settings.W3_CONTRACT_ADDRESS,
-            abi=compiled_contract['abi']
-        )
 
-        manuscript_details = contract.functions.getManuscriptsBySubmitter(sender_account).call()
+def run(*script_args):
+    """
+    Print the manuscripts a submitter published on the contract at
+    W3_CONTRACT_ADDRESS, or at contract=, with its ABI file. JournalContract
+    returns the metadata strings; JournalContractV2 returns their hashes, and
+    the metadata is taken from the ManuscriptPublished logs in the local
+    index (manage.py index_chain_logs).
 
-        print(manuscript_details)
+    python manage.py runscript web3_get_manuscript --script-args submitter=0x... [contract=0x...]
+    """
+    options = {'submitter': settings.W3_OWNERS_ADDRESS, 'contract': settings.W3_CONTRACT_ADDRESS}
+    options.update(arg.split('=', 1) for arg in script_args)
+    submitter = Web3.to_checksum_address(options['submitter'])
+    address = Web3.to_checksum_address(options['contract'])
+    path = abi_path(address)
 
-    else:
+    web3 = settings.W3
+    print(submitter)
+    if not web3.is_connected():
         print("No connection to network")
+        return
+
+    contract = registry.contract(web3, address, path)
+    manuscripts = contract.functions.getManuscriptsBySubmitter(submitter).call()
+    if not registry.abi(path).hashed_ids:
+        print(manuscripts)
+        return
 
+    indexed = {
+        log.args['metadataHash'].lower(): log.args['metadata']
+        for log in chainindex.submitted_manuscripts(submitter).filter(contract__iexact=address)
+    }
+    for metadata_hash in manuscripts:
+        metadata_hash = Web3.to_hex(metadata_hash)
+        print(metadata_hash, indexed.get(metadata_hash.lower(), "(not indexed yet)"))